@@ -1,11 +1,26 @@
-from flask import Flask, render_template, request, jsonify, url_for, redirect
+from flask import Flask, Response, render_template, request, jsonify, url_for, redirect
+import contextlib
+import csv
+import io
 import sqlite3
 import socket
 import webbrowser
 import threading
 import datetime
+import hashlib
+import json
+import queue
+import time
+import zlib
 import os # Import os for file operations
 
+import live_view
+import partitions
+import storage
+from db_pool import PoolExhausted, ReadPool
+from live_events import EventBroker
+from metrics import MetricsRegistry
+
 print("✅ Running the correct app.py from vehicle_counter")
 
 app = Flask(__name__)
@@ -23,21 +38,55 @@ LOCATION_CONFIG_FILE = "current_camera_location.txt"
 def init_database():
     """Initialize database with the new schema."""
     conn = sqlite3.connect("vehicle_data.db")
-    cursor = conn.cursor()
-
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS vehicles (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            timestamp TEXT NOT NULL,
-            vehicle_type TEXT NOT NULL,
-            vehicle_id INTEGER,
-            location_id TEXT NOT NULL
-        )
-    """)
-
-    conn.commit()
+    conn.execute("PRAGMA journal_mode=WAL")  # readers and the detectors' writer don't block each other
+    storage.init_database(conn)
     conn.close()
 
+# Helper to turn an inclusive "YYYY-MM-DD" date range into a [start, end) ts range
+def day_bounds(start_date, end_date):
+    return storage.to_ts(start_date), storage.to_ts(end_date) + 86400
+
+def week_start_date():
+    now = datetime.datetime.now()
+    return (now - datetime.timedelta(days=now.weekday())).strftime("%Y-%m-%d")
+
+# Events live in one SQLite file per month (see partitions.py). A request reads
+# only the months its date ranges touch, plus this week's for the weekly total,
+# on a long-lived read-only connection from the pool (see db_pool.py).
+# Set POOLED_CONNECTIONS = False to open a fresh connection per request instead.
+POOLED_CONNECTIONS = True
+read_pool = ReadPool("vehicle_data.db")
+
+@app.errorhandler(PoolExhausted)
+def pool_exhausted(e):
+    """Every pooled connection is busy: tell the client to retry instead of failing with a 500."""
+    response = jsonify({"error": f"Database busy ({e}), try again shortly"})
+    response.headers["Retry-After"] = "1"
+    return response, 503
+
+@contextlib.contextmanager
+def open_partitions(*date_ranges):
+    """``with open_partitions(range, ...) as (conn, version):``"""
+    today = datetime.datetime.now().strftime("%Y-%m-%d")
+    months = set()
+    for start_date, end_date in (*date_ranges, (week_start_date(), today)):
+        months.update(partitions.months_between(*day_bounds(start_date, end_date)))
+    if POOLED_CONNECTIONS:
+        with read_pool.connection(months) as (conn, version):
+            yield conn, version
+        return
+    conn = sqlite3.connect("vehicle_data.db")
+    try:
+        yield conn, partitions.attach_months(conn, months, "vehicle_data.db")
+    finally:
+        conn.close()
+
+# Rollup rows for one location, excluding buses; used by every endpoint below
+LOCATION_FILTER = """
+    JOIN vehicle_types t ON t.id = r.vehicle_type_id
+    WHERE r.location_id = (SELECT id FROM locations WHERE name = ?) AND t.name != 'bus'
+"""
+
 # Helper function to write the active location to a file for backend to read
 def write_current_location_to_file(location_id):
     try:
@@ -78,210 +127,134 @@ def dashboard(location_id):
 
 # === ALL API ENDPOINTS WITH DATE RANGE SUPPORT ===
 
-@app.route("/api/<location_id>/traffic/summary")
-def summary_data(location_id):
-    now = datetime.datetime.now()
-    conn = sqlite3.connect("vehicle_data.db")
-    cursor = conn.cursor()
-    
-    # Get date range parameters
+class InvalidDateRange(ValueError):
+    """?start= or ?end= is not a YYYY-MM-DD date."""
+
+@app.errorhandler(InvalidDateRange)
+def invalid_date_range(e):
+    return jsonify({"error": str(e)}), 400
+
+def get_date_range(default_days=1):
+    """Read ?start=&end= from the request, defaulting to the last `default_days` days.
+
+    Raises InvalidDateRange (answered with 400) for a date that isn't YYYY-MM-DD.
+    """
     start_date = request.args.get("start")
     end_date = request.args.get("end")
-    
-    # If no date range provided, use today
+
+    # If no date range provided, use today (or the last few days)
     if not start_date and not end_date:
-        today = now.strftime("%Y-%m-%d")
-        start_date = today
-        end_date = today
+        now = datetime.datetime.now()
+        end_date = now.strftime("%Y-%m-%d")
+        start_date = (now - datetime.timedelta(days=default_days - 1)).strftime("%Y-%m-%d")
     elif start_date and not end_date:
         end_date = start_date
     elif end_date and not start_date:
         start_date = end_date
-    
-    # Default to today if still no dates
-    if not start_date:
-        today = now.strftime("%Y-%m-%d")
-        start_date = today
-        end_date = today
-    
+
     # Ensure we have valid string values (not None)
     assert start_date is not None and end_date is not None
-
+    # Reject malformed dates (e.g. 2024-13-01) with a 400 instead of a 500 from the queries,
+    # and normalise the accepted ones (2024-1-5 -> 2024-01-05)
+    try:
+        start_date, end_date = (datetime.datetime.strptime(date, "%Y-%m-%d").strftime("%Y-%m-%d")
+                                for date in (start_date, end_date))
+    except ValueError:
+        raise InvalidDateRange(f"start and end must be dates as YYYY-MM-DD, got start={start_date!r}, "
+                               f"end={end_date!r}") from None
+    return start_date, end_date
+
+def query_summary(cursor, location_id, start_date, end_date):
+    now = datetime.datetime.now()
     summary = {"total_today": 0, "total_week": 0, "peak_hour": "00:00", "current_hour": 0}
 
     # Total for date range (replaces "total_today")
-    cursor.execute("""
-        SELECT COUNT(*) FROM vehicles 
-        WHERE DATE(timestamp) BETWEEN ? AND ? 
-        AND location_id = ? AND vehicle_type != 'bus'
-    """, (start_date, end_date, location_id))
+    start_ts, end_ts = day_bounds(start_date, end_date)
+    cursor.execute(f"""
+        SELECT COALESCE(SUM(r.count), 0) FROM vehicle_counts_daily r {LOCATION_FILTER}
+        AND r.day_ts >= ? AND r.day_ts < ?
+    """, (location_id, start_ts, end_ts))
     result = cursor.fetchone()
     summary["total_today"] = result[0] if result else 0
 
     # Week's total (keep as is for now, could be modified to show week containing the date range)
-    week_start = (now - datetime.timedelta(days=now.weekday())).strftime("%Y-%m-%d")
-    cursor.execute("""
-        SELECT COUNT(*) FROM vehicles 
-        WHERE DATE(timestamp) >= ? AND location_id = ? AND vehicle_type != 'bus'
-    """, (week_start, location_id))
+    week_start = week_start_date()
+    cursor.execute(f"""
+        SELECT COALESCE(SUM(r.count), 0) FROM vehicle_counts_daily r {LOCATION_FILTER}
+        AND r.day_ts >= ?
+    """, (location_id, storage.to_ts(week_start)))
     result = cursor.fetchone()
     summary["total_week"] = result[0] if result else 0
 
     # Peak hour for the date range
-    cursor.execute("""
-        SELECT strftime('%H', timestamp), COUNT(*) FROM vehicles
-        WHERE DATE(timestamp) BETWEEN ? AND ? AND location_id = ? AND vehicle_type != 'bus'
-        GROUP BY strftime('%H', timestamp)
-        ORDER BY COUNT(*) DESC LIMIT 1
-    """, (start_date, end_date, location_id))
-    row = cursor.fetchone()
-    if row:
-        summary["peak_hour"] = f"{int(row[0]):02d}:00"
+    cursor.execute(f"""
+        SELECT r.hour_ts % 86400 / 3600 AS hour, SUM(r.count) FROM vehicle_counts_hourly r {LOCATION_FILTER}
+        AND r.hour_ts >= ? AND r.hour_ts < ?
+        GROUP BY hour
+        ORDER BY SUM(r.count) DESC LIMIT 1
+    """, (location_id, start_ts, end_ts))
+    peak_row = cursor.fetchone()
+    if peak_row:
+        summary["peak_hour"] = f"{int(peak_row[0]):02d}:00"
 
     # Current hour count logic
     if end_date >= now.strftime("%Y-%m-%d"):
         # If range includes today, show current hour of today
-        current_hour = now.strftime("%H")
+        current_hour = now.hour
         current_date = now.strftime("%Y-%m-%d")
-        summary["current_hour_label"] = f"Current Hour ({current_hour}:00)"
-    else:
+        summary["current_hour_label"] = f"Current Hour ({current_hour:02d}:00)"
+    elif peak_row:
         # For historical data, show the peak hour of the selected range
-        cursor.execute("""
-            SELECT strftime('%H', timestamp), COUNT(*) FROM vehicles
-            WHERE DATE(timestamp) BETWEEN ? AND ? AND location_id = ? AND vehicle_type != 'bus'
-            GROUP BY strftime('%H', timestamp)
-            ORDER BY COUNT(*) DESC LIMIT 1
-        """, (start_date, end_date, location_id))
-        peak_row = cursor.fetchone()
-        
-        if peak_row:
-            current_hour = peak_row[0]
-            current_date = end_date  # Use last day in range for display
-            summary["current_hour_label"] = f"Peak Hour ({int(current_hour):02d}:00)"
-        else:
-            # No data in range, show 0
-            current_hour = "00"
-            current_date = end_date
-            summary["current_hour_label"] = "Peak Hour (No Data)"
-    
-    cursor.execute("""
-        SELECT COUNT(*) FROM vehicles
-        WHERE strftime('%H', timestamp) = ? AND DATE(timestamp) = ? AND location_id = ? AND vehicle_type != 'bus'
-    """, (current_hour, current_date, location_id))
+        current_hour = peak_row[0]
+        current_date = end_date  # Use last day in range for display
+        summary["current_hour_label"] = f"Peak Hour ({int(current_hour):02d}:00)"
+    else:
+        # No data in range, show 0
+        current_hour = 0
+        current_date = end_date
+        summary["current_hour_label"] = "Peak Hour (No Data)"
+
+    cursor.execute(f"""
+        SELECT COALESCE(SUM(r.count), 0) FROM vehicle_counts_hourly r {LOCATION_FILTER}
+        AND r.hour_ts = ?
+    """, (location_id, storage.to_ts(current_date) + int(current_hour) * 3600))
     result = cursor.fetchone()
     summary["current_hour"] = result[0] if result else 0
+    return summary
 
-    conn.close()
-    return jsonify(summary)
-
-@app.route("/api/<location_id>/traffic/vehicle-types")
-def vehicle_types_data(location_id):
-    conn = sqlite3.connect("vehicle_data.db")
-    cursor = conn.cursor()
-
-    # Get date range parameters
-    start_date = request.args.get("start")
-    end_date = request.args.get("end")
-    
-    # If no date range provided, use today
-    if not start_date and not end_date:
-        today = datetime.datetime.now().strftime("%Y-%m-%d")
-        start_date = today
-        end_date = today
-    elif start_date and not end_date:
-        end_date = start_date
-    elif end_date and not start_date:
-        start_date = end_date
-    
-    # Ensure we have valid string values (not None)
-    assert start_date is not None and end_date is not None
-
+def query_vehicle_types(cursor, location_id, start_date, end_date):
     vehicle_counts = {"car": 0, "truck": 0, "motorcycle": 0}
 
-    cursor.execute("""
-        SELECT vehicle_type, COUNT(*) FROM vehicles
-        WHERE DATE(timestamp) BETWEEN ? AND ? AND location_id = ? AND vehicle_type != 'bus'
-        GROUP BY vehicle_type
-    """, (start_date, end_date, location_id))
+    cursor.execute(f"""
+        SELECT t.name, SUM(r.count) FROM vehicle_counts_daily r {LOCATION_FILTER}
+        AND r.day_ts >= ? AND r.day_ts < ?
+        GROUP BY t.name
+    """, (location_id, *day_bounds(start_date, end_date)))
 
-    results = cursor.fetchall()
-    for vehicle_type, count in results:
+    for vehicle_type, count in cursor.fetchall():
         if vehicle_type in vehicle_counts:
             vehicle_counts[vehicle_type] = count
+    return vehicle_counts
 
-    conn.close()
-    return jsonify(vehicle_counts)
-
-@app.route("/api/<location_id>/traffic/hourly")
-def hourly(location_id):
-    conn = sqlite3.connect("vehicle_data.db")
-    cursor = conn.cursor()
-
-    # Get date range parameters
-    start_date = request.args.get("start")
-    end_date = request.args.get("end")
-    
-    # If no date range provided, use today
-    if not start_date and not end_date:
-        today = datetime.datetime.now().strftime("%Y-%m-%d")
-        start_date = today
-        end_date = today
-    elif start_date and not end_date:
-        end_date = start_date
-    elif end_date and not start_date:
-        start_date = end_date
-    
-    # Ensure we have valid string values (not None)
-    assert start_date is not None and end_date is not None
-
+def query_hourly(cursor, location_id, start_date, end_date):
     hourly_data = {f"{hour:02d}:00": 0 for hour in range(24)}
 
-    # If single date, use the original logic
-    if start_date == end_date:
-        cursor.execute("""
-            SELECT strftime('%H', timestamp), COUNT(*) FROM vehicles
-            WHERE DATE(timestamp) = ? AND location_id = ? AND vehicle_type != 'bus'
-            GROUP BY strftime('%H', timestamp)
-        """, (start_date, location_id))
-    else:
-        # For date range, aggregate all hours across the range
-        cursor.execute("""
-            SELECT strftime('%H', timestamp), COUNT(*) FROM vehicles
-            WHERE DATE(timestamp) BETWEEN ? AND ? AND location_id = ? AND vehicle_type != 'bus'
-            GROUP BY strftime('%H', timestamp)
-        """, (start_date, end_date, location_id))
+    # Aggregate each hour of the day across the range (a single date is a range of one)
+    cursor.execute(f"""
+        SELECT r.hour_ts % 86400 / 3600 AS hour, SUM(r.count) FROM vehicle_counts_hourly r {LOCATION_FILTER}
+        AND r.hour_ts >= ? AND r.hour_ts < ?
+        GROUP BY hour
+    """, (location_id, *day_bounds(start_date, end_date)))
 
     for hour, count in cursor.fetchall():
         hourly_data[f"{int(hour):02d}:00"] = count
+    return hourly_data
 
-    conn.close()
-    return jsonify(hourly_data)
-
-@app.route("/api/<location_id>/traffic/daily")
-def daily(location_id):
-    conn = sqlite3.connect("vehicle_data.db")
-    cursor = conn.cursor()
-
-    # Get date range parameters
-    start_date = request.args.get("start")
-    end_date = request.args.get("end")
-    
-    # If no date range provided, use last 7 days
-    if not start_date and not end_date:
-        end_date = datetime.datetime.now().strftime("%Y-%m-%d")
-        start_date = (datetime.datetime.now() - datetime.timedelta(days=6)).strftime("%Y-%m-%d")
-    elif start_date and not end_date:
-        end_date = start_date
-    elif end_date and not start_date:
-        start_date = end_date
-    
-    # Ensure we have valid string values (not None)
-    assert start_date is not None and end_date is not None
-
+def query_daily(cursor, location_id, start_date, end_date):
     # Generate date range
     start_obj = datetime.datetime.strptime(start_date, "%Y-%m-%d")
     end_obj = datetime.datetime.strptime(end_date, "%Y-%m-%d")
-    
+
     daily_data = {}
     current_date = start_obj
     while current_date <= end_obj:
@@ -289,11 +262,11 @@ def daily(location_id):
         daily_data[date_str] = 0
         current_date += datetime.timedelta(days=1)
 
-    cursor.execute("""
-        SELECT DATE(timestamp), COUNT(*) FROM vehicles
-        WHERE DATE(timestamp) BETWEEN ? AND ? AND location_id = ? AND vehicle_type != 'bus'
-        GROUP BY DATE(timestamp)
-    """, (start_date, end_date, location_id))
+    cursor.execute(f"""
+        SELECT date(r.day_ts, 'unixepoch'), SUM(r.count) FROM vehicle_counts_daily r {LOCATION_FILTER}
+        AND r.day_ts >= ? AND r.day_ts < ?
+        GROUP BY r.day_ts
+    """, (location_id, *day_bounds(start_date, end_date)))
 
     for date, count in cursor.fetchall():
         if date in daily_data:
@@ -301,18 +274,363 @@ def daily(location_id):
 
     # Convert to day names for display
     day_names = {}
-    sorted_dates = sorted(daily_data.keys())
-    for date in sorted_dates:
+    for date in sorted(daily_data.keys()):
         day_obj = datetime.datetime.strptime(date, "%Y-%m-%d")
         day_name = day_obj.strftime("%a") # Mon, Tue, etc.
         # If multiple dates have same day name, sum them
-        if day_name in day_names:
-            day_names[day_name] += daily_data[date]
-        else:
-            day_names[day_name] = daily_data[date]
+        day_names[day_name] = day_names.get(day_name, 0) + daily_data[date]
+    return day_names
 
-    conn.close()
-    return jsonify(day_names)
+def run_query(query, location_id, start_date, end_date):
+    with open_partitions((start_date, end_date)) as (conn, _):
+        return query(conn.cursor(), location_id, start_date, end_date)
+
+@app.route("/api/<location_id>/traffic/summary")
+def summary_data(location_id):
+    return jsonify(run_query(query_summary, location_id, *get_date_range()))
+
+@app.route("/api/<location_id>/traffic/vehicle-types")
+def vehicle_types_data(location_id):
+    return jsonify(run_query(query_vehicle_types, location_id, *get_date_range()))
+
+@app.route("/api/<location_id>/traffic/hourly")
+def hourly(location_id):
+    return jsonify(run_query(query_hourly, location_id, *get_date_range()))
+
+@app.route("/api/<location_id>/traffic/daily")
+def daily(location_id):
+    # If no date range provided, use last 7 days
+    return jsonify(run_query(query_daily, location_id, *get_date_range(default_days=7)))
+
+# === Combined dashboard endpoint with response cache and ETags ===
+# Cached payloads are keyed by (location, range) and tagged with the data version:
+# the newest vehicles row id of every partition the request reads plus the
+# current hour (which "current hour" and "this week" depend on). Any new row in
+# those months changes the version and invalidates them.
+CACHE_MAX_ENTRIES = 256
+response_cache = {}
+response_cache_lock = threading.Lock()
+
+def data_version(partition_version):
+    return f"{partition_version}-{datetime.datetime.now().strftime('%Y%m%d%H')}"
+
+def cached_json(key, date_ranges, build):
+    """JSON response for ``build(cursor)``, served from response_cache and answered with 304 on a matching ETag."""
+    with open_partitions(*date_ranges) as (conn, partition_version):
+        version = data_version(partition_version)
+        etag = hashlib.sha1(repr((key, version)).encode()).hexdigest()
+        if etag in request.if_none_match:
+            return "", 304, {"ETag": f'"{etag}"', "Cache-Control": "no-cache"}
+
+        with response_cache_lock:
+            cached = response_cache.get(key)
+        if cached and cached[0] == version:
+            payload = cached[1]
+        else:
+            payload = build(conn.cursor())
+            with response_cache_lock:
+                if len(response_cache) >= CACHE_MAX_ENTRIES:
+                    response_cache.clear()
+                response_cache[key] = (version, payload)
+
+    response = jsonify(payload)
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = "no-cache"
+    return response
+
+@app.route("/api/<location_id>/traffic/all")
+def all_traffic_data(location_id):
+    """Summary, vehicle types, hourly and daily data in one response."""
+    start_date, end_date = get_date_range()
+    daily_range = get_date_range(default_days=7)
+
+    def build(cursor):
+        return {
+            "summary": query_summary(cursor, location_id, start_date, end_date),
+            "vehicle_types": query_vehicle_types(cursor, location_id, start_date, end_date),
+            "hourly": query_hourly(cursor, location_id, start_date, end_date),
+            "daily": query_daily(cursor, location_id, *daily_range),
+        }
+
+    return cached_json((location_id, start_date, end_date, daily_range), [(start_date, end_date), daily_range], build)
+
+# === City-wide endpoints ===
+# Totals, vehicle type mix, hourly profile and ranking of every location in
+# LOCATIONS, or of ?locations=A,B (also repeatable), in one response. Each
+# figure comes from one query grouped by location over the rollup tables, so
+# the cost barely grows with the number of locations. Responses share the
+# cache and ETags of /traffic/all.
+CITY_FILTER = """
+    JOIN vehicle_types t ON t.id = r.vehicle_type_id
+    JOIN locations l ON l.id = r.location_id
+    WHERE r.location_id IN (SELECT id FROM locations WHERE name IN ({placeholders})) AND t.name != 'bus'
+"""
+
+def get_city_locations():
+    """Locations named in ?locations=, in LOCATIONS order; all of them by default. None if one is unknown."""
+    names = {name.strip() for value in request.args.getlist("locations") for name in value.split(",")} - {""}
+    if names - LOCATIONS.keys():
+        return None
+    return [location_id for location_id in LOCATIONS if not names or location_id in names]
+
+def query_city(cursor, location_ids, start_date, end_date):
+    city_filter = CITY_FILTER.format(placeholders=", ".join("?" * len(location_ids)))
+    start_ts, end_ts = day_bounds(start_date, end_date)
+    locations = {location_id: {"name": LOCATIONS[location_id]["name"], "total": 0, "total_week": 0,
+                               "peak_hour": None, "vehicle_types": {"car": 0, "truck": 0, "motorcycle": 0},
+                               "hourly": {f"{hour:02d}:00": 0 for hour in range(24)}}
+                 for location_id in location_ids}
+    city = {"total": 0, "total_week": 0, "peak_hour": None, "vehicle_types": {"car": 0, "truck": 0, "motorcycle": 0},
+            "hourly": {f"{hour:02d}:00": 0 for hour in range(24)}}
+
+    # Totals and type mix for the range
+    cursor.execute(f"""
+        SELECT l.name, t.name, SUM(r.count) FROM vehicle_counts_daily r {city_filter}
+        AND r.day_ts >= ? AND r.day_ts < ?
+        GROUP BY r.location_id, r.vehicle_type_id
+    """, (*location_ids, start_ts, end_ts))
+    for location_id, vehicle_type, count in cursor.fetchall():
+        location = locations[location_id]
+        location["total"] += count
+        city["total"] += count
+        if vehicle_type in location["vehicle_types"]:
+            location["vehicle_types"][vehicle_type] = count
+            city["vehicle_types"][vehicle_type] += count
+
+    # This week's totals
+    cursor.execute(f"""
+        SELECT l.name, SUM(r.count) FROM vehicle_counts_daily r {city_filter}
+        AND r.day_ts >= ?
+        GROUP BY r.location_id
+    """, (*location_ids, storage.to_ts(week_start_date())))
+    for location_id, count in cursor.fetchall():
+        locations[location_id]["total_week"] = count
+        city["total_week"] += count
+
+    # Hourly profiles across the range
+    cursor.execute(f"""
+        SELECT l.name, r.hour_ts % 86400 / 3600 AS hour, SUM(r.count) FROM vehicle_counts_hourly r {city_filter}
+        AND r.hour_ts >= ? AND r.hour_ts < ?
+        GROUP BY r.location_id, hour
+    """, (*location_ids, start_ts, end_ts))
+    for location_id, hour, count in cursor.fetchall():
+        locations[location_id]["hourly"][f"{int(hour):02d}:00"] = count
+        city["hourly"][f"{int(hour):02d}:00"] += count
+
+    for profile in (*locations.values(), city):
+        peak_hour, peak_count = max(profile["hourly"].items(), key=lambda item: item[1])
+        profile["peak_hour"] = peak_hour if peak_count else None
+
+    ranking = sorted(location_ids, key=lambda location_id: locations[location_id]["total"], reverse=True)
+    return {
+        "start": start_date,
+        "end": end_date,
+        "city": city,
+        "locations": locations,
+        "ranking": [{"rank": rank, "location_id": location_id, "name": locations[location_id]["name"],
+                     "total": locations[location_id]["total"],
+                     "share": round(locations[location_id]["total"] / city["total"], 4) if city["total"] else 0.0}
+                    for rank, location_id in enumerate(ranking, 1)],
+    }
+
+def city_response(part=None):
+    location_ids = get_city_locations()
+    if location_ids is None:
+        return jsonify({"error": f"Unknown location; choose from {sorted(LOCATIONS)}"}), 404
+    start_date, end_date = get_date_range()
+
+    def build(cursor):
+        payload = query_city(cursor, location_ids, start_date, end_date)
+        return payload if part is None else {key: payload[key] for key in ("start", "end", *part)}
+
+    return cached_json(("city", part, tuple(location_ids), start_date, end_date), [(start_date, end_date)], build)
+
+@app.route("/api/city/traffic/all")
+def city_traffic_data():
+    return city_response()
+
+@app.route("/api/city/traffic/ranking")
+def city_ranking():
+    return city_response(("ranking",))
+
+# === Raw event export ===
+# Streams events as CSV or NDJSON straight from the partitions (see
+# partitions.iter_events): a few thousand rows at a time, month by month and
+# location by location in time order, gzipped on the fly when the client accepts
+# it. ?after=<id> resumes an interrupted export after the last id received; the
+# CSV header is then left out so the parts can be concatenated. A range touching
+# months archived to Parquet is refused with 409 listing them, unless the caller
+# passes ?skip_archived=1 (they are then listed in X-Archived-Months).
+EXPORT_FORMATS = {"csv": "text/csv", "ndjson": "application/x-ndjson"}
+EXPORT_COLUMNS = ("id", "timestamp", "vehicle_type", "vehicle_id", "location_id")
+EXPORT_GZIP_LEVEL = 6
+
+def export_lines(batches, export_format, header):
+    """Encoded text for every batch of rows."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if export_format == "csv" and header:
+        writer.writerow(EXPORT_COLUMNS)
+    for batch in batches:
+        if export_format == "csv":
+            writer.writerows(batch)
+        else:
+            for row in batch:
+                buffer.write(json.dumps(dict(zip(EXPORT_COLUMNS, row))) + "\n")
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()  # header of an empty export
+
+def gzipped(chunks):
+    compressor = zlib.compressobj(EXPORT_GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)  # gzip container
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+def export_response(locations, label):
+    """Streaming export of ``locations`` (names, None = all) for the request's date range."""
+    export_format = request.args.get("format", "csv")
+    if export_format not in EXPORT_FORMATS:
+        return jsonify({"error": f"format must be one of {sorted(EXPORT_FORMATS)}"}), 400
+    try:
+        after_id = int(request.args.get("after", 0))
+    except ValueError:
+        return jsonify({"error": "after must be an event id"}), 400
+    after = after_id and partitions.event_position("vehicle_data.db", after_id)
+    if after_id and not after:
+        return jsonify({"error": f"No event {after_id} to resume after"}), 404
+    start_date, end_date = get_date_range()
+    start_ts, end_ts = day_bounds(start_date, end_date)
+    archived = partitions.archived_months("vehicle_data.db", partitions.months_between(start_ts, end_ts))
+    skip_archived = request.args.get("skip_archived") == "1"
+    if archived and not skip_archived:
+        return jsonify({
+            "error": "Raw events of these months are archived to Parquet under vehicle_data_archive/ and are "
+                     "not in the export; read them there, or add skip_archived=1 to export the rest",
+            "archived_months": archived,
+        }), 409
+
+    batches = partitions.iter_events("vehicle_data.db", start_ts, end_ts, locations, after)
+    chunks = export_lines(batches, export_format, header=not after_id)
+    slug = "".join(c if c.isalnum() else "_" for c in label).strip("_").lower()
+    headers = {
+        "Content-Disposition": f'attachment; filename="vehicles_{slug}_{start_date}_{end_date}.{export_format}"',
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no",
+        "Vary": "Accept-Encoding",
+    }
+    if archived:
+        headers["X-Archived-Months"] = ",".join(archived)
+    if "gzip" in request.accept_encodings:
+        chunks = gzipped(chunks)
+        headers["Content-Encoding"] = "gzip"
+    return Response(chunks, mimetype=EXPORT_FORMATS[export_format], headers=headers)
+
+@app.route("/api/<location_id>/export")
+def export_location(location_id):
+    return export_response([location_id], location_id)
+
+@app.route("/api/city/export")
+def export_city():
+    """Every location's events, or those of ?locations=A,B."""
+    if not request.args.get("locations"):
+        return export_response(None, "all")
+    location_ids = get_city_locations()
+    if location_ids is None:
+        return jsonify({"error": f"Unknown location; choose from {sorted(LOCATIONS)}"}), 404
+    return export_response(location_ids, "_".join(location_ids))
+
+# === Live count events (Server-Sent Events) ===
+# Detectors POST events to /internal/events (see live_events.EventPublisher);
+# every open dashboard for that location receives them on its SSE stream.
+SSE_KEEPALIVE_SECONDS = 15
+event_broker = EventBroker()
+
+@app.route("/internal/events", methods=["POST"])
+def ingest_events():
+    if request.remote_addr not in ("127.0.0.1", "::1"):
+        return "Forbidden", 403
+    events = request.get_json(silent=True) or []
+    for event in events:
+        if "location_id" in event:
+            event_broker.publish(event)
+    return "", 204
+
+@app.route("/api/<location_id>/stream")
+def event_stream(location_id):
+    def generate():
+        subscriber = event_broker.subscribe(location_id)
+        try:
+            yield "retry: 3000\n\n"
+            while True:
+                try:
+                    event = subscriber.get(timeout=SSE_KEEPALIVE_SECONDS)
+                    yield f"data: {json.dumps(event)}\n\n"
+                except queue.Empty:
+                    yield ": keepalive\n\n"
+        finally:
+            event_broker.unsubscribe(location_id, subscriber)
+
+    return Response(generate(), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+# === Live video (MJPEG) ===
+# Detectors write annotated frames into shared memory (see live_view.py), but only
+# while a stream below marks the location as watched; each frame is encoded once
+# however many viewers share it.
+live_views = live_view.LiveViews()
+
+@app.route("/api/<location_id>/live.mjpeg")
+def live_video(location_id):
+    reader = live_views.reader(location_id)
+    if reader is None:
+        return "No detector is publishing live video for this location", 404
+
+    def generate():
+        seq, last_frame_at = 0, time.time()
+        while time.time() - last_frame_at < live_view.STALE_AFTER:
+            reader.watch()
+            frame = reader.jpeg(after_seq=seq)
+            if frame is None:
+                time.sleep(0.5 / live_view.MAX_FPS)
+                continue
+            seq, jpeg = frame
+            last_frame_at = time.time()
+            yield (b"--frame\r\nContent-Type: image/jpeg\r\nContent-Length: " + str(len(jpeg)).encode()
+                   + b"\r\n\r\n" + jpeg + b"\r\n")
+
+    return Response(generate(), mimetype="multipart/x-mixed-replace; boundary=frame",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+# === Detector health metrics ===
+# Detectors POST a snapshot every few seconds (see metrics.MetricsPublisher)
+metrics_registry = MetricsRegistry()
+
+@app.route("/internal/metrics", methods=["POST"])
+def ingest_metrics():
+    if request.remote_addr not in ("127.0.0.1", "::1"):
+        return "Forbidden", 403
+    snapshot = request.get_json(silent=True)
+    if not snapshot or "location_id" not in snapshot:
+        return "Bad Request", 400
+    metrics_registry.update(snapshot)
+    return "", 204
+
+@app.route("/metrics")
+def prometheus_metrics():
+    return Response(metrics_registry.render_prometheus(), mimetype="text/plain; version=0.0.4")
+
+@app.route("/api/health")
+def all_health():
+    return jsonify([metrics_registry.health(location_id) for location_id in LOCATIONS])
+
+@app.route("/api/<location_id>/health")
+def location_health(location_id):
+    return jsonify(metrics_registry.health(location_id))
 
 # Helper function to find a free port
 def find_free_port():
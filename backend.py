@@ -1,13 +1,25 @@
+import argparse
 import cv2
-from ultralytics import YOLO
 import numpy as np
-import datetime
 import csv
 import os
 import time
-import torch
 import sqlite3
 
+from counting import CountingEngine
+from event_writer import EventWriter
+from inference import add_backend_arguments, load_model
+from live_events import EventPublisher
+from live_view import LiveFrameWriter
+from metrics import DetectorMetrics, MetricsPublisher
+import storage
+from runtime import ThroughputLogger, install_shutdown_handler
+from motion_gate import MotionGate
+from propagation import TrackPropagator, add_detect_every_argument
+from roi import RegionOfInterest
+from track_state import TrackStore
+from video_input import add_decoder_arguments, open_video
+
 # === CONFIGURATION ===
 VIDEO_PATH = r"clip.mp4"
 MODEL_PATH = r"yolov8m.pt"  # Medium model
@@ -19,28 +31,49 @@ LINE_START = (100, 180)
 LINE_END = (700, 50)
 OFFSET = 15
 
+# Count lines and zones; add one entry per lane as needed
+COUNT_LINES = [{"name": "main", "start": LINE_START, "end": LINE_END}]
+COUNT_ZONES = []
+TARGET_CLASSES = ["car", "motorcycle", "truck", "bus"]
+
 CONFIDENCE_THRESHOLD = 0.3
-FRAME_SKIP = 3
-RESIZE_WIDTH = 960
+FRAME_SKIP = 3  # skipped frames are never converted or scaled (see video_input.py)
+RESIZE_WIDTH = 960  # the decoder scales to this size
 RESIZE_HEIGHT = 540
 
+# Event writer: commit every WRITE_BATCH_SIZE events or WRITE_MAX_DELAY seconds
+WRITE_BATCH_SIZE = 500
+WRITE_MAX_DELAY = 1.0
+WRITE_DURABILITY = "normal"  # "fast", "normal" or "full", see event_writer.py
+PUBLISH_LIVE_EVENTS = True  # push counts to the dashboard (app.py) as they happen
+PUBLISH_METRICS = True  # report health metrics to the dashboard (/metrics, /api/<location>/health)
+LIVE_VIEW = True  # annotated video for the dashboard's live view, drawn only while someone watches
+LIVE_VIEW_MAX_FPS = 10
+
+# Headless mode: no window (drawing only for the live view), stop with SIGINT/SIGTERM, log throughput instead
+HEADLESS = False  # or pass --headless
+STATS_INTERVAL = 30
+TRACK_TTL_FRAMES = 300  # forget tracks not seen for this many frames
+MOTION_GATE = True  # skip YOLO on frames with no motion near the count lines
+MOTION_MARGIN = 40  # pixels either side of a count line watched for motion
+DETECT_EVERY = 1  # YOLO on every Nth kept frame, optical flow in between (see propagation.py); or pass --detect-every
+ROI = None  # [x1, y1, x2, y2] or [[x, y], ...] around the count lines; None = whole frame
+INFERENCE_BACKEND = "pytorch"  # "pytorch", "onnx" or "openvino", see inference.py
+INT8 = False  # use the INT8-quantized export
+
+parser = argparse.ArgumentParser(description="Count vehicles in a video file.")
+parser.add_argument("--headless", action="store_true", default=HEADLESS,
+                    help="no window; draw only for the dashboard's live view (for servers)")
+add_backend_arguments(parser, INFERENCE_BACKEND, INT8)
+add_decoder_arguments(parser)
+add_detect_every_argument(parser, DETECT_EVERY)
+args = parser.parse_args()
+
 # === DATABASE SETUP ===
 def init_database():
     """Initialize database with the same schema as app.py"""
     conn = sqlite3.connect(DB_FILENAME)
-    cursor = conn.cursor()
-    
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS vehicles (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            timestamp TEXT NOT NULL,
-            vehicle_type TEXT NOT NULL,
-            vehicle_id INTEGER,
-            location_id TEXT NOT NULL
-        )
-    """)
-    
-    conn.commit()
+    storage.init_database(conn)
     conn.close()
 
 def get_current_location():
@@ -58,25 +91,9 @@ def get_current_location():
     return "Basni Crossing"
 
 def log_vehicle_to_database(vehicle_type, vehicle_id, location_id):
-    """Log vehicle detection to SQLite database"""
-    try:
-        conn = sqlite3.connect(DB_FILENAME)
-        cursor = conn.cursor()
-        
-        timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        
-        cursor.execute("""
-            INSERT INTO vehicles (timestamp, vehicle_type, vehicle_id, location_id)
-            VALUES (?, ?, ?, ?)
-        """, (timestamp, vehicle_type, vehicle_id, location_id))
-        
-        conn.commit()
-        conn.close()
-        
-        print(f"✅ Logged to database: {vehicle_type} (ID: {vehicle_id}) at {location_id}")
-        
-    except Exception as e:
-        print(f"❌ Error logging to database: {e}")
+    """Queue a vehicle detection for the background database/CSV writer"""
+    event_writer.submit(storage.now_ts(), vehicle_type, vehicle_id, location_id)
+    print(f"✅ Logged to database: {vehicle_type} (ID: {vehicle_id}) at {location_id}")
 
 def map_vehicle_class(original_class):
     """Map YOLO classes to dashboard classes"""
@@ -89,51 +106,62 @@ def map_vehicle_class(original_class):
     return mapping.get(original_class, original_class.lower())
 
 # === INIT ===
-print("CUDA Available:", torch.cuda.is_available())  # Check if GPU is being used
-
 # Initialize database
 init_database()
 current_location = get_current_location()
 print(f"🎯 Current active location: {current_location}")
 
-model = YOLO(MODEL_PATH)
-cap = cv2.VideoCapture(VIDEO_PATH)
-cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+model = load_model(MODEL_PATH, args.backend, int8=args.int8, data=args.data)
+video = open_video(VIDEO_PATH, size=(RESIZE_WIDTH, RESIZE_HEIGHT), stride=FRAME_SKIP,
+                   threads=args.decode_threads, decoder=args.decoder)
 
 count_cars = count_bikes = count_trucks = 0
-counted_ids = set()
-object_memory = {}  # {vehicle_id: (prev_center_x, prev_center_y)}
+track_state = TrackStore(max_age_frames=TRACK_TTL_FRAMES)  # last centre and counted flag per track id
 frame_count = 0
+frames_before_rewind = 0  # keeps frame_count increasing across restarts of the video
+
+# CSV Logging (keeping for backup); rows are appended by the event writer
+with open(CSV_FILENAME, mode='w', newline='') as csv_file:
+    csv.writer(csv_file).writerow(["Timestamp", "Vehicle Type", "Vehicle ID", "Location"])
 
-# CSV Logging (keeping for backup)
-csv_file = open(CSV_FILENAME, mode='w', newline='')
-csv_writer = csv.writer(csv_file)
-csv_writer.writerow(["Timestamp", "Vehicle Type", "Vehicle ID", "Location"])
+metrics = DetectorMetrics(current_location)
+event_writer = EventWriter(DB_FILENAME, csv_path=CSV_FILENAME, max_batch=WRITE_BATCH_SIZE,
+                           max_delay=WRITE_MAX_DELAY, durability=WRITE_DURABILITY,
+                           publisher=EventPublisher().start() if PUBLISH_LIVE_EVENTS else None,
+                           metrics=metrics).start()
+metrics.event_writer = event_writer
+metrics_publisher = MetricsPublisher(metrics).start() if PUBLISH_METRICS else None
+live_view = (LiveFrameWriter(current_location, size=(RESIZE_HEIGHT, RESIZE_WIDTH), max_fps=LIVE_VIEW_MAX_FPS).open()
+             if LIVE_VIEW else None)
 
-# === CROSS LINE DETECTION FUNCTION ===
-def crossed_line(prev, curr, line_start, line_end):
-    def ccw(A, B, C):
-        return (C[1] - A[1]) * (B[0] - A[0]) > (B[1] - A[1]) * (C[0] - A[0])
-    return ccw(line_start, prev, curr) != ccw(line_end, prev, curr) and \
-           ccw(line_start, line_end, prev) != ccw(line_start, line_end, curr)
+# === LINE / ZONE COUNTING ===
+counter = CountingEngine(COUNT_LINES, COUNT_ZONES)
+target_class_ids = [cls_id for cls_id, name in model.names.items() if name in TARGET_CLASSES]
+motion_gate = MotionGate(counter, margin=MOTION_MARGIN) if MOTION_GATE else None
+roi = RegionOfInterest(ROI) if ROI else None
+roi_imgsz = {"imgsz": roi.imgsz} if roi else {}  # smaller letterbox for the crop
+propagator = TrackPropagator(args.detect_every) if args.detect_every > 1 else None
 
 # === MAIN LOOP ===
 start_time = time.time()
 last_location_check = time.time()
+stop_event = install_shutdown_handler()
+throughput = ThroughputLogger("Detection", interval=STATS_INTERVAL)
 
 print("🚀 Starting vehicle detection...")
-print("Press ESC to stop")
+print("Send SIGINT/SIGTERM to stop" if args.headless else "Press ESC to stop")
 
-while True:
-    ret, frame = cap.read()
-    if not ret:
+while not stop_event.is_set():
+    frame_index, frame = video.read()  # every FRAME_SKIP-th frame, already RESIZE_WIDTH x RESIZE_HEIGHT
+    if frame is None:
         print("🔄 Video ended, restarting...")
-        cap.set(cv2.CAP_PROP_POS_FRAMES, 0)  # Restart video
+        frames_before_rewind = frame_count
+        video.rewind()  # Restart video
+        if propagator is not None:
+            propagator.reset()
         continue
 
-    frame_count += 1
-    if frame_count % FRAME_SKIP != 0:
-        continue  # Skip frames to speed up
+    frame_count = frames_before_rewind + frame_index + 1
 
     # Check for location changes every 5 seconds
     current_time = time.time()
@@ -141,59 +169,87 @@ while True:
         new_location = get_current_location()
         if new_location != current_location:
             current_location = new_location
+            metrics.location_id = current_location
+            if live_view is not None:
+                live_view.retarget(current_location)
             print(f"📍 Location changed to: {current_location}")
         last_location_check = current_time
 
-    frame = cv2.resize(frame, (RESIZE_WIDTH, RESIZE_HEIGHT))
+    metrics.frame()
+    publish_frame = live_view is not None and live_view.wants_frame()
+    draw = publish_frame or not args.headless
 
-    # Run YOLO tracking
-    results = model.track(frame, persist=True, conf=0.25, tracker="bytetrack.yaml")
+    # Run YOLO tracking, unless nothing is moving near the count line; with --detect-every, flow carries tracks
+    # through the frames in between
+    tracks = None  # (ids, coords, classes) of this frame's vehicles
+    if motion_gate is not None and not motion_gate.check(frame):
+        metrics.skipped()
+        if propagator is not None:
+            propagator.reset()
+    elif propagator is not None and not propagator.due():
+        tracks = propagator.propagate(frame)
+    else:
+        inference_started = time.perf_counter()
+        results = model.track(roi.crop(frame) if roi else frame, persist=True, conf=0.25, tracker="bytetrack.yaml",
+                              verbose=not args.headless, **roi_imgsz)
+        metrics.inference(time.perf_counter() - inference_started)
+        if results and results[0].boxes.id is not None:
+            boxes = results[0].boxes
+            ids = boxes.id.cpu().numpy()
+            classes = boxes.cls.cpu().numpy()
+            coords = boxes.xyxy.cpu().numpy()
+            if roi:
+                coords = roi.to_frame(coords)  # back to full-frame coordinates
+            confs = boxes.conf.cpu().numpy()
 
-    if results[0].boxes.id is not None:
-        boxes = results[0].boxes
-        ids = boxes.id.cpu().numpy()
-        classes = boxes.cls.cpu().numpy()
-        coords = boxes.xyxy.cpu().numpy()
-        confs = boxes.conf.cpu().numpy()
+            keep = np.isin(classes, target_class_ids) & (confs > 0.25)
+            tracks = ids[keep], coords[keep], classes[keep]
+        if propagator is not None:
+            tracks = propagator.detected(frame, *(tracks or (np.empty(0), np.empty((0, 4)), np.empty(0))))
 
-        for box_id, cls, coord, conf in zip(ids, classes, coords, confs):
-            x1, y1, x2, y2 = coord
-            center_x = int((x1 + x2) / 2)
-            center_y = int((y1 + y2) / 2)
-            label = model.names[int(cls)]
+    if tracks is not None:
+        ids, coords, classes = tracks
+        centers = (coords[:, :2] + coords[:, 2:]) / 2
+        prev_centers = track_state.update(ids, centers, frame=frame_count)
 
-            if label in ["car", "motorcycle", "truck", "bus"] and conf > 0.25:
+        if draw:
+            for box_id, cls, coord in zip(ids, classes, coords):
+                x1, y1, x2, y2 = coord
                 cv2.rectangle(frame, (int(x1), int(y1)), (int(x2), int(y2)), (0, 255, 0), 2)
-                cv2.putText(frame, f"{label}-{int(box_id)}", (int(x1), int(y1) - 10),
+                cv2.putText(frame, f"{model.names[int(cls)]}-{int(box_id)}", (int(x1), int(y1) - 10),
                             cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 0), 2)
 
-                prev_center = object_memory.get(box_id, (center_x, center_y))
-                object_memory[box_id] = (center_x, center_y)
-
-                if crossed_line(prev_center, (center_x, center_y), LINE_START, LINE_END) and box_id not in counted_ids:
-                    counted_ids.add(box_id)
-                    
-                    # Map the vehicle class for database consistency
-                    mapped_class = map_vehicle_class(label)
-                    
-                    # Log to database
-                    log_vehicle_to_database(mapped_class, int(box_id), current_location)
-                    
-                    # Log to CSV (backup)
-                    timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                    csv_writer.writerow([timestamp, mapped_class, int(box_id), current_location])
-                    csv_file.flush()
-
-                    # Update local counters for display
-                    if label == "car":
-                        count_cars += 1
-                    elif label == "motorcycle":
-                        count_bikes += 1
-                    elif label == "truck":
-                        count_trucks += 1
+        for row, line_name, direction in counter.crossings(prev_centers, centers):
+            box_id = ids[row]
+            if track_state.is_counted(box_id):
+                continue
+            track_state.mark_counted(box_id)
+            label = model.names[int(classes[row])]
+
+            # Map the vehicle class for database consistency
+            mapped_class = map_vehicle_class(label)
+
+            # Log to database and CSV (backup)
+            log_vehicle_to_database(mapped_class, int(box_id), current_location)
+            metrics.counted()
+            print(f"↕ {mapped_class}-{int(box_id)} crossed {line_name} ({direction})")
+
+            # Update local counters for display
+            if label == "car":
+                count_cars += 1
+            elif label == "motorcycle":
+                count_bikes += 1
+            elif label == "truck":
+                count_trucks += 1
+
+    throughput.tick()
+    if not draw:
+        continue
 
     # === Draw Line and Info ===
-    cv2.line(frame, LINE_START, LINE_END, (0, 0, 255), 2)
+    counter.draw(frame)
+    if roi:
+        roi.draw(frame)
     cv2.putText(frame, f"Cars: {count_cars} | Bikes: {count_bikes} | Trucks: {count_trucks}",
                 (20, 40), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 255), 2)
 
@@ -206,12 +262,28 @@ while True:
     fps = int(frame_count / elapsed_time)
     cv2.putText(frame, f"FPS: {fps}", (20, 80), cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 255, 0), 2)
 
+    if publish_frame:
+        live_view.publish(frame)
+    if args.headless:
+        continue
+
     cv2.imshow("Vehicle Detection & Counting", frame)
     if cv2.waitKey(1) & 0xFF == 27:  # ESC key to quit
         break
 
 # === CLEANUP ===
-cap.release()
-csv_file.close()
-cv2.destroyAllWindows()
+video.release()
+event_writer.close()
+if metrics_publisher is not None:
+    metrics_publisher.close()
+if live_view is not None:
+    live_view.close()
+if motion_gate is not None:
+    print(f"💤 Motion gate skipped {motion_gate.frames_skipped}/{motion_gate.frames_checked} frames "
+          f"({motion_gate.skip_ratio:.0%})")
+if propagator is not None:
+    print(f"🔁 Optical flow carried tracks through {propagator.frames_propagated} frames, "
+          f"{propagator.handoffs} ids handed off")
+if not args.headless:
+    cv2.destroyAllWindows()
 print("✅ Detection stopped. Data saved to database and CSV file.")
@@ -0,0 +1,179 @@
+"""Dashboard API latency under parallel clients while detectors insert at full rate.
+
+Usage:
+    python benchmarks/bench_api_load.py --clients 32 --duration 20 --writers 3 --json results/api_load.json
+
+A scratch database is seeded with --seed-events events over the last --days
+days. Then, while --writers processes insert events as fast as EventWriter
+commits them, the API is served by the Flask app (threaded, in its own process)
+and hammered by --clients threads requesting /traffic/all, /traffic/summary and
+/traffic/hourly for random ranges. This runs twice: with a fresh connection per
+request (POOLED_CONNECTIONS = False) and with the read-only connection pool. The
+p50/p95/p99 latency and throughput of each run are reported.
+"""
+import argparse
+import datetime
+import json
+import logging
+import multiprocessing
+import os
+import random
+import socket
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from event_writer import EventWriter  # noqa: E402
+from storage import now_ts  # noqa: E402
+
+LOCATIONS = ("Basni Crossing", "Bhagat ki kothi crossing", "Rai ka bagh crossing")
+VEHICLE_TYPES = ("car", "motorcycle", "truck", "bus")
+RANGES_DAYS = (1, 1, 7, 30)
+
+
+def seed(db_path, events, days):
+    writer = EventWriter(db_path, max_batch=5000).start()
+    now = now_ts()
+    for i in range(events):
+        writer.submit(now - random.randrange(days * 86400), VEHICLE_TYPES[i % 4], i, LOCATIONS[i % 3])
+    writer.close()
+
+
+def write_events(scratch, location, stop, written):
+    """Detector stand-in: submit events as fast as the writer takes them."""
+    os.chdir(scratch)
+    writer = EventWriter("vehicle_data.db", max_delay=0.2).start()
+    count = 0
+    while not stop.is_set():
+        writer.submit(now_ts(), VEHICLE_TYPES[count % 4], count, location)
+        count += 1
+    writer.close()
+    written.value = writer.events_written
+
+
+def serve(scratch, pooled, port):
+    os.chdir(scratch)
+    from werkzeug.serving import make_server
+
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)  # no per-request log lines
+    import app
+    app.POOLED_CONNECTIONS = pooled
+    make_server("127.0.0.1", port, app.app, threaded=True).serve_forever()
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_for(url, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            urllib.request.urlopen(url, timeout=1).read()
+            return
+        except (urllib.error.URLError, OSError):
+            time.sleep(0.2)
+    sys.exit(f"❌ Server at {url} did not come up")
+
+
+def random_path():
+    location = urllib.parse.quote(random.choice(LOCATIONS))
+    end = datetime.date.today() - datetime.timedelta(days=random.choice((0, 0, 0, 3, 20)))
+    start = end - datetime.timedelta(days=random.choice(RANGES_DAYS) - 1)
+    endpoint = random.choice(("all", "all", "summary", "hourly"))
+    return f"/api/{location}/traffic/{endpoint}?start={start}&end={end}"
+
+
+def run_clients(base_url, clients, duration):
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+    deadline = time.time() + duration
+
+    def client():
+        mine = []
+        while time.time() < deadline:
+            started = time.perf_counter()
+            try:
+                urllib.request.urlopen(base_url + random_path(), timeout=30).read()
+            except (urllib.error.URLError, OSError):
+                with lock:
+                    errors[0] += 1
+                continue
+            mine.append(time.perf_counter() - started)
+        with lock:
+            latencies.extend(mine)
+
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    ms = np.array(latencies) * 1000
+    p50, p95, p99 = np.percentile(ms, [50, 95, 99]) if len(ms) else (0, 0, 0)
+    return {"requests": len(latencies), "errors": errors[0], "requests_per_second": round(len(latencies) / duration, 1),
+            "p50_ms": round(float(p50), 2), "p95_ms": round(float(p95), 2), "p99_ms": round(float(p99), 2)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=15.0, help="seconds per run")
+    parser.add_argument("--writers", type=int, default=3, help="detector processes inserting events")
+    parser.add_argument("--seed-events", type=int, default=200000)
+    parser.add_argument("--days", type=int, default=90)
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    context = multiprocessing.get_context("spawn")
+    results = {}
+    with tempfile.TemporaryDirectory() as scratch:
+        seed(os.path.join(scratch, "vehicle_data.db"), args.seed_events, args.days)
+        print(f"🌱 Seeded {args.seed_events} events over {args.days} days")
+
+        for mode, pooled in (("per_request", False), ("pooled", True)):
+            stop = context.Event()
+            written = [context.Value("q", 0) for _ in range(args.writers)]
+            writers = [context.Process(target=write_events, args=(scratch, LOCATIONS[i % 3], stop, written[i]))
+                       for i in range(args.writers)]
+            port = free_port()
+            server = context.Process(target=serve, args=(scratch, pooled, port), daemon=True)
+            server.start()
+            wait_for(f"http://127.0.0.1:{port}/api/health")
+            for writer in writers:
+                writer.start()
+            time.sleep(1)  # let the writers reach full rate
+
+            result = run_clients(f"http://127.0.0.1:{port}", args.clients, args.duration)
+            stop.set()
+            for writer in writers:
+                writer.join()
+            server.terminate()
+            server.join()
+            result["events_written_per_second"] = round(sum(value.value for value in written) / (args.duration + 1))
+            results[mode] = result
+            print(f"📊 {mode:>11}: {result['requests_per_second']:7.1f} req/s  p50 {result['p50_ms']:7.2f} ms  "
+                  f"p95 {result['p95_ms']:7.2f} ms  p99 {result['p99_ms']:7.2f} ms  {result['errors']} errors  "
+                  f"({result['events_written_per_second']} events/s written)")
+
+    before, after = results["per_request"]["p99_ms"], results["pooled"]["p99_ms"]
+    if before:
+        print(f"📈 p99 {before:.2f} ms -> {after:.2f} ms ({after / before - 1:+.0%})")
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({"clients": args.clients, "duration": args.duration, "writers": args.writers,
+                       "seed_events": args.seed_events, "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""Compare inference backends on latency and counts.
+
+Usage:
+    python benchmarks/bench_backends.py --video clip.mp4 --weights yolov8n.pt \\
+        --backends pytorch onnx onnx-int8 openvino openvino-int8 --data coco8.yaml
+
+Every backend tracks and counts the same decoded frames. Per-frame model.track
+latency (p50/p95) is measured after warm-up, and counts are compared with the
+first backend listed, which is the reference.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from counting import CountingEngine  # noqa: E402
+from inference import load_model  # noqa: E402
+from track_state import TrackStore  # noqa: E402
+
+
+def load_frames(video_path, count, width=640, height=480):
+    cap = cv2.VideoCapture(video_path)
+    frames = []
+    while len(frames) < count:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        frames.append(cv2.resize(frame, (width, height)))
+    cap.release()
+    if not frames:
+        sys.exit(f"❌ Could not read frames from {video_path}")
+    return frames
+
+
+def run(model, frames, counter, conf):
+    track_state = TrackStore()
+    counts = {}
+    latencies = []
+    for frame_index, frame in enumerate(frames):
+        started = time.perf_counter()
+        boxes = model.track(frame, persist=True, conf=conf, tracker="bytetrack.yaml", verbose=False)[0].boxes
+        latencies.append(time.perf_counter() - started)
+        if boxes.id is None:
+            continue
+        ids = boxes.id.cpu().numpy()
+        classes = boxes.cls.cpu().numpy()
+        coords = boxes.xyxy.cpu().numpy()
+        centers = (coords[:, :2] + coords[:, 2:]) / 2
+        prev_centers = track_state.update(ids, centers, frame=frame_index)
+        for row, _, _ in counter.crossings(prev_centers, centers):
+            if track_state.is_counted(ids[row]):
+                continue
+            track_state.mark_counted(ids[row])
+            label = model.names[int(classes[row])]
+            counts[label] = counts.get(label, 0) + 1
+    latencies = np.array(latencies) * 1000
+    return {
+        "p50_ms": round(float(np.percentile(latencies, 50)), 2),
+        "p95_ms": round(float(np.percentile(latencies, 95)), 2),
+        "fps": round(len(frames) / latencies.sum() * 1000, 2),
+        "counts": counts,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--video", default="clip.mp4")
+    parser.add_argument("--weights", default="yolov8n.pt")
+    parser.add_argument("--backends", nargs="+", default=["pytorch", "onnx", "onnx-int8", "openvino"],
+                        help="backend names, with -int8 for the quantized export")
+    parser.add_argument("--data", help="dataset YAML whose images calibrate INT8")
+    parser.add_argument("--frames", type=int, default=500)
+    parser.add_argument("--conf", type=float, default=0.5)
+    parser.add_argument("--line", nargs=4, type=int, default=[0, 420, 640, 420], metavar=("X1", "Y1", "X2", "Y2"))
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    frames = load_frames(args.video, args.frames)
+    counter = CountingEngine([{"name": "main", "start": args.line[:2], "end": args.line[2:]}])
+
+    results = {}
+    for name in args.backends:
+        backend, _, quantized = name.partition("-")
+        model = load_model(args.weights, backend, int8=quantized == "int8", data=args.data)
+        results[name] = run(model, frames, counter, args.conf)
+
+    reference = results[args.backends[0]]["counts"]
+    reference_total = sum(reference.values())
+    for name, result in results.items():
+        total = sum(result["counts"].values())
+        result["count_difference"] = total - reference_total
+        result["per_class_difference"] = {label: result["counts"].get(label, 0) - reference.get(label, 0)
+                                          for label in sorted(set(reference) | set(result["counts"]))}
+        print(f"📊 {name:>14}: p50 {result['p50_ms']:7.2f} ms  p95 {result['p95_ms']:7.2f} ms  "
+              f"{result['fps']:6.1f} frames/s  {total} vehicles ({result['count_difference']:+d})")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({"video": args.video, "weights": args.weights, "frames": len(frames), "results": results},
+                      f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""Decode CPU per camera: the old read-then-resize loop against video_input's readers.
+
+Usage:
+    python benchmarks/bench_decode.py --video clip.mp4 --size 960 540 --stride 3 --json results/decode.json
+
+Modes, each reading the same clips at --size, keeping every --stride-th frame:
+
+    read_resize   cv2.VideoCapture.read() on every frame, cv2.resize on the kept
+                  ones (what backend.py and trained.py did)
+    opencv        video_input with OpenCV: strided-over frames only grab()bed
+    pyav          video_input with PyAV: threaded decode, swscale scaling,
+                  B-frames skipped when striding (needs ``pip install av``)
+
+CPU time covers all of the process's threads. "cpu_per_camera" is CPU seconds
+per second of video, i.e. the share of one core a real-time camera of that
+kind costs just to decode. Each mode runs --repeat times; the fastest run
+counts.
+"""
+import argparse
+import importlib.util
+import json
+import os
+import sys
+import time
+
+import cv2
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from video_input import open_video  # noqa: E402
+
+MODES = ("read_resize", "opencv", "pyav")
+
+
+def read_resize(path, size, stride):
+    """The loop video_input replaced: yields (frame_index, frame) like a reader."""
+    cap = cv2.VideoCapture(path)
+    index = -1
+    while True:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        index += 1
+        if index % stride == 0:
+            yield index, cv2.resize(frame, size)
+    cap.release()
+
+
+def reader_frames(path, size, stride, threads, decoder):
+    reader = open_video(path, size=size, stride=stride, threads=threads, decoder=decoder)
+    if not reader.isOpened():
+        sys.exit(f"❌ Could not open {path}")
+    while True:
+        index, frame = reader.read()
+        if frame is None:
+            break
+        yield index, frame
+    reader.release()
+
+
+def clip_length(path):
+    """``(frames, seconds)`` of a clip, from its container."""
+    cap = cv2.VideoCapture(path)
+    frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    seconds = frames / (cap.get(cv2.CAP_PROP_FPS) or 25.0)
+    cap.release()
+    return frames, seconds
+
+
+def run(mode, paths, size, stride, threads):
+    frames = 0
+    cpu_started, wall_started = time.process_time(), time.perf_counter()
+    for path in paths:
+        if mode == "read_resize":
+            clip = read_resize(path, size, stride)
+        else:
+            clip = reader_frames(path, size, stride, threads, mode)
+        for _ in clip:
+            frames += 1
+    cpu, wall = time.process_time() - cpu_started, time.perf_counter() - wall_started
+    lengths = [clip_length(path) for path in paths]
+    source_frames = sum(length[0] for length in lengths)
+    video_seconds = sum(length[1] for length in lengths)
+    return {
+        "frames_kept": frames,
+        "source_frames": source_frames,
+        "cpu_seconds": round(cpu, 3),
+        "wall_seconds": round(wall, 3),
+        "cpu_ms_per_kept_frame": round(cpu / frames * 1000, 3) if frames else None,
+        "cpu_per_camera": round(cpu / video_seconds, 3) if video_seconds else None,
+        "realtime_factor": round(video_seconds / wall, 2) if wall else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--video", action="append", required=True, help="clip to decode (repeatable)")
+    parser.add_argument("--size", nargs=2, type=int, default=[960, 540], metavar=("W", "H"))
+    parser.add_argument("--stride", type=int, default=3, help="keep every Nth frame (FRAME_SKIP)")
+    parser.add_argument("--threads", type=int, default=0, help="decoder threads; 0 = one per core")
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=list(MODES))
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    size = tuple(args.size)
+    modes = list(args.modes)
+    if "pyav" in modes and importlib.util.find_spec("av") is None:
+        print("⏭️ pyav: not installed (pip install av)")
+        modes.remove("pyav")
+    # Modes take turns, so drift in CPU clock or load affects all of them alike
+    runs = {mode: [] for mode in modes}
+    for _ in range(args.repeat):
+        for mode in modes:
+            runs[mode].append(run(mode, args.video, size, args.stride, args.threads))
+    results = {}
+    for mode in modes:
+        results[mode] = best = min(runs[mode], key=lambda result: result["cpu_seconds"])
+        print(f"📊 {mode:>11}: {best['frames_kept']} of {best['source_frames']} frames, "
+              f"{best['cpu_ms_per_kept_frame']:6.2f} ms CPU per frame kept, "
+              f"{best['cpu_per_camera']:.1%} of a core per camera, {best['realtime_factor']}x real time")
+
+    baseline = results.get("read_resize")
+    if baseline:
+        for mode, result in results.items():
+            if mode != "read_resize":
+                saved = 1 - result["cpu_per_camera"] / baseline["cpu_per_camera"]
+                print(f"📈 {mode}: {saved:+.0%} decode CPU saved per camera vs read_resize")
+    if args.json:
+        os.makedirs(os.path.dirname(os.path.abspath(args.json)), exist_ok=True)
+        with open(args.json, 'w') as f:
+            json.dump({"videos": args.video, "size": args.size, "stride": args.stride, "threads": args.threads,
+                       "cpus": os.cpu_count(), "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+"""Counting accuracy and CPU of --detect-every N against YOLO on every frame.
+
+Usage:
+    python benchmarks/bench_detect_every.py --video clip1.mp4 --video clip2.mp4 --every 2 3 4 --json results/every.json
+
+Every clip is tracked and counted from the same decoded frames in these modes:
+
+    every_frame     YOLO + ByteTrack on every frame: the reference counts
+    skip_N          YOLO on every Nth frame only, crossings tested on those
+                    frames (what FRAME_SKIP = N does)
+    propagate_N     YOLO on every Nth frame, TrackPropagator carrying the
+                    tracks through the frames in between, crossings tested on
+                    every frame (--detect-every N)
+
+"count_error" is the sum over classes of |counts - reference counts|, across
+all clips, so a missed car and an extra truck do not cancel out. CPU time is
+process time (all threads).
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from counting import CountingEngine  # noqa: E402
+from propagation import TrackPropagator  # noqa: E402
+from track_state import TrackStore  # noqa: E402
+
+
+def load_frames(video_path, count, width=640, height=480):
+    cap = cv2.VideoCapture(video_path)
+    frames = []
+    while len(frames) < count:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        frames.append(cv2.resize(frame, (width, height)))
+    cap.release()
+    if not frames:
+        sys.exit(f"❌ Could not read frames from {video_path}")
+    return frames
+
+
+def run(model, frames, counter, conf, every, propagate):
+    model.predictor = None  # fresh tracker state for each run
+    track_state = TrackStore()
+    propagator = TrackPropagator(every) if propagate else None
+    counts = {}
+    inference_calls = 0
+    flow_seconds = 0.0
+    cpu_start, wall_start = time.process_time(), time.perf_counter()
+    for frame_index, frame in enumerate(frames):
+        if propagator is not None and not propagator.due():
+            flow_started = time.perf_counter()
+            ids, coords, classes = propagator.propagate(frame)
+            flow_seconds += time.perf_counter() - flow_started
+        elif propagator is None and frame_index % every:
+            continue
+        else:
+            boxes = model.track(frame, persist=True, conf=conf, tracker="bytetrack.yaml", verbose=False)[0].boxes
+            inference_calls += 1
+            if boxes.id is None:
+                ids, coords, classes = np.empty(0), np.empty((0, 4)), np.empty(0)
+            else:
+                ids, coords, classes = boxes.id.cpu().numpy(), boxes.xyxy.cpu().numpy(), boxes.cls.cpu().numpy()
+            if propagator is not None:
+                ids, coords, classes = propagator.detected(frame, ids, coords, classes)
+        centers = (coords[:, :2] + coords[:, 2:]) / 2
+        prev_centers = track_state.update(ids, centers, frame=frame_index)
+        for row, _, _ in counter.crossings(prev_centers, centers):
+            if track_state.is_counted(ids[row]):
+                continue
+            track_state.mark_counted(ids[row])
+            label = model.names[int(classes[row])]
+            counts[label] = counts.get(label, 0) + 1
+    return {
+        "cpu_seconds": time.process_time() - cpu_start,
+        "wall_seconds": time.perf_counter() - wall_start,
+        "inference_calls": inference_calls,
+        "frames_propagated": propagator.frames_propagated if propagator else 0,
+        "flow_seconds": flow_seconds,
+        "handoffs": propagator.handoffs if propagator else 0,
+        "counts": counts,
+    }
+
+
+def add_up(runs):
+    """One result for all clips."""
+    total = {key: sum(run[key] for run in runs) for key in runs[0] if key != "counts"}
+    total["counts"] = {}
+    for run in runs:
+        for label, count in run["counts"].items():
+            total["counts"][label] = total["counts"].get(label, 0) + count
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--video", action="append", required=True, help="recorded clip (repeatable)")
+    parser.add_argument("--model", default="yolov8n.pt")
+    parser.add_argument("--frames", type=int, default=3000, help="frames to use from each clip")
+    parser.add_argument("--conf", type=float, default=0.5)
+    parser.add_argument("--line", nargs=4, type=int, default=[0, 420, 640, 420], metavar=("X1", "Y1", "X2", "Y2"))
+    parser.add_argument("--every", nargs="+", type=int, default=[2, 3, 4], help="values of N to try")
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    from ultralytics import YOLO
+    model = YOLO(args.model)
+    counter = CountingEngine([{"name": "main", "start": args.line[:2], "end": args.line[2:]}])
+    clips = [load_frames(path, args.frames) for path in args.video]
+    model.predict(np.zeros_like(clips[0][0]), verbose=False)  # warm-up
+
+    modes = {"every_frame": (1, False)}
+    for every in args.every:
+        modes[f"skip_{every}"] = (every, False)
+        modes[f"propagate_{every}"] = (every, True)
+    results = {name: add_up([run(model, frames, counter, args.conf, every, propagate) for frames in clips])
+               for name, (every, propagate) in modes.items()}
+
+    reference = results["every_frame"]
+    labels = set().union(*(result["counts"] for result in results.values()))
+    for name, result in results.items():
+        result["count_error"] = sum(abs(result["counts"].get(label, 0) - reference["counts"].get(label, 0))
+                                    for label in labels)
+        result["cpu_saved"] = round(1 - result["cpu_seconds"] / reference["cpu_seconds"], 3)
+        result["flow_ms_per_frame"] = (round(result["flow_seconds"] / result["frames_propagated"] * 1000, 2)
+                                       if result["frames_propagated"] else None)
+        for key in ("cpu_seconds", "wall_seconds", "flow_seconds"):
+            result[key] = round(result[key], 2)
+        flow = f", flow {result['flow_ms_per_frame']} ms/frame" if result["frames_propagated"] else ""
+        print(f"📊 {name:>12}: {sum(result['counts'].values())} counted ({result['count_error']} off the reference), "
+              f"{result['inference_calls']} YOLO calls, {result['cpu_seconds']}s CPU "
+              f"({result['cpu_saved']:+.0%} saved){flow}")
+    if args.json:
+        os.makedirs(os.path.dirname(os.path.abspath(args.json)), exist_ok=True)
+        with open(args.json, 'w') as f:
+            json.dump({"videos": args.video, "frames": [len(frames) for frames in clips], "line": args.line,
+                       "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""Compare the detector loop with and without per-frame drawing/display.
+
+Usage:
+    python benchmarks/bench_headless.py --video clip.mp4 --frames 300
+
+Both runs track the same decoded frames with the same model; the GUI run adds
+box/label/line drawing and, when a display is available, cv2.imshow + waitKey
+as detection.py does. Model loading and warm-up are excluded from the timings.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from counting import CountingEngine  # noqa: E402
+
+COUNT_LINES = [{"name": "main", "start": (0, 420), "end": (640, 420)}]
+
+
+def load_frames(video_path, count, width=640, height=480):
+    cap = cv2.VideoCapture(video_path)
+    frames = []
+    while len(frames) < count:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        frames.append(cv2.resize(frame, (width, height)))
+    cap.release()
+    if not frames:
+        sys.exit(f"❌ Could not read frames from {video_path}")
+    return frames
+
+
+def has_display():
+    return sys.platform.startswith("win") or bool(os.environ.get("DISPLAY") or os.environ.get("WAYLAND_DISPLAY"))
+
+
+def run(model, frames, conf, headless, show):
+    counter = CountingEngine(COUNT_LINES)
+    model.predictor = None  # fresh tracker state for each run
+    model.track(frames[0], persist=True, conf=conf, tracker="bytetrack.yaml", verbose=False)  # warm-up
+    start = time.perf_counter()
+    for frame in frames:
+        # Detection always works on a copy, as the GUI run draws into it
+        frame = frame.copy()
+        results = model.track(frame, persist=True, conf=conf, tracker="bytetrack.yaml", verbose=False)
+        if headless:
+            continue
+        boxes = results[0].boxes
+        if boxes.id is not None:
+            for box_id, cls, coord in zip(boxes.id.cpu().numpy(), boxes.cls.cpu().numpy(),
+                                          boxes.xyxy.cpu().numpy().astype(np.int32)):
+                x1, y1, x2, y2 = coord
+                cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 255, 0), 2)
+                cv2.putText(frame, f"{model.names[int(cls)]}-{int(box_id)}", (x1, y1 - 10),
+                            cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 0), 2)
+        counter.draw(frame)
+        cv2.putText(frame, "Cars: 0 | Bikes: 0 | Buses: 0 | Trucks: 0", (10, 30),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 255, 255), 2)
+        if show:
+            cv2.imshow("bench_headless", frame)
+            cv2.waitKey(1)
+    elapsed = time.perf_counter() - start
+    if show:
+        cv2.destroyAllWindows()
+    return len(frames) / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--video", default="clip.mp4")
+    parser.add_argument("--model", default="yolov8n.pt")
+    parser.add_argument("--frames", type=int, default=300)
+    parser.add_argument("--conf", type=float, default=0.5)
+    parser.add_argument("--no-display", action="store_true", help="draw but never call imshow")
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    from ultralytics import YOLO
+    model = YOLO(args.model)
+    frames = load_frames(args.video, args.frames)
+    show = has_display() and not args.no_display
+
+    gui_fps = run(model, frames, args.conf, headless=False, show=show)
+    headless_fps = run(model, frames, args.conf, headless=True, show=False)
+
+    results = {
+        "model": args.model,
+        "frames": len(frames),
+        "imshow": show,
+        "gui_fps": round(gui_fps, 2),
+        "headless_fps": round(headless_fps, 2),
+        "speedup": round(headless_fps / gui_fps, 2),
+    }
+    print(f"📊 With drawing{' + imshow' if show else ''}: {gui_fps:.1f} frames/s")
+    print(f"📊 Headless:            {headless_fps:.1f} frames/s ({results['speedup']}x)")
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""Throughput of rebuilding the database from CSV event logs.
+
+Usage:
+    python benchmarks/bench_import.py --rows 10000000 --months 6 --json results/import.json
+
+Writes a synthetic CSV in the detectors' format (--rows events spread over
+--months months and --locations locations), imports it into an empty scratch
+database with import_csv.py, then imports it a second time to check that
+re-running adds nothing. Reports rows per second for both runs and checks that
+the rebuilt daily rollups add up to the number of events.
+"""
+import argparse
+import csv
+import datetime
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from import_csv import import_csv  # noqa: E402
+from partitions import attach_months, list_partitions  # noqa: E402
+
+VEHICLE_TYPES = ("car", "motorcycle", "truck", "bus")
+
+
+def write_csv(path, rows, months, locations):
+    start = datetime.datetime(2024, 1, 1)
+    span = (datetime.datetime(2024 + months // 12, months % 12 + 1, 1) - start).total_seconds()
+    step = span / rows
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(["Timestamp", "Vehicle Type", "Vehicle ID", "Location ID"])
+        for i in range(rows):
+            stamp = (start + datetime.timedelta(seconds=int(i * step))).strftime("%Y-%m-%d %H:%M:%S")
+            writer.writerow([stamp, VEHICLE_TYPES[i % len(VEHICLE_TYPES)], i, f"Junction {i % locations}"])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=2000000)
+    parser.add_argument("--months", type=int, default=3)
+    parser.add_argument("--locations", type=int, default=3)
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as scratch:
+        csv_path = os.path.join(scratch, "vehicle_log_all.csv")
+        db_path = os.path.join(scratch, "vehicle_data.db")
+        started = time.perf_counter()
+        write_csv(csv_path, args.rows, args.months, args.locations)
+        print(f"📝 {args.rows} rows written to CSV in {time.perf_counter() - started:.1f}s "
+              f"({os.path.getsize(csv_path) / 2 ** 20:.0f} MiB)")
+
+        first = import_csv(db_path, [csv_path], verbose=False)
+        print(f"📊 Import into empty DB: {first['seconds']:.1f}s, {first['rows_per_second']} rows/s "
+              f"(staging {first['stage_seconds']:.1f}s)")
+        second = import_csv(db_path, [csv_path], verbose=False)
+        print(f"📊 Re-run (idempotent):  {second['seconds']:.1f}s, {second['rows_per_second']} rows/s, "
+              f"{second['rows_inserted']} rows inserted")
+
+        conn = sqlite3.connect(db_path)
+        attach_months(conn, list_partitions(db_path), db_path)
+        rollup_total = conn.execute("SELECT SUM(count) FROM vehicle_counts_daily").fetchone()[0]
+        conn.close()
+        db_size = sum(os.path.getsize(os.path.join(root, name))
+                      for root, _, names in os.walk(scratch) for name in names if name.endswith(".db"))
+
+    ok = first["rows_inserted"] == args.rows and second["rows_inserted"] == 0 and rollup_total == args.rows
+    print(f"{'✅' if ok else '❌'} {first['rows_inserted']} events imported, rollups total {rollup_total}, "
+          f"{db_size / 2 ** 20:.0f} MiB on disk; 10M rows would take "
+          f"~{10_000_000 / first['rows_per_second'] / 60:.1f} min")
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({"rows": args.rows, "months": args.months, "locations": args.locations,
+                       "first_import": first, "re_run": second, "rollup_total": rollup_total,
+                       "db_bytes": db_size}, f, indent=2)
+    if not ok:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""Measure CPU saved by the motion gate and whether counts change.
+
+Usage:
+    python benchmarks/bench_motion_gate.py --video clip.mp4 --line 0 420 640 420
+
+The clip is tracked and counted twice, once with YOLO on every frame and once
+behind the MotionGate, from the same decoded frames. CPU time is process time
+(all threads), so it reflects what a headless detector would use per core.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from counting import CountingEngine  # noqa: E402
+from motion_gate import MotionGate  # noqa: E402
+from track_state import TrackStore  # noqa: E402
+
+
+def load_frames(video_path, count, width=640, height=480):
+    cap = cv2.VideoCapture(video_path)
+    frames = []
+    while len(frames) < count:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        frames.append(cv2.resize(frame, (width, height)))
+    cap.release()
+    if not frames:
+        sys.exit(f"❌ Could not read frames from {video_path}")
+    return frames
+
+
+def run(model, frames, counter, conf, gated):
+    model.predictor = None  # fresh tracker state for each run
+    track_state = TrackStore()
+    motion_gate = MotionGate(counter) if gated else None
+    counts = {}
+    cpu_start, wall_start = time.process_time(), time.perf_counter()
+    for frame_index, frame in enumerate(frames):
+        if motion_gate is not None and not motion_gate.check(frame):
+            continue
+        boxes = model.track(frame, persist=True, conf=conf, tracker="bytetrack.yaml", verbose=False)[0].boxes
+        if boxes.id is None:
+            continue
+        ids = boxes.id.cpu().numpy()
+        classes = boxes.cls.cpu().numpy()
+        coords = boxes.xyxy.cpu().numpy()
+        centers = (coords[:, :2] + coords[:, 2:]) / 2
+        prev_centers = track_state.update(ids, centers, frame=frame_index)
+        for row, _, _ in counter.crossings(prev_centers, centers):
+            if track_state.is_counted(ids[row]):
+                continue
+            track_state.mark_counted(ids[row])
+            label = model.names[int(classes[row])]
+            counts[label] = counts.get(label, 0) + 1
+    return {
+        "cpu_seconds": round(time.process_time() - cpu_start, 2),
+        "wall_seconds": round(time.perf_counter() - wall_start, 2),
+        "skipped_frames": motion_gate.frames_skipped if motion_gate else 0,
+        "counts": counts,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--video", default="clip.mp4")
+    parser.add_argument("--model", default="yolov8n.pt")
+    parser.add_argument("--frames", type=int, default=1000)
+    parser.add_argument("--conf", type=float, default=0.5)
+    parser.add_argument("--line", nargs=4, type=int, default=[0, 420, 640, 420], metavar=("X1", "Y1", "X2", "Y2"))
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    from ultralytics import YOLO
+    model = YOLO(args.model)
+    frames = load_frames(args.video, args.frames)
+    counter = CountingEngine([{"name": "main", "start": args.line[:2], "end": args.line[2:]}])
+    model.predict(np.zeros_like(frames[0]), verbose=False)  # warm-up
+
+    every_frame = run(model, frames, counter, args.conf, gated=False)
+    gated = run(model, frames, counter, args.conf, gated=True)
+
+    saved = 1 - gated["cpu_seconds"] / every_frame["cpu_seconds"] if every_frame["cpu_seconds"] else 0.0
+    results = {"video": args.video, "frames": len(frames), "every_frame": every_frame, "motion_gated": gated,
+               "cpu_saved": round(saved, 3)}
+    print(f"📊 Every frame:  {every_frame['cpu_seconds']}s CPU, counts {every_frame['counts']}")
+    print(f"📊 Motion gated: {gated['cpu_seconds']}s CPU, counts {gated['counts']} "
+          f"({gated['skipped_frames']}/{len(frames)} frames skipped)")
+    print(f"📊 CPU saved: {saved:.0%}")
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
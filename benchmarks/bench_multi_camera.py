@@ -0,0 +1,129 @@
+"""Compare N separate single-camera processes with one batched multi-camera process.
+
+Usage:
+    python benchmarks/bench_multi_camera.py --video clip.mp4 --cameras 3 --frames 200
+
+Each simulated camera replays the same decoded frames so both modes do identical
+work. Model loading is excluded from the timings.
+
+Both modes get the same cores. Each separate process is limited to
+cores // cameras math-library threads and pinned to its own cores, as
+supervisor.py runs its workers (camera_worker.limit_threads); left at the
+default, every process would start a thread per core and the oversubscribed
+CPU would flatter the batched mode.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+
+import cv2
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from camera_worker import limit_threads  # noqa: E402
+from supervisor import available_cpus  # noqa: E402
+
+
+def load_frames(video_path, count, width=640, height=480):
+    cap = cv2.VideoCapture(video_path)
+    frames = []
+    while len(frames) < count:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        frames.append(cv2.resize(frame, (width, height)))
+    cap.release()
+    if not frames:
+        sys.exit(f"❌ Could not read frames from {video_path}")
+    return frames
+
+
+def _single_camera_worker(model_path, video_path, frame_count, conf, threads, cpus, result_queue):
+    limit_threads(threads, cpus)  # before torch is imported
+    import torch
+    from ultralytics import YOLO
+    cv2.setNumThreads(threads)
+    torch.set_num_threads(threads)
+    frames = load_frames(video_path, frame_count)
+    model = YOLO(model_path)
+    model.predict(frames[0], verbose=False)  # warm-up
+    start = time.perf_counter()
+    for frame in frames:
+        model.track(frame, persist=True, conf=conf, tracker="bytetrack.yaml", verbose=False)
+    result_queue.put((start, time.perf_counter()))
+
+
+def run_separate(model_path, video_path, frame_count, cameras, conf):
+    """One process and one model per camera, as with one detection.py per junction.
+
+    Returns ``(frames/s, threads per process)``.
+    """
+    cpus = available_cpus()
+    threads = max(1, len(cpus) // cameras)
+    # spawn: each worker imports torch fresh, after its thread limits are set
+    context = multiprocessing.get_context("spawn")
+    result_queue = context.Queue()
+    workers = []
+    for i in range(cameras):
+        worker_cpus = cpus[i * threads:(i + 1) * threads] if len(cpus) >= cameras else None
+        workers.append(context.Process(target=_single_camera_worker, args=(
+            model_path, video_path, frame_count, conf, threads, worker_cpus, result_queue)))
+    for worker in workers:
+        worker.start()
+    spans = [result_queue.get() for _ in workers]
+    for worker in workers:
+        worker.join()
+    wall = max(end for _, end in spans) - min(start for start, _ in spans)
+    return frame_count * cameras / wall, threads
+
+
+def run_batched(model_path, frames, cameras, conf):
+    """One process, one model, one batched predict call per round of camera frames."""
+    from ultralytics import YOLO
+
+    from multi_camera import infer_batch, make_tracker  # imports torch: kept out of the spawned workers
+    model = YOLO(model_path)
+    trackers = [make_tracker() for _ in range(cameras)]
+    model.predict([frames[0]] * cameras, verbose=False)  # warm-up
+    start = time.perf_counter()
+    for frame in frames:
+        infer_batch(model, [frame] * cameras, trackers, conf=conf)
+    return len(frames) * cameras / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--video", default="clip.mp4")
+    parser.add_argument("--model", default="yolov8n.pt")
+    parser.add_argument("--cameras", type=int, default=3)
+    parser.add_argument("--frames", type=int, default=200)
+    parser.add_argument("--conf", type=float, default=0.5)
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    frames = load_frames(args.video, args.frames)
+    separate_fps, threads = run_separate(args.model, args.video, len(frames), args.cameras, args.conf)
+    batched_fps = run_batched(args.model, frames, args.cameras, args.conf)
+
+    results = {
+        "model": args.model,
+        "cameras": args.cameras,
+        "frames_per_camera": len(frames),
+        "cores": len(available_cpus()),
+        "threads_per_separate_process": threads,
+        "separate_processes_fps": round(separate_fps, 2),
+        "batched_fps": round(batched_fps, 2),
+        "speedup": round(batched_fps / separate_fps, 2),
+    }
+    print(f"📊 {args.cameras} separate processes ({threads} threads each): {separate_fps:.1f} frames/s total")
+    print(f"📊 1 batched process:      {batched_fps:.1f} frames/s total ({results['speedup']}x)")
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,193 @@
+"""Per-stage benchmark of the detection pipeline on fixed recorded clips.
+
+Usage:
+    python benchmarks/bench_pipeline.py --video clip1.mp4 --video clip2.mp4 \\
+        --model yolov8n.pt --frame-skip 1 --json results/yolov8n.json
+    python benchmarks/bench_pipeline.py --video clip1.mp4 --baseline results/yolov8n.json
+
+Each processed frame is timed stage by stage, the way the detectors run it:
+
+    decode        cap.read() (plus cap.grab() for frames skipped by --frame-skip)
+    resize        cv2.resize to --resize
+    inference     model.predict
+    tracking      ByteTrack update
+    line_crossing track state update, CountingEngine.crossings, counted-id checks
+    persistence   EventWriter.submit for the frame's counts (into a scratch DB)
+
+and throughput plus p50/p95/p99 latency per stage are written as JSON together
+with the settings and machine they were measured on. With --baseline, stages
+whose p50 got slower by more than --tolerance exit non-zero.
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from counting import CountingEngine  # noqa: E402
+from event_writer import EventWriter  # noqa: E402
+from inference import BACKENDS, load_model  # noqa: E402
+from multi_camera import make_tracker  # noqa: E402
+from storage import now_ts  # noqa: E402
+from track_state import TrackStore  # noqa: E402
+
+STAGES = ("decode", "resize", "inference", "tracking", "line_crossing", "persistence")
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL,
+                                       cwd=os.path.dirname(os.path.abspath(__file__))).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_clip(path, model, counter, event_writer, timings, args):
+    cap = cv2.VideoCapture(path)
+    if not cap.isOpened():
+        sys.exit(f"❌ Could not open {path}")
+    tracker = make_tracker(frame_rate=max(1, round((cap.get(cv2.CAP_PROP_FPS) or 30) / args.frame_skip)))
+    track_state = TrackStore()
+    frames = vehicles = 0
+    clock = time.perf_counter
+
+    while frames < args.frames:
+        t0 = clock()
+        for _ in range(args.frame_skip - 1):
+            cap.grab()
+        ret, frame = cap.read()
+        t1 = clock()
+        if not ret:
+            break
+        frame = cv2.resize(frame, tuple(args.resize))
+        t2 = clock()
+        boxes = model.predict(frame, conf=args.conf, verbose=False)[0].boxes.cpu().numpy()
+        t3 = clock()
+        tracks = tracker.update(boxes, frame) if len(boxes) else np.empty((0, 8))
+        t4 = clock()
+        counted = []
+        if len(tracks):
+            track_ids = tracks[:, 4].astype(int)
+            centers = (tracks[:, :2] + tracks[:, 2:4]) / 2
+            prev_centers = track_state.update(track_ids, centers)
+            for row, _, _ in counter.crossings(prev_centers, centers):
+                if not track_state.is_counted(track_ids[row]):
+                    track_state.mark_counted(track_ids[row])
+                    counted.append((model.names[int(tracks[row, 6])], int(track_ids[row])))
+        t5 = clock()
+        ts = now_ts()
+        for label, track_id in counted:
+            event_writer.submit(ts, label, track_id, "benchmark")
+        t6 = clock()
+
+        for stage, seconds in zip(STAGES, (t1 - t0, t2 - t1, t3 - t2, t4 - t3, t5 - t4, t6 - t5)):
+            timings[stage].append(seconds)
+        frames += 1
+        vehicles += len(counted)
+    cap.release()
+    return frames, vehicles
+
+
+def summarize(samples, frames):
+    ms = np.array(samples) * 1000
+    p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+    return {"mean_ms": round(float(ms.mean()), 3), "p50_ms": round(float(p50), 3),
+            "p95_ms": round(float(p95), 3), "p99_ms": round(float(p99), 3),
+            "throughput_fps": round(frames / (ms.sum() / 1000), 1) if ms.sum() else None}
+
+
+def compare(results, baseline_path, tolerance):
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    regressions = []
+    for stage in STAGES:
+        old = baseline["stages"].get(stage, {}).get("p50_ms")
+        new = results["stages"][stage]["p50_ms"]
+        if not old:
+            continue
+        change = new / old - 1
+        flag = "  ⚠️ regression" if change > tolerance else ""
+        print(f"   {stage:>13}: {old:9.3f} -> {new:9.3f} ms ({change:+.0%}){flag}")
+        if flag:
+            regressions.append(stage)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--video", action="append", required=True, help="clip to run (repeatable)")
+    parser.add_argument("--model", default="yolov8n.pt")
+    parser.add_argument("--backend", choices=BACKENDS, default="pytorch")
+    parser.add_argument("--int8", action="store_true")
+    parser.add_argument("--data", help="dataset YAML whose images calibrate INT8")
+    parser.add_argument("--frames", type=int, default=1000, help="max processed frames per clip")
+    parser.add_argument("--frame-skip", type=int, default=1, help="process every Nth frame")
+    parser.add_argument("--resize", nargs=2, type=int, default=[640, 480], metavar=("W", "H"))
+    parser.add_argument("--conf", type=float, default=0.5)
+    parser.add_argument("--line", nargs=4, type=int, default=[0, 420, 640, 420], metavar=("X1", "Y1", "X2", "Y2"))
+    parser.add_argument("--json", help="write results to this file")
+    parser.add_argument("--baseline", help="earlier results JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="allowed p50 slowdown per stage")
+    args = parser.parse_args()
+
+    model = load_model(args.model, args.backend, int8=args.int8, data=args.data)
+    counter = CountingEngine([{"name": "main", "start": args.line[:2], "end": args.line[2:]}])
+    timings = {stage: [] for stage in STAGES}
+
+    with tempfile.TemporaryDirectory() as scratch:
+        event_writer = EventWriter(os.path.join(scratch, "bench.db")).start()
+        started = time.perf_counter()
+        frames = vehicles = 0
+        for path in args.video:
+            clip_frames, clip_vehicles = run_clip(path, model, counter, event_writer, timings, args)
+            frames += clip_frames
+            vehicles += clip_vehicles
+        wall = time.perf_counter() - started
+        event_writer.close()
+
+    if not frames:
+        sys.exit("❌ No frames were processed")
+    results = {
+        "recorded_at": datetime.datetime.now().isoformat(timespec="seconds"),
+        "git_revision": git_revision(),
+        "machine": {"platform": platform.platform(), "processor": platform.processor(), "cpus": os.cpu_count(),
+                    "python": platform.python_version(), "opencv": cv2.__version__},
+        "settings": {"videos": args.video, "model": args.model, "backend": args.backend, "int8": args.int8,
+                     "frame_skip": args.frame_skip, "resize": args.resize, "conf": args.conf,
+                     "max_frames_per_clip": args.frames},
+        "frames": frames,
+        "vehicles_counted": vehicles,
+        "end_to_end_fps": round(frames / wall, 2),
+        "stages": {stage: summarize(timings[stage], frames) for stage in STAGES},
+    }
+
+    print(f"📊 {frames} frames, {vehicles} vehicles, {results['end_to_end_fps']} frames/s end to end")
+    print(f"   {'stage':>13}  {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}  share")
+    total = sum(stage["mean_ms"] for stage in results["stages"].values())
+    for stage, summary in results["stages"].items():
+        print(f"   {stage:>13}  {summary['p50_ms']:9.3f} {summary['p95_ms']:9.3f} {summary['p99_ms']:9.3f}  "
+              f"{summary['mean_ms'] / total:5.1%}")
+    if args.json:
+        os.makedirs(os.path.dirname(os.path.abspath(args.json)), exist_ok=True)
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"💾 Results written to {args.json}")
+
+    if args.baseline:
+        print(f"📈 Compared with {args.baseline}:")
+        regressions = compare(results, args.baseline, args.tolerance)
+        if regressions:
+            sys.exit(f"❌ Slower than baseline: {', '.join(regressions)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""Compare full-frame detection with detection on an ROI crop.
+
+Usage:
+    python benchmarks/bench_roi.py --video clip.mp4 --roi 0 320 640 480
+
+Reports frames/s and CPU seconds per frame for both, plus how many boxes each
+finds whose centre lies inside the ROI (the ones that can reach the count
+line), as a quick accuracy check.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from roi import MAX_IMGSZ, RegionOfInterest  # noqa: E402
+
+
+def load_frames(video_path, count, width=640, height=480):
+    cap = cv2.VideoCapture(video_path)
+    frames = []
+    while len(frames) < count:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        frames.append(cv2.resize(frame, (width, height)))
+    cap.release()
+    if not frames:
+        sys.exit(f"❌ Could not read frames from {video_path}")
+    return frames
+
+
+def run(model, frames, conf, roi):
+    imgsz = roi.imgsz if roi else MAX_IMGSZ
+    detections = 0
+    cpu_start, wall_start = time.process_time(), time.perf_counter()
+    for frame in frames:
+        boxes = model.predict(roi.crop(frame) if roi else frame, conf=conf, imgsz=imgsz, verbose=False)[0].boxes
+        xyxy = boxes.xyxy.cpu().numpy()
+        if roi:
+            xyxy = roi.to_frame(xyxy)
+        detections += len(xyxy)
+    wall = time.perf_counter() - wall_start
+    return {"fps": round(len(frames) / wall, 2),
+            "cpu_ms_per_frame": round((time.process_time() - cpu_start) / len(frames) * 1000, 1),
+            "detections": detections}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--video", default="clip.mp4")
+    parser.add_argument("--model", default="yolov8n.pt")
+    parser.add_argument("--frames", type=int, default=300)
+    parser.add_argument("--conf", type=float, default=0.5)
+    parser.add_argument("--roi", nargs=4, type=int, default=[0, 320, 640, 480], metavar=("X1", "Y1", "X2", "Y2"))
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    from ultralytics import YOLO
+    model = YOLO(args.model)
+    frames = load_frames(args.video, args.frames)
+    roi = RegionOfInterest(args.roi)
+    model.predict(np.zeros_like(frames[0]), verbose=False)  # warm-up
+    model.predict(roi.crop(frames[0]), imgsz=roi.imgsz, verbose=False)
+
+    # Only full-frame boxes centred inside the ROI are comparable with the crop's
+    full = run(model, frames, args.conf, None)
+    cropped = run(model, frames, args.conf, roi)
+    in_roi = 0
+    for frame in frames:
+        xyxy = model.predict(frame, conf=args.conf, verbose=False)[0].boxes.xyxy.cpu().numpy()
+        cx, cy = (xyxy[:, 0] + xyxy[:, 2]) / 2, (xyxy[:, 1] + xyxy[:, 3]) / 2
+        in_roi += int(np.sum((cx >= roi.x1) & (cx < roi.x2) & (cy >= roi.y1) & (cy < roi.y2)))
+    full["detections_in_roi"] = in_roi
+
+    results = {"video": args.video, "frames": len(frames), "roi": args.roi, "imgsz": roi.imgsz,
+               "full_frame": full, "roi_crop": cropped, "speedup": round(cropped["fps"] / full["fps"], 2)}
+    print(f"📊 Full frame: {full['fps']} frames/s, {full['cpu_ms_per_frame']} ms CPU/frame, "
+          f"{in_roi} boxes in ROI")
+    print(f"📊 ROI crop:   {cropped['fps']} frames/s, {cropped['cpu_ms_per_frame']} ms CPU/frame, "
+          f"{cropped['detections']} boxes ({results['speedup']}x)")
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
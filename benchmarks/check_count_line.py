@@ -0,0 +1,86 @@
+"""Check that the default count lines count a vehicle driving down through them exactly once.
+
+Usage:
+    python benchmarks/check_count_line.py
+
+For detection.py's count_line_position and every line in cameras.json, a box
+drives from the top of the 640x480 frame down past its bottom edge, at a few
+speeds and box sizes. The box is clipped to the frame as YOLO reports it and
+dropped once less than half of it is on screen. Each run goes through
+TrackStore and CountingEngine like the detectors do and must count the vehicle
+exactly once. Exits non-zero otherwise.
+"""
+import argparse
+import ast
+import json
+import os
+import sys
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from counting import CountingEngine  # noqa: E402
+from track_state import TrackStore  # noqa: E402
+
+FRAME_WIDTH, FRAME_HEIGHT = 640, 480
+SPEEDS = (4, 12, 24)  # pixels per processed frame
+BOX_SIZES = ((60, 40), (120, 90), (200, 160))  # (width, height): motorcycle, car, bus
+
+
+def detection_line_y():
+    """count_line_position as set in detection.py (which can't be imported without a camera)."""
+    with open(os.path.join(ROOT, "detection.py"), encoding="utf-8") as f:
+        for node in ast.parse(f.read()).body:
+            if isinstance(node, ast.Assign) and getattr(node.targets[0], "id", None) == "count_line_position":
+                return ast.literal_eval(node.value)
+    sys.exit("❌ count_line_position not found in detection.py")
+
+
+def default_lines():
+    """``(label, lines)`` for detection.py and every camera in cameras.json."""
+    y = detection_line_y()
+    yield "detection.py", [{"name": "main", "start": (0, y), "end": (FRAME_WIDTH, y)}]
+    with open(os.path.join(ROOT, "cameras.json"), encoding="utf-8") as f:
+        for camera in json.load(f):
+            yield camera["location_id"], camera.get("lines", [])
+
+
+def count_drive(counter, speed, width, height):
+    """Times one vehicle is counted driving top to bottom through the middle of the frame."""
+    track_state = TrackStore()
+    counted = 0
+    x1 = (FRAME_WIDTH - width) / 2
+    for frame, top in enumerate(np.arange(-height / 2, FRAME_HEIGHT, speed)):
+        box = np.clip([[x1, top, x1 + width, top + height]], 0, [FRAME_WIDTH, FRAME_HEIGHT] * 2)
+        if box[0, 3] - box[0, 1] < height / 2:
+            continue  # less than half of it on screen: YOLO rarely reports it
+        centers = (box[:, :2] + box[:, 2:]) / 2
+        prev_centers = track_state.update([1], centers, frame=frame)
+        for row, _, _ in counter.crossings(prev_centers, centers):
+            if not track_state.is_counted(1):
+                track_state.mark_counted(1)
+                counted += 1
+    return counted
+
+
+def main():
+    argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter).parse_args()
+    failures = 0
+    for label, lines in default_lines():
+        for line in lines:
+            counter = CountingEngine([line])
+            results = {(speed, size): count_drive(counter, speed, *size) for speed in SPEEDS for size in BOX_SIZES}
+            bad = {key: count for key, count in results.items() if count != 1}
+            failures += len(bad)
+            if bad:
+                print(f"❌ {label} / {line.get('name')}: counted " + ", ".join(
+                    f"{count}x at {speed} px/frame for {w}x{h}" for (speed, (w, h)), count in bad.items()))
+            else:
+                print(f"✅ {label} / {line.get('name')}: counted once in all {len(results)} drives")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""Soak test: resident memory of track state over a long simulated run.
+
+Usage:
+    python benchmarks/soak_track_state.py --frames 1000000 --concurrent 25
+
+Simulates a busy junction: ``--concurrent`` vehicles are on screen at a time,
+each tracked for ``--lifetime`` frames under a fresh, never-reused id (as
+ByteTrack assigns them), and every vehicle is counted once. The same stream is
+fed to the old ``counted_ids`` set + ``object_memory`` dict and to TrackStore,
+each in its own process, and RSS is sampled as the run goes. Exits non-zero if
+TrackStore's RSS grows by more than ``--max-growth-mib`` after warm-up.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from track_state import TrackStore  # noqa: E402
+
+
+def rss_mib():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+    except OSError:  # not Linux: peak RSS is the best available
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 2 ** 20 if sys.platform == "darwin" else peak / 1024
+
+
+def frame_tracks(frame, concurrent, lifetime):
+    """Ids and centres on screen at ``frame``; a new id enters every lifetime/concurrent frames."""
+    spacing = max(1, lifetime // concurrent)
+    newest = frame // spacing
+    ids = np.arange(max(0, newest - concurrent + 1), newest + 1)
+    progress = (frame - ids * spacing) / lifetime  # 0 -> 1 while the vehicle is on screen
+    centers = np.column_stack([320 + ids % 7 * 10, progress * 480])
+    return ids.astype(np.float32), centers
+
+
+def run(mode, frames, concurrent, lifetime, samples, result_queue):
+    counted_ids, object_memory = set(), {}
+    track_state = TrackStore()
+    sample_every = max(1, frames // samples)
+    rss = []
+    start = time.perf_counter()
+    for frame in range(frames):
+        ids, centers = frame_tracks(frame, concurrent, lifetime)
+        if mode == "legacy":
+            [object_memory.get(track_id, center) for track_id, center in zip(ids, centers)]
+            object_memory.update(zip(ids, centers))
+            for track_id in ids:
+                if track_id not in counted_ids:
+                    counted_ids.add(track_id)
+        else:
+            track_state.update(ids, centers, frame=frame)
+            for track_id in ids:
+                if not track_state.is_counted(track_id):
+                    track_state.mark_counted(track_id)
+        if frame % sample_every == 0:
+            rss.append((frame, round(rss_mib(), 1)))
+    elapsed = time.perf_counter() - start
+    entries = len(object_memory) + len(counted_ids) if mode == "legacy" else len(track_state)
+    result_queue.put({"mode": mode, "rss_mib": rss, "entries": entries,
+                      "us_per_frame": round(elapsed / frames * 1e6, 2)})
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--frames", type=int, default=1_000_000)
+    parser.add_argument("--concurrent", type=int, default=25, help="vehicles on screen at once")
+    parser.add_argument("--lifetime", type=int, default=90, help="frames each vehicle stays tracked")
+    parser.add_argument("--samples", type=int, default=20)
+    parser.add_argument("--max-growth-mib", type=float, default=2.0)
+    parser.add_argument("--skip-legacy", action="store_true")
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    results = {}
+    for mode in (["store"] if args.skip_legacy else ["legacy", "store"]):
+        result_queue = multiprocessing.Queue()
+        worker = multiprocessing.Process(target=run, args=(mode, args.frames, args.concurrent, args.lifetime,
+                                                           args.samples, result_queue))
+        worker.start()
+        results[mode] = result_queue.get()
+        worker.join()
+
+    for mode, result in results.items():
+        rss = result["rss_mib"]
+        # Growth after the first 10% of the run, once allocator pools have settled
+        settled = rss[len(rss) // 10][1]
+        result["growth_mib"] = round(rss[-1][1] - settled, 1)
+        print(f"📊 {mode:>6}: RSS {rss[0][1]} -> {rss[-1][1]} MiB (+{result['growth_mib']} after warm-up), "
+              f"{result['entries']} entries left, {result['us_per_frame']} µs/frame")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({"frames": args.frames, "concurrent": args.concurrent, "lifetime": args.lifetime,
+                       "results": results}, f, indent=2)
+
+    if results["store"]["growth_mib"] > args.max_growth_mib:
+        sys.exit(f"❌ TrackStore RSS grew {results['store']['growth_mib']} MiB (limit {args.max_growth_mib})")
+    print("✅ TrackStore memory stayed flat")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+"""One camera's detection loop, run by supervisor.py in its own process.
+
+The worker gets its camera entry from the registry (cameras.json) when it
+starts and listens on a multiprocessing pipe for messages from the supervisor:
+
+    {"type": "config", "camera": {...}}   new count lines / zones / roi, applied live
+    {"type": "stop"}                      finish the current frame, flush and exit
+
+Its location_id comes from the registry, not from current_camera_location.txt,
+so every camera keeps its own label whatever the dashboard has selected.
+"""
+import os
+import signal
+import time
+
+CSV_DIR = "logs"
+STATS_INTERVAL = 30
+
+
+def limit_threads(threads, cpus=None):
+    """Pin this process to ``cpus`` and size the math libraries' thread pools to ``threads``.
+
+    Must run before numpy/torch/cv2 are imported so the environment variables take effect.
+    """
+    for var in ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS"):
+        os.environ[var] = str(threads)
+    if cpus and hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, cpus)
+
+
+def csv_path_for(location_id):
+    slug = "".join(c if c.isalnum() else "_" for c in location_id).strip("_").lower()
+    return os.path.join(CSV_DIR, f"vehicle_log_{slug}_{{month}}.csv")  # EventWriter fills in the month
+
+
+def run_worker(camera, conn, threads=1, cpus=None):
+    """Process entry point; ``conn`` is this worker's end of the supervisor pipe."""
+    limit_threads(threads, cpus)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # Ctrl+C goes to the supervisor, which stops us
+
+    import cv2
+    import numpy as np
+    import torch
+
+    from capture import LatestFrameCapture
+    from counting import CountingEngine
+    from event_writer import EventWriter
+    from inference import load_model
+    from live_events import EventPublisher
+    from live_view import LiveFrameWriter
+    from metrics import DetectorMetrics, MetricsPublisher
+    from motion_gate import MotionGate
+    from propagation import DETECT_EVERY, TrackPropagator
+    from multi_camera import (CONFIDENCE_THRESHOLD, DB_FILENAME, INFERENCE_BACKEND, INT8, MODEL_PATH,
+                              PUBLISH_LIVE_EVENTS, TARGET_CLASSES, infer_batch, make_tracker)
+    from roi import MAX_IMGSZ, RegionOfInterest
+    from storage import now_ts
+    from track_state import TrackStore
+    from video_input import substream_url
+
+    cv2.setNumThreads(threads)
+    torch.set_num_threads(threads)
+
+    location_id = camera["location_id"]
+    stopping = False
+
+    def stop(*_):
+        nonlocal stopping
+        stopping = True
+
+    signal.signal(signal.SIGTERM, stop)
+
+    def apply_config(camera):
+        counter = CountingEngine.from_config(camera)
+        motion_gate = MotionGate(counter) if camera.get("motion_gate", True) else None
+        return counter, motion_gate, RegionOfInterest.from_config(camera)
+
+    counter, motion_gate, roi = apply_config(camera)
+    model = load_model(camera.get("model", MODEL_PATH), camera.get("backend", INFERENCE_BACKEND),
+                       int8=camera.get("int8", INT8), data=camera.get("data"))
+    names = model.names
+    conf = camera.get("conf", CONFIDENCE_THRESHOLD)
+    tracker = make_tracker()
+    track_state = TrackStore()
+    detect_every = camera.get("detect_every", DETECT_EVERY)
+    propagator = TrackPropagator(detect_every) if detect_every > 1 else None
+    source = substream_url(camera["source"]) if camera.get("substream") else camera["source"]
+    capture = LatestFrameCapture(source, width=640, height=480, threads=threads).start()
+
+    os.makedirs(CSV_DIR, exist_ok=True)
+    metrics = DetectorMetrics(location_id, capture=capture)
+    event_writer = EventWriter(DB_FILENAME, csv_path=csv_path_for(location_id),
+                               csv_header=["Timestamp", "Vehicle Type", "Vehicle ID", "Location ID"],
+                               publisher=EventPublisher().start() if PUBLISH_LIVE_EVENTS else None,
+                               metrics=metrics).start()
+    metrics.event_writer = event_writer
+    metrics_publisher = MetricsPublisher(metrics).start()
+    live_view = LiveFrameWriter(location_id).open() if camera.get("live_view", True) else None
+    print(f"🎥 [{location_id}] worker {os.getpid()} started ({threads} threads, cpus {sorted(cpus or [])})")
+
+    last_stats_time = time.time()
+    try:
+        while not stopping:
+            # Messages from the supervisor; poll() without a timeout costs one syscall
+            while conn.poll():
+                message = conn.recv()
+                if message["type"] == "stop":
+                    stopping = True
+                elif message["type"] == "config":
+                    counter, motion_gate, roi = apply_config(message["camera"])
+                    print(f"🔧 [{location_id}] count geometry updated")
+            if stopping:
+                break
+
+            frame, captured_at = capture.read(timeout=1.0)
+            if frame is None:
+                continue
+            metrics.frame(time.time() - captured_at)
+            if motion_gate is not None and not motion_gate.check(frame):
+                metrics.skipped()
+                tracks = None
+                if propagator is not None:
+                    propagator.reset()
+            elif propagator is not None and not propagator.due():
+                # Optical flow between detect_every frames; the score column is not used
+                track_ids, boxes, classes = propagator.propagate(frame)
+                tracks = np.column_stack([boxes, track_ids, np.ones(len(track_ids)), classes])
+            else:
+                inference_started = time.perf_counter()
+                tracks = infer_batch(model, [roi.crop(frame) if roi else frame], [tracker], conf=conf,
+                                     imgsz=roi.imgsz if roi else MAX_IMGSZ)[0]
+                metrics.inference(time.perf_counter() - inference_started)
+                if roi and len(tracks):
+                    tracks = roi.to_frame(tracks)
+                if propagator is not None:
+                    tracks[:, 4] = propagator.detected(frame, tracks[:, 4], tracks[:, :4], tracks[:, 6])[0]
+
+            if tracks is not None and len(tracks):
+                track_ids = tracks[:, 4].astype(int)
+                classes = tracks[:, 6].astype(int)
+                centers = (tracks[:, :2] + tracks[:, 2:4]) / 2
+                prev_centers = track_state.update(track_ids, centers)
+                for row, line_name, direction in counter.crossings(prev_centers, centers):
+                    label = names[classes[row]]
+                    track_id = int(track_ids[row])
+                    if label not in TARGET_CLASSES or track_state.is_counted(track_id):
+                        continue
+                    track_state.mark_counted(track_id)
+                    event_writer.submit(now_ts(), label, track_id, location_id)
+                    metrics.counted()
+
+            # Drawing happens only while the dashboard's live view is open
+            if live_view is not None and live_view.wants_frame():
+                if tracks is not None:
+                    for x1, y1, x2, y2, track_id, _, cls in tracks[:, :7]:
+                        cv2.rectangle(frame, (int(x1), int(y1)), (int(x2), int(y2)), (0, 255, 0), 2)
+                        cv2.putText(frame, f"{names[int(cls)]}-{int(track_id)}", (int(x1), int(y1) - 10),
+                                    cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 0), 2)
+                counter.draw(frame)
+                if roi:
+                    roi.draw(frame)
+                live_view.publish(frame)
+
+            if time.time() - last_stats_time >= STATS_INTERVAL:
+                stats = capture.stats()
+                print(f"📊 [{location_id}] {metrics.frames_processed} frames, {metrics.vehicles_counted} vehicles, "
+                      f"{stats['frames_dropped']} dropped, {stats['reconnects']} reconnects")
+                last_stats_time = time.time()
+    finally:
+        capture.stop()
+        event_writer.close()
+        metrics_publisher.close()
+        if live_view is not None:
+            live_view.close()
+        print(f"🔻 [{location_id}] worker stopped")
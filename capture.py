@@ -0,0 +1,146 @@
+import threading
+import time
+
+import cv2
+
+from video_input import DECODER, open_video
+
+LIVE_DECODE_THREADS = 2  # each frame thread adds a frame of latency
+
+
+class LatestFrameCapture:
+    """Drain a live stream on a background thread and keep only the newest frame.
+
+    The consumer always gets the most recent decoded frame together with the
+    time it was captured. Frames that are overwritten before anyone reads them
+    are counted as dropped. Lost connections are re-opened with exponential
+    backoff on the capture thread, so the caller's loop never blocks on it.
+
+    Frames come out at ``width`` x ``height``, scaled by the decoder (see
+    video_input.py).
+    """
+
+    def __init__(self, source, width=None, height=None, api_preference=cv2.CAP_FFMPEG,
+                 min_backoff=0.5, max_backoff=30.0, decoder=DECODER, threads=LIVE_DECODE_THREADS):
+        self.source = source
+        self.width = width
+        self.height = height
+        self.api_preference = api_preference
+        self.decoder = decoder
+        self.threads = threads
+        self.min_backoff = min_backoff
+        self.max_backoff = max_backoff
+
+        self._cond = threading.Condition()
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._cap = None
+
+        # Latest-frame slot
+        self._frame = None
+        self._captured_at = 0.0
+        self._seq = 0
+        self._consumed_seq = 0
+
+        # Stats
+        self.frames_decoded = 0
+        self.frames_dropped = 0
+        self.frames_consumed = 0
+        self.reconnects = 0
+        self.last_frame_age = 0.0
+        self.max_frame_age = 0.0
+        self._total_frame_age = 0.0
+
+    # === Capture thread ===
+    def _open(self):
+        size = (self.width, self.height) if self.width and self.height else None
+        return open_video(self.source, size=size, threads=self.threads, decoder=self.decoder,
+                          api_preference=self.api_preference)
+
+    def _release(self):
+        if self._cap is not None:
+            self._cap.release()
+            self._cap = None
+
+    def _run(self):
+        backoff = self.min_backoff
+        while not self._stop_event.is_set():
+            if self._cap is None:
+                self._cap = self._open()
+                if not self._cap.isOpened():
+                    print(f"⚠️ Could not open stream, retrying in {backoff:.1f}s...")
+                    self._release()
+                    self._stop_event.wait(backoff)
+                    backoff = min(backoff * 2, self.max_backoff)
+                    continue
+
+            _, frame = self._cap.read()
+            if frame is None:
+                print(f"⚠️ Empty/corrupted frame, reconnecting in {backoff:.1f}s...")
+                self._release()
+                self.reconnects += 1
+                self._stop_event.wait(backoff)
+                backoff = min(backoff * 2, self.max_backoff)
+                continue
+
+            backoff = self.min_backoff
+            captured_at = time.time()
+            with self._cond:
+                if self._seq > self._consumed_seq:
+                    self.frames_dropped += 1
+                self._frame = frame
+                self._captured_at = captured_at
+                self._seq += 1
+                self.frames_decoded += 1
+                self._cond.notify_all()
+
+        self._release()
+
+    # === Public API ===
+    def start(self):
+        if self._thread is None:
+            self._stop_event.clear()
+            self._thread = threading.Thread(target=self._run, name="rtsp-capture", daemon=True)
+            self._thread.start()
+        return self
+
+    def read(self, timeout=None):
+        """Wait for a frame newer than the last one returned.
+
+        Returns ``(frame, captured_at)``, or ``(None, None)`` on timeout or stop.
+        """
+        with self._cond:
+            ready = self._cond.wait_for(
+                lambda: self._seq > self._consumed_seq or self._stop_event.is_set(), timeout)
+            if not ready or self._seq <= self._consumed_seq:
+                return None, None
+            frame, captured_at = self._frame, self._captured_at
+            self._consumed_seq = self._seq
+
+        age = time.time() - captured_at
+        self.frames_consumed += 1
+        self.last_frame_age = age
+        self.max_frame_age = max(self.max_frame_age, age)
+        self._total_frame_age += age
+        return frame, captured_at
+
+    def stats(self):
+        """Snapshot of capture counters; frame ages are in seconds."""
+        consumed = self.frames_consumed
+        return {
+            "frames_decoded": self.frames_decoded,
+            "frames_consumed": consumed,
+            "frames_dropped": self.frames_dropped,
+            "reconnects": self.reconnects,
+            "last_frame_age": self.last_frame_age,
+            "avg_frame_age": self._total_frame_age / consumed if consumed else 0.0,
+            "max_frame_age": self.max_frame_age,
+        }
+
+    def stop(self):
+        self._stop_event.set()
+        with self._cond:
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
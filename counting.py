@@ -0,0 +1,92 @@
+import cv2
+import numpy as np
+
+
+def _cross(ax, ay, bx, by):
+    return ax * by - ay * bx
+
+
+class CountingEngine:
+    """Test every track's motion against all count lines and zones at once.
+
+    Lines are ``{"name", "start": (x, y), "end": (x, y)}``. A track moving to the
+    right-hand side of start→end (as seen on screen) crosses "in", the other way "out";
+    swap start and end to flip a line. Zones are ``{"name", "points": [(x, y), ...]}``
+    polygons; entering one is "in" and leaving it is "out".
+    """
+
+    def __init__(self, lines=(), zones=()):
+        self.lines = list(lines)
+        self.zones = list(zones)
+        self.line_names = [line.get("name", f"line{i}") for i, line in enumerate(self.lines)]
+        self.zone_names = [zone.get("name", f"zone{i}") for i, zone in enumerate(self.zones)]
+
+        # Segments as (L,) coordinate arrays
+        segments = np.array([[*line["start"], *line["end"]] for line in self.lines], dtype=np.float64).reshape(-1, 4)
+        self._ax, self._ay, self._bx, self._by = segments.T
+
+        # All polygon edges concatenated, grouped by zone
+        edges, offsets = [], []
+        for zone in self.zones:
+            points = np.asarray(zone["points"], dtype=np.float64)
+            offsets.append(len(edges))
+            edges.extend(np.hstack([points, np.roll(points, -1, axis=0)]))
+        edges = np.array(edges, dtype=np.float64).reshape(-1, 4)
+        self._ex1, self._ey1, self._ex2, self._ey2 = edges.T
+        self._edge_offsets = np.array(offsets, dtype=np.intp)
+
+    @classmethod
+    def from_config(cls, config):
+        """Build an engine from a camera config with ``lines`` and ``zones`` lists."""
+        return cls(config.get("lines", ()), config.get("zones", ()))
+
+    def _line_crossings(self, px, py, qx, qy):
+        """(N, L) crossing mask and "in" mask, same orientation test as the old crossed_line()."""
+        ax, ay, bx, by = self._ax, self._ay, self._bx, self._by
+        side_prev = _cross(bx - ax, by - ay, px - ax, py - ay) > 0
+        side_curr = _cross(bx - ax, by - ay, qx - ax, qy - ay) > 0
+        start_turn = _cross(px - ax, py - ay, qx - ax, qy - ay) > 0
+        end_turn = _cross(px - bx, py - by, qx - bx, qy - by) > 0
+        crossed = (start_turn != end_turn) & (side_prev != side_curr)
+        return crossed, side_curr
+
+    def inside_zones(self, x, y):
+        """(N, Z) mask of which points lie inside which zones (even-odd rule)."""
+        x1, y1, x2, y2 = self._ex1, self._ey1, self._ex2, self._ey2
+        straddles = (y1 > y) != (y2 > y)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            x_at_y = (x2 - x1) * (y - y1) / (y2 - y1) + x1
+        hits = (straddles & (x < x_at_y)).astype(np.int32)
+        return np.add.reduceat(hits, self._edge_offsets, axis=1) % 2 == 1
+
+    def crossings(self, prev_points, curr_points):
+        """Return ``[(row, name, direction), ...]`` for every line or zone crossed.
+
+        ``prev_points`` and ``curr_points`` are (N, 2) arrays of track centres;
+        ``row`` indexes into them.
+        """
+        prev_points = np.asarray(prev_points, dtype=np.float64).reshape(-1, 2)
+        curr_points = np.asarray(curr_points, dtype=np.float64).reshape(-1, 2)
+        if len(curr_points) == 0:
+            return []
+        px, py = prev_points[:, :1], prev_points[:, 1:]
+        qx, qy = curr_points[:, :1], curr_points[:, 1:]
+
+        events = []
+        if self.lines:
+            crossed, moved_in = self._line_crossings(px, py, qx, qy)
+            for row, col in zip(*np.nonzero(crossed)):
+                events.append((int(row), self.line_names[col], "in" if moved_in[row, col] else "out"))
+        if self.zones:
+            was_inside = self.inside_zones(px, py)
+            is_inside = self.inside_zones(qx, qy)
+            for row, col in zip(*np.nonzero(was_inside != is_inside)):
+                events.append((int(row), self.zone_names[col], "in" if is_inside[row, col] else "out"))
+        return events
+
+    def draw(self, frame, color=(0, 0, 255)):
+        for line in self.lines:
+            cv2.line(frame, tuple(map(int, line["start"])), tuple(map(int, line["end"])), color, 2)
+        for zone in self.zones:
+            points = np.asarray(zone["points"], dtype=np.int32).reshape(-1, 1, 2)
+            cv2.polylines(frame, [points], True, color, 2)
@@ -0,0 +1,146 @@
+"""Long-lived read-only SQLite connections for the dashboard API.
+
+Connecting, attaching the month partitions and preparing statements on every
+request cost more than the rollup queries themselves. A ReadPool keeps up to
+``size`` connections open (read-only, with a busy_timeout) and lends one to
+each request. Partitions stay attached between requests, and the TEMP views
+over them are only recreated when a request needs a different set of months.
+Each connection's statement cache then serves the repeated dashboard queries
+without preparing them again.
+
+The detectors write in WAL mode, so these readers never wait for a writer's
+transaction and the writers never wait for them; busy_timeout only covers the
+brief locks around WAL checkpoints and recovery.
+
+Connections are lent out per request rather than bound to a thread, because
+the Flask development server starts a new thread for every request. A request
+that can't get one within CHECKOUT_TIMEOUT raises PoolExhausted (a 503 in the
+app) instead of waiting indefinitely.
+"""
+import contextlib
+import queue
+import sqlite3
+import threading
+from collections import OrderedDict
+
+import partitions
+
+POOL_SIZE = 8
+BUSY_TIMEOUT_MS = 2000
+CACHED_STATEMENTS = 256
+MAX_ATTACHED = 8  # per connection, below SQLite's default limit of 10
+CHECKOUT_TIMEOUT = 10.0
+
+
+class PoolExhausted(RuntimeError):
+    """Every connection stayed lent out for CHECKOUT_TIMEOUT seconds."""
+
+
+class ReadConnection:
+    """One read-only catalog connection and the partitions attached to it."""
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self.conn = sqlite3.connect(partitions.read_only_uri(db_path), uri=True, check_same_thread=False,
+                                    cached_statements=CACHED_STATEMENTS)
+        self.conn.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}")
+        self.attached = OrderedDict()  # month -> schema, least recently used first
+        self.view_months = None
+
+    def use(self, months):
+        """Point the TEMP views at ``months``; returns their newest event ids (the data version)."""
+        months = tuple(partitions.existing_months(self.db_path, months))
+        if months != self.view_months:
+            for old in list(self.attached):
+                if len(self.attached) + len(set(months) - set(self.attached)) <= MAX_ATTACHED:
+                    break
+                if old not in months:
+                    self.conn.execute(f"DETACH DATABASE {self.attached.pop(old)}")
+            for month in months:
+                if month not in self.attached:
+                    self.attached[month] = partitions.attach_partition(self.conn, self.db_path, month,
+                                                                       read_only=True)
+            partitions.create_views(self.conn, [self.attached[month] for month in months])
+            self.view_months = months
+        for month in months:
+            self.attached.move_to_end(month)
+        return partitions.newest_ids(self.conn, months)
+
+    def close(self):
+        self.conn.close()
+
+
+class ReadPool:
+    """Lend read-only connections, creating up to ``size`` of them on demand."""
+
+    def __init__(self, db_path, size=POOL_SIZE):
+        self.db_path = db_path
+        self.size = size
+        self._idle = queue.LifoQueue()  # LIFO: the warmest connection goes out first
+        self._created = 0
+        self._lock = threading.Lock()
+
+    def _checkout(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            create = self._created < self.size
+            if create:
+                self._created += 1
+        if not create:
+            try:
+                return self._idle.get(timeout=CHECKOUT_TIMEOUT)
+            except queue.Empty:
+                raise PoolExhausted(f"all {self.size} database connections busy for {CHECKOUT_TIMEOUT:.0f}s") from None
+        try:
+            return ReadConnection(self.db_path)
+        except Exception:
+            with self._lock:
+                self._created -= 1
+            raise
+
+    @contextlib.contextmanager
+    def connection(self, months):
+        """``with pool.connection(months) as (conn, version):`` -- ``months`` queryable through TEMP views.
+
+        Ranges of more than MAX_ATTACHED months get a one-off connection (see partitions.attach_months).
+        """
+        if len(partitions.existing_months(self.db_path, months)) > MAX_ATTACHED:
+            conn = sqlite3.connect(partitions.read_only_uri(self.db_path), uri=True)
+            try:
+                conn.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}")
+                yield conn, partitions.attach_months(conn, months, self.db_path, read_only=True)
+            finally:
+                conn.close()
+            return
+
+        reader = self._checkout()
+        try:
+            version = reader.use(months)
+        except BaseException:
+            self._discard(reader)
+            raise
+        try:
+            yield reader.conn, version
+        except BaseException:
+            # Any failure (a query error, a bug in the caller, a closed generator)
+            # may leave the connection mid-statement: don't hand it to the next
+            # request, and free its slot so a fresh one can be opened.
+            self._discard(reader)
+            raise
+        else:
+            self._idle.put(reader)
+
+    def _discard(self, reader):
+        reader.close()
+        with self._lock:
+            self._created -= 1
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
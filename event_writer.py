@@ -0,0 +1,281 @@
+import csv
+import os
+import queue
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from partitions import attach_partition, month_of
+from rollups import apply_rollups
+from storage import LookupCache, init_database, ts_to_str
+
+# Durability presets: (SQLite synchronous pragma, fsync the CSV after each batch)
+#   fast   - fastest; a power cut may lose recent batches or corrupt the DB
+#   normal - WAL + synchronous=NORMAL; survives process crashes, a power cut
+#            may lose the last committed batch
+#   full   - every batch is on disk before the next one starts
+DURABILITY_MODES = {
+    "fast": ("OFF", False),
+    "normal": ("NORMAL", False),
+    "full": ("FULL", True),
+}
+
+# Monthly partitions kept attached to the writer's connection (a batch rarely spans more than two)
+MAX_ATTACHED_PARTITIONS = 4
+
+# Several processes write the same catalog (supervisor workers, import_csv), so
+# wait this long for another writer's lock before a write fails...
+BUSY_TIMEOUT_MS = 30000
+# ...and then retry the batch with exponential backoff, giving up (the events
+# stay in the CSV) only once it has failed for this long.
+RETRY_MIN = 1.0
+RETRY_MAX = 30.0
+RETRY_GIVE_UP = 600.0
+
+_STOP = object()
+
+
+class EventWriter:
+    """Write counted-vehicle events to SQLite (and optionally CSV) off the frame loop.
+
+    Events are ``(ts, vehicle_type, vehicle_id, location_id)`` tuples taken
+    from a bounded queue and written with ``executemany`` in one transaction per
+    batch, together with the matching hourly/daily rollup updates. Each event
+    goes to the monthly partition of its ts (see partitions.py), attached to the
+    writer's catalog connection as needed. A batch is committed when it reaches
+    ``max_batch`` events or when the oldest event in it is ``max_delay`` seconds
+    old, whichever comes first.
+
+    If ``csv_path`` contains ``{month}`` it is replaced with the event's
+    "YYYY-MM", so the CSV copy starts a new file every month. The CSV is
+    written before the database, so a batch the database refuses is still in
+    the CSV. A failed database write (a lock held past BUSY_TIMEOUT_MS, a
+    database that can't be opened) is retried with backoff while new events
+    wait in the queue; ``submit`` only blocks once it is full.
+
+    If a live_events.EventPublisher is given, each event is also pushed to the
+    dashboard immediately, without waiting for the batch commit. If a
+    metrics.DetectorMetrics is given, batch write latency is recorded in it.
+    """
+
+    def __init__(self, db_path="vehicle_data.db", csv_path=None, csv_header=None,
+                 max_batch=500, max_delay=1.0, queue_size=10000, durability="normal", publisher=None,
+                 metrics=None):
+        if durability not in DURABILITY_MODES:
+            raise ValueError(f"durability must be one of {sorted(DURABILITY_MODES)}")
+        self.db_path = db_path
+        self.csv_path = csv_path
+        self.csv_header = csv_header
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.synchronous, self.fsync_csv = DURABILITY_MODES[durability]
+        self.publisher = publisher
+        self.metrics = metrics
+
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._thread = None
+        self._closed = False
+        self._attached = OrderedDict()  # month -> schema, least recently used first
+        self._csv = None  # (path, open file)
+        self._conn = None  # writer thread's catalog connection, opened (and reopened) on demand
+        self._lookups = None
+
+        self.events_written = 0
+        self.batches_written = 0
+        self.last_batch_seconds = 0.0
+        self.write_errors = 0
+
+    # === Setup ===
+    def _open_db(self):
+        conn = sqlite3.connect(self.db_path, timeout=BUSY_TIMEOUT_MS / 1000)
+        conn.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}")
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(f"PRAGMA synchronous={self.synchronous}")
+        init_database(conn)
+        return conn
+
+    def _csv_file(self, month):
+        path = self.csv_path.replace("{month}", month)
+        if self._csv is None or self._csv[0] != path:
+            if self._csv is not None:
+                self._csv[1].close()
+            file_exists = os.path.exists(path) and os.path.getsize(path) > 0
+            csv_file = open(path, mode='a', newline='')
+            if self.csv_header and not file_exists:
+                csv.writer(csv_file).writerow(self.csv_header)
+            self._csv = (path, csv_file)
+        return self._csv[1]
+
+    def _partition(self, conn, month, keep):
+        """Schema name of ``month``'s partition, attaching it first if needed.
+
+        Detaches the least recently used partitions not in ``keep`` (this batch's months).
+        """
+        if month in self._attached:
+            self._attached.move_to_end(month)
+            return self._attached[month]
+        for old in list(self._attached):
+            if len(self._attached) < MAX_ATTACHED_PARTITIONS:
+                break
+            if old not in keep:
+                conn.execute(f"DETACH DATABASE {self._attached.pop(old)}")
+        schema = attach_partition(conn, self.db_path, month, create=True)
+        conn.execute(f"PRAGMA {schema}.synchronous={self.synchronous}")
+        self._attached[month] = schema
+        return schema
+
+    # === Writer thread ===
+    @staticmethod
+    def _by_month(batch):
+        by_month = {}
+        for event in batch:
+            by_month.setdefault(month_of(event[0]), []).append(event)
+        return by_month
+
+    def _write_csv(self, batch):
+        for month, events in self._by_month(batch).items():
+            csv_file = self._csv_file(month)
+            csv.writer(csv_file).writerows((ts_to_str(ts), *rest) for ts, *rest in events)
+            csv_file.flush()
+            if self.fsync_csv:
+                os.fsync(csv_file.fileno())
+
+    def _write_db(self, conn, lookups, batch):
+        by_month = self._by_month(batch)
+        # ATTACH is not allowed inside a transaction, so attach first
+        schemas = {month: self._partition(conn, month, by_month) for month in by_month}
+        with conn:
+            for month, events in by_month.items():
+                rows = [(ts, lookups.vehicle_type_id(vehicle_type), vehicle_id,
+                         lookups.location_id(location_id))
+                        for ts, vehicle_type, vehicle_id, location_id in events]
+                conn.executemany(f"INSERT INTO {schemas[month]}.vehicles "
+                                 "(ts, vehicle_type_id, vehicle_id, location_id) VALUES (?, ?, ?, ?)", rows)
+                apply_rollups(conn, rows, schemas[month])
+
+    def _next_batch(self):
+        """``(events, stopping)``: up to max_batch events, waiting at most max_delay after the first."""
+        event = self._queue.get()
+        if event is _STOP:
+            return [], True
+        batch = [event]
+        deadline = time.monotonic() + self.max_delay
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                event = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if event is _STOP:
+                return batch, True
+            batch.append(event)
+        return batch, False
+
+    def _write_db_retrying(self, batch):
+        """Write ``batch`` to the database, retrying with backoff; False if it gave up."""
+        backoff, failing_since = RETRY_MIN, None
+        while True:
+            try:
+                if self._conn is None:
+                    self._conn = self._open_db()
+                    self._lookups = LookupCache(self._conn)
+                self._write_db(self._conn, self._lookups, batch)
+                return True
+            except Exception as e:
+                self.write_errors += 1
+                self._close_db()  # reopen: also drops ids from the rolled-back transaction
+                failing_since = failing_since or time.monotonic()
+                if time.monotonic() - failing_since >= RETRY_GIVE_UP:
+                    print(f"❌ Giving up on {len(batch)} events after {RETRY_GIVE_UP:.0f}s ({e}); "
+                          f"they are only in the CSV")
+                    return False
+                print(f"⚠️ Error writing {len(batch)} events ({e}), retrying in {backoff:.0f}s")
+                time.sleep(backoff)
+                backoff = min(backoff * 2, RETRY_MAX)
+
+    def _close_db(self):
+        if self._conn is not None:
+            self._conn.close()
+        self._conn = self._lookups = None
+        self._attached.clear()
+
+    def _run(self):
+        stopping = False
+        try:
+            while not stopping:
+                batch, stopping = self._next_batch()
+                if not batch:
+                    continue
+                started = time.perf_counter()
+                if self.csv_path:
+                    try:
+                        self._write_csv(batch)
+                    except Exception as e:
+                        print(f"❌ Error writing {len(batch)} events to CSV: {e}")
+                        self.write_errors += 1
+                        if self._csv is not None:
+                            self._csv[1].close()  # reopened for the next batch
+                            self._csv = None
+                if self.db_path and not self._write_db_retrying(batch):
+                    continue
+                self.events_written += len(batch)
+                self.batches_written += 1
+                self.last_batch_seconds = time.perf_counter() - started
+                if self.metrics is not None:
+                    self.metrics.write_seconds.observe(self.last_batch_seconds)
+        finally:
+            if self._csv is not None:
+                self._csv[1].close()
+                self._csv = None
+            self._close_db()
+
+    # === Public API ===
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="event-writer", daemon=True)
+            self._thread.start()
+        return self
+
+    def submit(self, ts, vehicle_type, vehicle_id, location_id):
+        """Queue one event; blocks only if the writer has fallen ``queue_size`` events behind.
+
+        ``ts`` is a storage ts (see storage.to_ts); names are encoded on the writer thread.
+        """
+        if self._closed:
+            raise RuntimeError("EventWriter is closed")
+        self._put((ts, vehicle_type, vehicle_id, location_id))
+        if self.publisher is not None:
+            self.publisher.publish({"ts": ts_to_str(ts), "vehicle_type": vehicle_type,
+                                    "vehicle_id": vehicle_id, "location_id": location_id})
+
+    def _put(self, item):
+        """Queue ``item``, waiting while the queue is full but not on a writer thread that has died."""
+        while True:
+            try:
+                self._queue.put(item, timeout=1.0)
+                return
+            except queue.Full:
+                if self._thread is None or not self._thread.is_alive():
+                    raise RuntimeError("event writer thread is not running") from None
+
+    def queue_depth(self):
+        return self._queue.qsize()
+
+    def close(self):
+        """Write everything still queued, then stop the writer thread."""
+        if self._closed:
+            return
+        self._closed = True
+        if self._thread is not None:
+            try:
+                self._put(_STOP)
+            except RuntimeError:
+                pass  # the thread is already gone
+            self._thread.join()
+            self._thread = None
+        if self.publisher is not None:
+            self.publisher.close()
+        print(f"💾 Event writer flushed: {self.events_written} events in {self.batches_written} batches")
@@ -0,0 +1,193 @@
+"""Rebuild the database from the detectors' CSV event logs.
+
+Usage:
+    python import_csv.py logs/vehicle_log_all_*.csv
+    python import_csv.py vehicle_log_from_video.csv --location "Basni Crossing"
+
+Reads the CSVs the detectors write (Timestamp, Vehicle Type, Vehicle ID and,
+except for trained.py's, a location column; files without one need --location).
+Files are streamed in chunks into per-month TEMP staging tables. Then each
+month's rows are moved into its partition (see partitions.py) in one
+transaction, and that month's rollups are rebuilt. When a partition starts out
+empty, its index is dropped for the insert and built once afterwards.
+
+An event is identified by its timestamp, vehicle type, vehicle id and
+location. Events already in the database, or repeated across the CSVs, are not
+inserted again, so the import can be re-run, or run over overlapping logs,
+safely. Months whose raw rows were archived to Parquet are skipped. Best run
+while the detectors are stopped.
+"""
+import argparse
+import csv
+import glob
+import itertools
+import sqlite3
+import time
+
+from partitions import attach_partition, list_partitions, schema_name
+from rollups import rebuild_rollups
+from storage import DB_FILENAME, LookupCache, init_database, to_ts
+
+CHUNK_ROWS = 100000
+CACHE_KIB = 200000  # page cache per schema while importing
+
+
+def read_chunks(path, chunk_rows=CHUNK_ROWS):
+    """Yield lists of CSV records from ``path``, ``chunk_rows`` at a time."""
+    with open(path, newline='') as f:
+        reader = csv.reader(f)
+        while True:
+            chunk = list(itertools.islice(reader, chunk_rows))
+            if not chunk:
+                return
+            yield chunk
+
+
+class CsvImporter:
+    """Stage CSV records by month on a catalog connection, then merge them into the partitions."""
+
+    def __init__(self, conn, db_path, default_location=None):
+        self.conn = conn
+        self.db_path = db_path
+        self.default_location = default_location
+        self.lookups = LookupCache(conn)
+        self._hour_ts = {}  # "YYYY-MM-DD HH" -> ts of the start of the hour
+        self.staged = {}  # month -> rows staged
+        self.rows_read = 0
+        self.rows_rejected = 0
+
+    def _ts(self, stamp):
+        # strptime per row would dominate the import; parse each hour once
+        hour = self._hour_ts.get(stamp[:13])
+        if hour is None:
+            hour = self._hour_ts[stamp[:13]] = to_ts(stamp[:13] + ":00:00")
+        return hour + int(stamp[14:16]) * 60 + int(stamp[17:19])
+
+    def stage(self, chunk):
+        """Parse one chunk of CSV records into the TEMP staging tables."""
+        by_month = {}
+        vehicle_type_id, location_id, parse_ts = self.lookups.vehicle_type_id, self.lookups.location_id, self._ts
+        for record in chunk:
+            if not record or record[0] == "Timestamp":
+                continue
+            self.rows_read += 1
+            try:
+                location = record[3] if len(record) > 3 and record[3] else self.default_location
+                if location is None or len(record[0]) != 19:
+                    raise ValueError(record)
+                row = (parse_ts(record[0]), vehicle_type_id(record[1]),
+                       int(record[2]) if record[2] else None, location_id(location))
+            except (ValueError, IndexError):
+                self.rows_rejected += 1
+                continue
+            by_month.setdefault(record[0][:7], []).append(row)
+
+        for month, rows in by_month.items():
+            table = "staging_" + schema_name(month)
+            if month not in self.staged:
+                self.conn.execute(f"CREATE TEMP TABLE IF NOT EXISTS {table} "
+                                  "(ts INTEGER, vehicle_type_id INTEGER, vehicle_id INTEGER, location_id INTEGER)")
+                self.staged[month] = 0
+            self.conn.executemany(f"INSERT INTO temp.{table} VALUES (?, ?, ?, ?)", rows)
+            self.staged[month] += len(rows)
+
+    def merge(self, month):
+        """Move one month's staged rows into its partition; returns rows inserted, or None if archived."""
+        conn = self.conn
+        conn.commit()  # ATTACH is not allowed inside a transaction
+        schema = attach_partition(conn, self.db_path, month, create=True)
+        try:
+            if conn.execute(f"SELECT 1 FROM {schema}.archive_log LIMIT 1").fetchone():
+                return None
+            conn.execute(f"PRAGMA {schema}.synchronous=OFF")
+            conn.execute(f"PRAGMA {schema}.cache_size=-{CACHE_KIB}")
+            empty = conn.execute(f"SELECT 1 FROM {schema}.vehicles LIMIT 1").fetchone() is None
+            not_in_partition = "" if empty else f"""
+                WHERE NOT EXISTS (
+                    SELECT 1 FROM {schema}.vehicles v
+                    WHERE v.location_id = s.location_id AND v.ts = s.ts
+                    AND v.vehicle_type_id = s.vehicle_type_id AND v.vehicle_id IS s.vehicle_id)"""
+            with conn:
+                if empty:
+                    # Nothing to look up duplicates in yet: build the index once, after the insert
+                    conn.execute(f"DROP INDEX IF EXISTS {schema}.idx_vehicles_location_ts")
+                # GROUP BY drops events repeated in the CSVs and sorts by time, so ids follow ts
+                inserted = conn.execute(f"""
+                    INSERT INTO {schema}.vehicles (ts, vehicle_type_id, vehicle_id, location_id)
+                    SELECT s.ts, s.vehicle_type_id, s.vehicle_id, s.location_id
+                    FROM temp.staging_{schema} s {not_in_partition}
+                    GROUP BY s.ts, s.location_id, s.vehicle_type_id, s.vehicle_id
+                """).rowcount
+                conn.execute(f"CREATE INDEX IF NOT EXISTS {schema}.idx_vehicles_location_ts "
+                             "ON vehicles (location_id, ts)")
+                conn.execute(f"DROP TABLE temp.staging_{schema}")
+            rebuild_rollups(conn, schema)
+            conn.execute(f"PRAGMA {schema}.wal_checkpoint(TRUNCATE)")
+            return inserted
+        finally:
+            conn.commit()
+            conn.execute(f"DETACH DATABASE {schema}")
+
+
+def import_csv(db_path, paths, default_location=None, chunk_rows=CHUNK_ROWS, verbose=True):
+    """Import ``paths`` into the database at ``db_path``; returns a summary dict."""
+    conn = sqlite3.connect(db_path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    init_database(conn)
+    conn.execute(f"PRAGMA temp.cache_size=-{CACHE_KIB}")
+    importer = CsvImporter(conn, db_path, default_location)
+
+    started = time.perf_counter()
+    for path in paths:
+        file_started, rows_before = time.perf_counter(), importer.rows_read
+        for chunk in read_chunks(path, chunk_rows):
+            importer.stage(chunk)
+        conn.commit()
+        if verbose:
+            rows = importer.rows_read - rows_before
+            print(f"📥 {path}: {rows} rows read in {time.perf_counter() - file_started:.1f}s")
+    staged_seconds = time.perf_counter() - started
+
+    months = {}
+    for month in sorted(importer.staged):
+        month_started = time.perf_counter()
+        inserted = importer.merge(month)
+        months[month] = {"staged": importer.staged[month], "inserted": inserted}
+        if verbose and inserted is None:
+            print(f"⏭️ {month}: archived to Parquet, skipped {importer.staged[month]} rows")
+        elif verbose:
+            print(f"💾 {month}: {inserted} new of {importer.staged[month]} rows "
+                  f"in {time.perf_counter() - month_started:.1f}s")
+    conn.close()
+
+    seconds = time.perf_counter() - started
+    return {
+        "rows_read": importer.rows_read,
+        "rows_rejected": importer.rows_rejected,
+        "rows_inserted": sum(month["inserted"] or 0 for month in months.values()),
+        "months": months,
+        "stage_seconds": round(staged_seconds, 2),
+        "seconds": round(seconds, 2),
+        "rows_per_second": round(importer.rows_read / seconds) if seconds else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("csv", nargs="+", help="CSV files or glob patterns")
+    parser.add_argument("--db", default=DB_FILENAME)
+    parser.add_argument("--location", help="location for rows without a location column")
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS)
+    args = parser.parse_args()
+
+    paths = sorted({path for pattern in args.csv for path in (glob.glob(pattern) or [pattern])})
+    summary = import_csv(args.db, paths, args.location, args.chunk_rows)
+    print(f"✅ {summary['rows_inserted']} new events from {summary['rows_read']} rows "
+          f"({summary['rows_rejected']} rejected) in {summary['seconds']:.1f}s, "
+          f"{summary['rows_per_second']} rows/s; {len(list_partitions(args.db))} partitions")
+    if summary["rows_rejected"] and not args.location:
+        print("⚠️ Rows without a location column need --location")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+"""Load the YOLO model on the CPU inference backend of choice.
+
+Backends:
+    pytorch   the .pt weights as they are
+    onnx      ONNX Runtime; --int8 applies static (QDQ) INT8 quantization of
+              the convolutions, calibrated on --data images
+    openvino  OpenVINO IR; --int8 applies NNCF post-training quantization
+
+INT8 needs --data, the dataset YAML whose val images calibrate the activation
+ranges. Dynamic quantization is not used for ONNX: it turns the convolutions
+into ConvInteger, which ONNX Runtime runs no faster than FP32 on CPU; with QDQ
+it fuses them into QLinearConv kernels. Box decoding stays in float.
+
+Exported artifacts sit next to the weights (``best.onnx``, ``best_int8.onnx``,
+``best_openvino_model/``, ``best_int8_openvino_model/``) and are created on
+first use, or ahead of time with:
+
+    python inference.py --weights best.pt --backend openvino --int8 --data data.yaml
+
+All backends are loaded through ultralytics.YOLO, so ``model.track``,
+``model.predict`` and ``model.names`` (and with them tracking and counting)
+behave the same on each.
+"""
+import argparse
+import glob
+import os
+import shutil
+import time
+
+import cv2
+import numpy as np
+from ultralytics import YOLO
+
+BACKENDS = ("pytorch", "onnx", "openvino")
+DEFAULT_IMGSZ = 640
+WARMUP_RUNS = 3
+CALIBRATION_IMAGES = 200  # --data images used to calibrate ONNX INT8 activations
+
+
+def artifact_path(weights, backend, int8=False):
+    """Where the exported model for ``weights`` on ``backend`` lives."""
+    if backend not in BACKENDS:
+        raise ValueError(f"unknown inference backend {backend!r}, expected one of {', '.join(BACKENDS)}")
+    if backend == "pytorch":
+        return weights
+    stem = os.path.splitext(weights)[0] + ("_int8" if int8 else "")
+    return stem + ".onnx" if backend == "onnx" else stem + "_openvino_model"
+
+
+def calibration_images(data, limit=CALIBRATION_IMAGES):
+    """Up to ``limit`` image paths from the val split (train if none) of dataset YAML ``data``."""
+    from ultralytics.data.utils import IMG_FORMATS, check_det_dataset
+    dataset = check_det_dataset(data)  # resolves paths, downloads known datasets such as coco8.yaml
+    split = dataset.get("val") or dataset["train"]
+    paths = []
+    for entry in split if isinstance(split, list) else [split]:
+        if os.path.isdir(entry):
+            paths += sorted(glob.glob(os.path.join(entry, "**", "*.*"), recursive=True))
+        else:  # a text file listing images, relative to its own directory
+            with open(entry) as f:
+                paths += [os.path.join(os.path.dirname(entry), line.strip()) for line in f if line.strip()]
+    paths = [path for path in paths if path.rsplit(".", 1)[-1].lower() in IMG_FORMATS]
+    if not paths:
+        raise SystemExit(f"❌ No calibration images found for {data}")
+    return paths[:limit]
+
+
+class CalibrationReader:
+    """onnxruntime calibration data reader: dataset images preprocessed as ultralytics does for inference."""
+
+    def __init__(self, model_path, images, imgsz=DEFAULT_IMGSZ):
+        import onnxruntime
+        from ultralytics.data.augment import LetterBox
+        session = onnxruntime.InferenceSession(model_path, providers=["CPUExecutionProvider"])
+        self.input_name = session.get_inputs()[0].name
+        self.letterbox = LetterBox((imgsz, imgsz), auto=False)
+        self.images = iter(images)
+
+    def get_next(self):
+        for path in self.images:
+            image = cv2.imread(path)
+            if image is None:
+                continue
+            blob = self.letterbox(image=image)[..., ::-1].transpose(2, 0, 1)  # BGR HWC -> RGB CHW
+            return {self.input_name: np.ascontiguousarray(blob[None], dtype=np.float32) / 255}
+        return None
+
+
+def quantize_onnx(exported, target, data, imgsz=DEFAULT_IMGSZ):
+    """Static INT8 (QDQ) quantization of the model's convolutions, calibrated on ``data`` images."""
+    from onnxruntime.quantization import QuantFormat, QuantType, quantize_static
+    from onnxruntime.quantization.shape_inference import quant_pre_process
+    prepared = os.path.splitext(exported)[0] + "_prep.onnx"
+    quant_pre_process(exported, prepared)  # shape inference and folding, as onnxruntime recommends
+    try:
+        quantize_static(prepared, target, CalibrationReader(prepared, calibration_images(data), imgsz),
+                        quant_format=QuantFormat.QDQ, op_types_to_quantize=["Conv"], per_channel=True,
+                        activation_type=QuantType.QUInt8, weight_type=QuantType.QInt8)
+    finally:
+        os.remove(prepared)
+
+
+def export_model(weights, backend, int8=False, imgsz=DEFAULT_IMGSZ, data=None):
+    """Export (and optionally quantize) ``weights`` for ``backend``; returns the artifact path."""
+    target = artifact_path(weights, backend, int8)
+    if backend == "pytorch":
+        return target
+    if int8 and not data:
+        raise SystemExit("❌ INT8 needs calibration images: pass --data <dataset.yaml>")
+    model = YOLO(weights)
+    started = time.perf_counter()
+    if backend == "onnx":
+        # Dynamic axes so ROI crops can use a smaller imgsz than the export size
+        exported = model.export(format="onnx", imgsz=imgsz, dynamic=True, simplify=True)
+        if int8:
+            quantize_onnx(exported, target, data, imgsz)
+        elif exported != target:
+            shutil.move(exported, target)
+    else:
+        exported = model.export(format="openvino", imgsz=imgsz, dynamic=True, int8=int8,
+                                **({"data": data} if int8 else {}))
+        if os.path.abspath(exported) != os.path.abspath(target):
+            shutil.rmtree(target, ignore_errors=True)
+            shutil.move(exported, target)
+    print(f"📦 Exported {weights} -> {target} in {time.perf_counter() - started:.1f}s")
+    return target
+
+
+def warm_up(model, imgsz=DEFAULT_IMGSZ, runs=WARMUP_RUNS):
+    """Run a few dummy frames so the first real frame does not pay for lazy initialisation."""
+    dummy = np.zeros((imgsz, imgsz, 3), dtype=np.uint8)
+    started = time.perf_counter()
+    for _ in range(runs):
+        model.predict(dummy, imgsz=imgsz, verbose=False)
+    return time.perf_counter() - started
+
+
+def load_model(weights, backend="pytorch", int8=False, imgsz=DEFAULT_IMGSZ, data=None, warmup=True):
+    """Load ``weights`` on ``backend``, exporting the artifact first if it does not exist yet."""
+    path = artifact_path(weights, backend, int8)
+    if not os.path.exists(path):
+        path = export_model(weights, backend, int8=int8, imgsz=imgsz, data=data)
+    model = YOLO(path, task="detect")
+    print(f"🧠 Inference backend: {backend}{' INT8' if int8 else ''} ({path})")
+    if warmup:
+        print(f"🔥 Warm-up: {warm_up(model, imgsz) * 1000:.0f} ms")
+    return model
+
+
+def add_backend_arguments(parser, backend="pytorch", int8=False):
+    """The --backend/--int8/--data options shared by the detector scripts."""
+    parser.add_argument("--backend", choices=BACKENDS, default=backend, help="inference backend")
+    parser.add_argument("--int8", action="store_true", default=int8, help="use the INT8-quantized model")
+    parser.add_argument("--data", help="dataset YAML whose images calibrate INT8")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--weights", required=True, help=".pt weights, e.g. yolov8n.pt or best.pt")
+    parser.add_argument("--imgsz", type=int, default=DEFAULT_IMGSZ)
+    parser.add_argument("--force", action="store_true", help="re-export even if the artifact exists")
+    add_backend_arguments(parser, backend="onnx")
+    args = parser.parse_args()
+
+    path = artifact_path(args.weights, args.backend, args.int8)
+    if os.path.exists(path) and not args.force:
+        print(f"✅ {path} already exists (use --force to re-export)")
+        return
+    export_model(args.weights, args.backend, int8=args.int8, imgsz=args.imgsz, data=args.data)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""Live count events from the detectors to dashboard clients.
+
+Detectors push events with an EventPublisher, which POSTs small JSON batches to
+the dashboard's localhost-only ingest endpoint. The dashboard fans them out to
+Server-Sent Event subscribers through an EventBroker.
+"""
+import json
+import queue
+import threading
+import time
+import urllib.error
+import urllib.request
+
+INGEST_URL = "http://127.0.0.1:5000/internal/events"
+
+
+class EventBroker:
+    """Per-location fan-out of events to subscriber queues (dashboard side)."""
+
+    def __init__(self, subscriber_queue_size=1000):
+        self.subscriber_queue_size = subscriber_queue_size
+        self._subscribers = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, location_id):
+        q = queue.Queue(maxsize=self.subscriber_queue_size)
+        with self._lock:
+            self._subscribers.setdefault(location_id, set()).add(q)
+        return q
+
+    def unsubscribe(self, location_id, q):
+        with self._lock:
+            subscribers = self._subscribers.get(location_id)
+            if subscribers:
+                subscribers.discard(q)
+                if not subscribers:
+                    del self._subscribers[location_id]
+
+    def publish(self, event):
+        with self._lock:
+            subscribers = list(self._subscribers.get(event["location_id"], ()))
+        for q in subscribers:
+            try:
+                q.put_nowait(event)
+            except queue.Full:
+                pass  # slow client; it resyncs from the REST endpoint
+
+    def subscriber_count(self):
+        with self._lock:
+            return sum(len(subscribers) for subscribers in self._subscribers.values())
+
+
+class EventPublisher:
+    """Send count events to the dashboard ingest endpoint (detector side).
+
+    ``publish`` never blocks the frame loop: events go into a bounded queue and a
+    background thread POSTs them in batches. If the dashboard is down, events are
+    dropped; they are still in the database.
+    """
+
+    def __init__(self, url=INGEST_URL, max_batch=100, max_delay=0.05, queue_size=10000, timeout=2.0):
+        self.url = url
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.timeout = timeout
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._stop_event = threading.Event()
+        self._thread = None
+        self.events_sent = 0
+        self.events_dropped = 0
+        self._last_error_print = 0.0
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="event-publisher", daemon=True)
+            self._thread.start()
+        return self
+
+    def publish(self, event):
+        try:
+            self._queue.put_nowait(event)
+        except queue.Full:
+            self.events_dropped += 1
+
+    def _post(self, batch):
+        request = urllib.request.Request(self.url, data=json.dumps(batch).encode(),
+                                         headers={"Content-Type": "application/json"})
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout):
+                pass
+            self.events_sent += len(batch)
+        except (urllib.error.URLError, OSError) as e:
+            self.events_dropped += len(batch)
+            now = time.time()
+            if now - self._last_error_print > 30:
+                print(f"⚠️ Could not publish live events to {self.url}: {e}")
+                self._last_error_print = now
+
+    def _run(self):
+        while not (self._stop_event.is_set() and self._queue.empty()):
+            try:
+                batch = [self._queue.get(timeout=0.5)]
+            except queue.Empty:
+                continue
+            deadline = time.monotonic() + self.max_delay
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._post(batch)
+
+    def close(self):
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.timeout + 1)
+            self._thread = None
@@ -0,0 +1,211 @@
+"""Annotated live video from the detectors to the dashboard, on demand.
+
+Detector side: a LiveFrameWriter owns a shared-memory segment per location
+holding a small ring of raw BGR frame slots. The dashboard marks the segment as
+watched while a viewer is connected. Only then, and at most ``max_fps`` times a
+second, does ``wants_frame()`` return True. The detector then draws its
+overlay and ``publish()``es the frame, which is one copy into the next slot.
+When nobody watches, the frame loop pays for one header read per frame.
+
+Dashboard side: LiveViews attaches a LiveFrameReader per location. The reader
+JPEG-encodes each new frame once, however many viewers share it, and app.py
+streams the JPEGs as MJPEG.
+
+Segment layout: a 64-byte header (magic, height, width, slots, sequence number
+of the newest frame, when it was published, watched-until time), followed by
+``slots`` frames of height x width x 3 bytes. Frame ``seq`` lives in slot
+``seq % slots``, so a reader has ``slots - 1`` frame intervals to encode it
+before the writer comes round to that slot again.
+"""
+import hashlib
+import struct
+import sys
+import threading
+import time
+from multiprocessing import resource_tracker, shared_memory
+
+import cv2
+import numpy as np
+
+MAGIC = b"VCLV"
+SLOTS = 3
+FRAME_SIZE = (480, 640)  # height, width of the slots; other frames are resized into them
+MAX_FPS = 10.0  # detector side: frames published per second while watched
+JPEG_QUALITY = 70
+WATCH_SECONDS = 2.0  # a viewer's mark lasts this long; the stream renews it every frame
+STALE_AFTER = 10.0  # dashboard side: no new frame for this long, the detector is gone
+
+HEADER_SIZE = 64
+META = struct.Struct("<4sIII")  # magic, height, width, slots
+SEQ = struct.Struct("<Q")
+TIME = struct.Struct("<d")
+SEQ_OFFSET, PUBLISHED_AT_OFFSET, WATCHED_UNTIL_OFFSET = 16, 24, 32
+
+
+def segment_name(location_id):
+    # Short and filesystem-safe whatever the location is called (macOS allows 31 characters)
+    return "vc_live_" + hashlib.md5(location_id.encode()).hexdigest()[:16]
+
+
+def _attach(name):
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name, track=False)
+    segment = shared_memory.SharedMemory(name)
+    # Attaching registers the segment too; the tracker would unlink it when the dashboard exits
+    resource_tracker.unregister(segment._name, "shared_memory")
+    return segment
+
+
+class LiveFrameWriter:
+    """Publish annotated frames for ``location_id`` while the dashboard is watching (detector side)."""
+
+    def __init__(self, location_id, size=FRAME_SIZE, slots=SLOTS, max_fps=MAX_FPS):
+        self.location_id = location_id
+        self.height, self.width = size
+        self.slots = slots
+        self.min_interval = 1.0 / max_fps
+        self.frames_published = 0
+        self._segment = None
+        self._frames = None
+        self._seq = 0
+        self._next_frame_at = 0.0
+
+    def open(self):
+        name = segment_name(self.location_id)
+        size = HEADER_SIZE + self.slots * self.height * self.width * 3
+        try:
+            self._segment = shared_memory.SharedMemory(name, create=True, size=size)
+        except FileExistsError:
+            # Left behind by a detector that was killed; its readers re-attach when it goes stale
+            stale = shared_memory.SharedMemory(name)
+            stale.close()
+            stale.unlink()
+            self._segment = shared_memory.SharedMemory(name, create=True, size=size)
+        buf = self._segment.buf
+        META.pack_into(buf, 0, MAGIC, self.height, self.width, self.slots)
+        SEQ.pack_into(buf, SEQ_OFFSET, 0)
+        TIME.pack_into(buf, PUBLISHED_AT_OFFSET, 0.0)
+        TIME.pack_into(buf, WATCHED_UNTIL_OFFSET, 0.0)
+        self._frames = np.ndarray((self.slots, self.height, self.width, 3), dtype=np.uint8,
+                                  buffer=buf, offset=HEADER_SIZE)
+        self._seq = 0
+        return self
+
+    def wants_frame(self):
+        """True when a viewer is watching and the rate cap allows another frame; cheap enough for every frame."""
+        now = time.time()
+        if self._segment is None or now < self._next_frame_at:
+            return False
+        return now < TIME.unpack_from(self._segment.buf, WATCHED_UNTIL_OFFSET)[0]
+
+    def publish(self, frame):
+        """Copy ``frame`` into the next slot and make it the newest."""
+        slot = self._frames[(self._seq + 1) % self.slots]
+        if frame.shape == slot.shape:
+            np.copyto(slot, frame)
+        else:
+            cv2.resize(frame, (self.width, self.height), dst=slot)
+        self._seq += 1
+        now = time.time()
+        TIME.pack_into(self._segment.buf, PUBLISHED_AT_OFFSET, now)
+        SEQ.pack_into(self._segment.buf, SEQ_OFFSET, self._seq)
+        self._next_frame_at = now + self.min_interval
+        self.frames_published += 1
+
+    def retarget(self, location_id):
+        """Move to another location's segment (the detector was pointed at another camera label)."""
+        if location_id != self.location_id:
+            self.close()
+            self.location_id = location_id
+            self.open()
+
+    def close(self):
+        if self._segment is None:
+            return
+        self._frames = None
+        self._segment.close()
+        try:
+            self._segment.unlink()
+        except FileNotFoundError:
+            pass
+        self._segment = None
+
+
+class LiveFrameReader:
+    """Encode the newest frame of one location's segment as JPEG, once per frame (dashboard side)."""
+
+    def __init__(self, location_id):
+        self.location_id = location_id
+        self._segment = _attach(segment_name(location_id))
+        magic, self.height, self.width, self.slots = META.unpack_from(self._segment.buf, 0)
+        if magic != MAGIC:
+            self._segment.close()
+            raise ValueError(f"{self._segment.name} is not a live view segment")
+        self._lock = threading.Lock()
+        self._jpeg = (0, None)  # (seq, bytes) of the last frame encoded
+        self.attached_at = time.time()
+
+    def watch(self, seconds=WATCH_SECONDS):
+        """Mark the segment as watched for ``seconds``; the writer starts publishing within a frame."""
+        with self._lock:
+            if self._segment is not None:
+                TIME.pack_into(self._segment.buf, WATCHED_UNTIL_OFFSET, time.time() + seconds)
+
+    def published_at(self):
+        with self._lock:
+            if self._segment is None:
+                return 0.0
+            return TIME.unpack_from(self._segment.buf, PUBLISHED_AT_OFFSET)[0]
+
+    def is_stale(self):
+        """No frame for STALE_AFTER seconds while watched: the detector stopped or started a new segment."""
+        return time.time() - max(self.published_at(), self.attached_at) > STALE_AFTER
+
+    def jpeg(self, after_seq=0):
+        """``(seq, jpeg_bytes)`` of the newest frame if it is newer than ``after_seq``, else None."""
+        with self._lock:
+            if self._segment is None:
+                return None
+            seq = SEQ.unpack_from(self._segment.buf, SEQ_OFFSET)[0]
+            if seq <= after_seq:
+                return None
+            if seq != self._jpeg[0]:
+                frame = np.ndarray((self.height, self.width, 3), dtype=np.uint8, buffer=self._segment.buf,
+                                   offset=HEADER_SIZE + (seq % self.slots) * self.height * self.width * 3)
+                ok, encoded = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, JPEG_QUALITY])
+                del frame  # no views may outlive the segment
+                # The writer overwrites this slot once it starts on frame seq + slots
+                if not ok or SEQ.unpack_from(self._segment.buf, SEQ_OFFSET)[0] >= seq + self.slots - 1:
+                    return None
+                self._jpeg = (seq, encoded.tobytes())
+            return self._jpeg
+
+    def close(self):
+        with self._lock:
+            if self._segment is not None:
+                self._segment.close()
+                self._segment = None
+
+
+class LiveViews:
+    """One shared reader per location, re-attached when its detector restarts (dashboard side)."""
+
+    def __init__(self):
+        self._readers = {}
+        self._lock = threading.Lock()
+
+    def reader(self, location_id):
+        """The location's reader, or None if no detector is publishing for it."""
+        with self._lock:
+            reader = self._readers.get(location_id)
+            if reader is not None and not reader.is_stale():
+                return reader
+            if reader is not None:
+                reader.close()  # streams still holding it end, and their viewers reconnect
+                del self._readers[location_id]
+            try:
+                reader = LiveFrameReader(location_id)
+            except (FileNotFoundError, ValueError):
+                return None
+            self._readers[location_id] = reader
+            return reader
@@ -0,0 +1,316 @@
+"""Detector health metrics, from the frame loop to the dashboard's /metrics.
+
+Detector side: a DetectorMetrics holds plain counters and fixed-bucket
+histograms. The frame loop only increments integers and bisects a short bucket
+list; capture and event-writer statistics are read when a snapshot is taken.
+A MetricsPublisher POSTs a JSON snapshot to the dashboard every few seconds
+from a background thread.
+
+Dashboard side: a MetricsRegistry keeps the latest snapshot per location and
+renders them as Prometheus text or as a per-location health summary.
+
+Histograms are reported twice: since the detector started ("histograms", for
+Prometheus, which computes its own rates) and since the previous report
+("recent_histograms"), which the health summary uses so its status follows
+what the detector is doing now rather than its whole run.
+"""
+import bisect
+import json
+import os
+import threading
+import time
+import urllib.error
+import urllib.request
+
+METRICS_URL = "http://127.0.0.1:5000/internal/metrics"
+PUBLISH_INTERVAL = 5.0
+METRIC_PREFIX = "vehicle_counter"
+
+# Bucket upper bounds in seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.02, 0.05, 0.1, 0.2, 0.5, 1.0, 2.0, 5.0)
+FRAME_AGE_BUCKETS = (0.05, 0.1, 0.2, 0.5, 1.0, 2.0, 5.0, 10.0, 30.0)
+
+# Health thresholds
+STALE_AFTER = 3 * PUBLISH_INTERVAL  # no report for this long: detector down or stuck
+LAGGING_FRAME_AGE = 2.0  # p95 frame age over the last report interval above this: detector not keeping up
+
+HELP = {
+    "frames_processed": ("counter", "Frames run through the detector loop."),
+    "frames_skipped": ("counter", "Frames where inference was skipped by the motion gate."),
+    "frames_dropped": ("counter", "Decoded frames replaced by a newer one before the detector used them."),
+    "reconnects": ("counter", "Camera stream reconnects."),
+    "vehicles_counted": ("counter", "Vehicles counted crossing a line or zone."),
+    "events_written": ("counter", "Events committed to the database."),
+    "write_errors": ("counter", "Failed event write attempts (database batches are retried)."),
+    "fps": ("gauge", "Frames processed per second since the previous report."),
+    "last_frame_age_seconds": ("gauge", "Age of the most recent frame when the detector picked it up."),
+    "write_queue_depth": ("gauge", "Events waiting for the database writer."),
+    "uptime_seconds": ("gauge", "Seconds since the detector started."),
+    "inference_seconds": ("histogram", "model.track latency per frame."),
+    "frame_age_seconds": ("histogram", "Frame age when the detector picked the frame up."),
+    "write_seconds": ("histogram", "Event batch write (SQLite transaction + CSV) latency."),
+}
+
+
+class Histogram:
+    """Fixed-bucket histogram; ``observe`` is a bisect and two additions."""
+
+    __slots__ = ("bounds", "counts", "sum", "count")
+
+    def __init__(self, bounds):
+        self.bounds = tuple(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)  # last bucket is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def snapshot(self):
+        return {"bounds": list(self.bounds), "counts": list(self.counts), "sum": self.sum, "count": self.count}
+
+
+def histogram_delta(current, previous):
+    """What was observed between two snapshots of the same histogram (``previous`` None = since the start)."""
+    if previous is None:
+        return current
+    return {"bounds": current["bounds"],
+            "counts": [now - then for now, then in zip(current["counts"], previous["counts"])],
+            "sum": current["sum"] - previous["sum"], "count": current["count"] - previous["count"]}
+
+
+def histogram_quantile(snapshot, q):
+    """Estimate a quantile from a histogram snapshot (linear within the bucket, like Prometheus)."""
+    total = snapshot["count"]
+    if not total:
+        return None
+    rank = q * total
+    cumulative = 0
+    bounds = snapshot["bounds"]
+    for i, count in enumerate(snapshot["counts"]):
+        if cumulative + count >= rank and count:
+            if i == len(bounds):  # +Inf bucket: best we can say is the last bound
+                return bounds[-1]
+            lower = bounds[i - 1] if i else 0.0
+            return lower + (bounds[i] - lower) * (rank - cumulative) / count
+        cumulative += count
+    return bounds[-1]
+
+
+class DetectorMetrics:
+    """Counters and histograms for one detector (one location)."""
+
+    def __init__(self, location_id, capture=None, event_writer=None):
+        self.location_id = location_id
+        self.capture = capture
+        self.event_writer = event_writer
+        self.started = time.time()
+        self.frames_processed = 0
+        self.frames_skipped = 0
+        self.vehicles_counted = 0
+        self.last_frame_age = None
+        self.inference_seconds = Histogram(LATENCY_BUCKETS)
+        self.frame_age_seconds = Histogram(FRAME_AGE_BUCKETS)
+        self.write_seconds = Histogram(LATENCY_BUCKETS)
+        self._last_snapshot = (self.started, 0)
+        self._last_histograms = {}  # name -> snapshot at the previous report
+
+    # === Hot loop ===
+    def frame(self, frame_age=None):
+        self.frames_processed += 1
+        if frame_age is not None:
+            self.last_frame_age = frame_age
+            self.frame_age_seconds.observe(frame_age)
+
+    def skipped(self):
+        self.frames_skipped += 1
+
+    def inference(self, seconds):
+        self.inference_seconds.observe(seconds)
+
+    def counted(self, vehicles=1):
+        self.vehicles_counted += vehicles
+
+    # === Reporting ===
+    def snapshot(self):
+        now = time.time()
+        last_time, last_frames = self._last_snapshot
+        self._last_snapshot = (now, self.frames_processed)
+        counters = {
+            "frames_processed": self.frames_processed,
+            "frames_skipped": self.frames_skipped,
+            "vehicles_counted": self.vehicles_counted,
+        }
+        gauges = {
+            "fps": round((self.frames_processed - last_frames) / (now - last_time), 2) if now > last_time else 0.0,
+            "uptime_seconds": round(now - self.started, 1),
+        }
+        if self.last_frame_age is not None:
+            gauges["last_frame_age_seconds"] = round(self.last_frame_age, 4)
+        if self.capture is not None:
+            stats = self.capture.stats()
+            counters["frames_dropped"] = stats["frames_dropped"]
+            counters["reconnects"] = stats["reconnects"]
+        if self.event_writer is not None:
+            counters["events_written"] = self.event_writer.events_written
+            counters["write_errors"] = self.event_writer.write_errors
+            gauges["write_queue_depth"] = self.event_writer.queue_depth()
+        histograms = {
+            "inference_seconds": self.inference_seconds.snapshot(),
+            "frame_age_seconds": self.frame_age_seconds.snapshot(),
+            "write_seconds": self.write_seconds.snapshot(),
+        }
+        recent = {name: histogram_delta(hist, self._last_histograms.get(name)) for name, hist in histograms.items()}
+        self._last_histograms = histograms
+        return {
+            "location_id": self.location_id,
+            "pid": os.getpid(),
+            "reported_at": now,
+            "counters": counters,
+            "gauges": gauges,
+            "histograms": histograms,
+            "recent_histograms": recent,
+        }
+
+
+class MetricsPublisher:
+    """POST ``metrics.snapshot()`` to the dashboard every ``interval`` seconds (detector side)."""
+
+    def __init__(self, metrics, url=METRICS_URL, interval=PUBLISH_INTERVAL, timeout=2.0):
+        self.metrics = metrics
+        self.url = url
+        self.interval = interval
+        self.timeout = timeout
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._last_error_print = 0.0
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="metrics-publisher", daemon=True)
+            self._thread.start()
+        return self
+
+    def _post(self):
+        request = urllib.request.Request(self.url, data=json.dumps(self.metrics.snapshot()).encode(),
+                                         headers={"Content-Type": "application/json"})
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout):
+                pass
+        except (urllib.error.URLError, OSError) as e:
+            now = time.time()
+            if now - self._last_error_print > 60:
+                print(f"⚠️ Could not publish metrics to {self.url}: {e}")
+                self._last_error_print = now
+
+    def _run(self):
+        while not self._stop_event.wait(self.interval):
+            self._post()
+
+    def close(self):
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.timeout + 1)
+            self._thread = None
+
+
+class MetricsRegistry:
+    """Latest snapshot per location (dashboard side)."""
+
+    def __init__(self):
+        self._snapshots = {}
+        self._received = {}
+        self._lock = threading.Lock()
+
+    def update(self, snapshot):
+        with self._lock:
+            self._snapshots[snapshot["location_id"]] = snapshot
+            self._received[snapshot["location_id"]] = time.time()
+
+    def snapshots(self):
+        """``{location_id: (snapshot, seconds since it arrived)}``"""
+        now = time.time()
+        with self._lock:
+            return {location: (snapshot, now - self._received[location])
+                    for location, snapshot in self._snapshots.items()}
+
+    def health(self, location_id):
+        entry = self.snapshots().get(location_id)
+        if entry is None:
+            return {"location_id": location_id, "status": "unknown", "detail": "no detector has reported"}
+        return health_summary(*entry)
+
+    def render_prometheus(self):
+        return render_prometheus(self.snapshots())
+
+
+def _label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def render_prometheus(snapshots):
+    """Prometheus text exposition (format 0.0.4) for ``{location: (snapshot, age)}``."""
+    families = {}  # metric -> [sample lines], grouped so each family gets one HELP/TYPE header
+    for location, (snapshot, age) in sorted(snapshots.items()):
+        labels = f'location="{_label(location)}"'
+        families.setdefault("up", []).append(f"{METRIC_PREFIX}_up{{{labels}}} {int(age < STALE_AFTER)}")
+        families.setdefault("report_age_seconds", []).append(
+            f"{METRIC_PREFIX}_report_age_seconds{{{labels}}} {age:.3f}")
+        for name, value in snapshot["counters"].items():
+            families.setdefault(name, []).append(f"{METRIC_PREFIX}_{name}_total{{{labels}}} {value}")
+        for name, value in snapshot["gauges"].items():
+            families.setdefault(name, []).append(f"{METRIC_PREFIX}_{name}{{{labels}}} {value}")
+        for name, hist in snapshot["histograms"].items():
+            metric = f"{METRIC_PREFIX}_{name}"
+            lines = families.setdefault(name, [])
+            cumulative = 0
+            for bound, count in zip([*hist["bounds"], "+Inf"], hist["counts"]):
+                cumulative += count
+                lines.append(f'{metric}_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f"{metric}_sum{{{labels}}} {hist['sum']}")
+            lines.append(f"{metric}_count{{{labels}}} {hist['count']}")
+
+    out = []
+    builtin = {"up": ("gauge", "1 if the detector reported recently."),
+               "report_age_seconds": ("gauge", "Seconds since the detector's last report.")}
+    for name, lines in families.items():
+        kind, text = HELP.get(name) or builtin.get(name) or ("untyped", name)
+        if kind == "counter":
+            metric = f"{METRIC_PREFIX}_{name}_total"
+        else:
+            metric = f"{METRIC_PREFIX}_{name}"
+        out.append(f"# HELP {metric} {text}")
+        out.append(f"# TYPE {metric} {kind}")
+        out.extend(lines)
+    return "\n".join(out) + "\n"
+
+
+def health_summary(snapshot, age):
+    """JSON-friendly health view of one location's latest snapshot, over its last reporting interval."""
+    hists = snapshot.get("recent_histograms") or snapshot["histograms"]  # detectors from before the split
+
+    def ms(hist, q):
+        value = histogram_quantile(hists[hist], q)
+        return round(value * 1000, 1) if value is not None else None
+
+    frame_age_p95 = histogram_quantile(hists["frame_age_seconds"], 0.95)
+    if age >= STALE_AFTER:
+        status, detail = "down", f"no report for {age:.0f}s"
+    elif frame_age_p95 is not None and frame_age_p95 > LAGGING_FRAME_AGE:
+        status, detail = "lagging", f"p95 frame age {frame_age_p95:.1f}s"
+    else:
+        status, detail = "ok", ""
+    return {
+        "location_id": snapshot["location_id"],
+        "status": status,
+        "detail": detail,
+        "last_report_seconds_ago": round(age, 1),
+        "pid": snapshot.get("pid"),
+        "counters": snapshot["counters"],
+        "gauges": snapshot["gauges"],
+        "inference_ms": {"p50": ms("inference_seconds", 0.5), "p95": ms("inference_seconds", 0.95)},
+        "frame_age_ms": {"p50": ms("frame_age_seconds", 0.5), "p95": ms("frame_age_seconds", 0.95)},
+        "write_ms": {"p50": ms("write_seconds", 0.5), "p95": ms("write_seconds", 0.95)},
+    }
@@ -0,0 +1,79 @@
+"""Convert vehicle_data.db from the old TEXT schema to the indexed integer schema.
+
+Usage:
+    python migrate_db.py [--db vehicle_data.db] [--no-backup]
+
+The database is converted in place (a .bak copy is kept unless --no-backup),
+its rows are split into monthly partitions (see partitions.py), and the size on
+disk and a per-location 7-day count query are measured before and after.
+"""
+import argparse
+import os
+import shutil
+import sqlite3
+import time
+
+import partitions
+import storage
+
+QUERY_REPEATS = 20
+
+
+def time_query(conn, sql, params_list):
+    started = time.perf_counter()
+    for _ in range(QUERY_REPEATS):
+        for params in params_list:
+            conn.execute(sql, params).fetchall()
+    return (time.perf_counter() - started) / (QUERY_REPEATS * len(params_list))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", default=storage.DB_FILENAME)
+    parser.add_argument("--no-backup", action="store_true")
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(args.db)
+    if not storage.needs_migration(conn):
+        print("✅ Database already uses the current schema.")
+        conn.close()
+        return
+
+    if not args.no_backup:
+        shutil.copyfile(args.db, args.db + ".bak")
+        print(f"📦 Backup written to {args.db}.bak")
+
+    # Per-location count over the last 7 days of data, the shape of every dashboard query
+    day_range = conn.execute("SELECT DATE(MAX(timestamp), '-6 days'), DATE(MAX(timestamp)) FROM vehicles").fetchone()
+    locations = [row[0] for row in conn.execute("SELECT DISTINCT location_id FROM vehicles")]
+    rows = conn.execute("SELECT COUNT(*) FROM vehicles").fetchone()[0]
+    size_before = os.path.getsize(args.db)
+    query_before = time_query(conn, """
+        SELECT COUNT(*) FROM vehicles
+        WHERE DATE(timestamp) BETWEEN ? AND ? AND location_id = ? AND vehicle_type != 'bus'
+    """, [(*day_range, location) for location in locations])
+
+    started = time.perf_counter()
+    storage.init_database(conn)
+    conn.execute("VACUUM")
+    migrate_seconds = time.perf_counter() - started
+
+    months = partitions.list_partitions(args.db)
+    size_after = os.path.getsize(args.db) + sum(os.path.getsize(partitions.partition_path(args.db, month))
+                                                for month in months)
+    start_ts, end_ts = storage.to_ts(day_range[0]), storage.to_ts(day_range[1]) + 86400
+    partitions.attach_months(conn, partitions.months_between(start_ts, end_ts), args.db)
+    query_after = time_query(conn, """
+        SELECT COUNT(*) FROM vehicles v JOIN vehicle_types t ON t.id = v.vehicle_type_id
+        WHERE v.location_id = (SELECT id FROM locations WHERE name = ?) AND v.ts >= ? AND v.ts < ?
+        AND t.name != 'bus'
+    """, [(location, start_ts, end_ts) for location in locations])
+    conn.close()
+
+    print(f"✅ Migrated {rows} rows into {len(months)} monthly partitions in {migrate_seconds:.2f}s")
+    print(f"📊 DB size:    {size_before / 1024:.0f} KiB -> {size_after / 1024:.0f} KiB")
+    print(f"📊 Range query: {query_before * 1000:.3f} ms -> {query_after * 1000:.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
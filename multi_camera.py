@@ -0,0 +1,186 @@
+import json
+import os
+import time
+
+import numpy as np
+from ultralytics.trackers.byte_tracker import BYTETracker
+from ultralytics.utils import IterableSimpleNamespace
+from ultralytics.utils.checks import check_yaml
+
+try:
+    from ultralytics.utils import yaml_load
+except ImportError:  # ultralytics >= 8.3.x moved YAML helpers into a class
+    from ultralytics.utils import YAML
+    yaml_load = YAML.load
+
+from capture import LatestFrameCapture
+from counting import CountingEngine
+from event_writer import EventWriter
+from inference import load_model
+from live_events import EventPublisher
+from motion_gate import MotionGate
+from propagation import DETECT_EVERY, TrackPropagator
+from roi import MAX_IMGSZ, RegionOfInterest
+from runtime import install_shutdown_handler
+from storage import now_ts, ts_to_str
+from track_state import TrackStore
+from video_input import substream_url
+
+# === Configuration ===
+CAMERAS_FILE = "cameras.json"
+MODEL_PATH = "yolov8n.pt"
+INFERENCE_BACKEND = "pytorch"  # "pytorch", "onnx" or "openvino", see inference.py
+INT8 = False  # use the INT8-quantized export
+CALIBRATION_DATA = None  # dataset YAML to calibrate the INT8 export if it does not exist yet
+TRACKER_CONFIG = "bytetrack.yaml"
+CONFIDENCE_THRESHOLD = 0.5
+TARGET_CLASSES = ["car", "motorcycle", "truck"]
+DB_FILENAME = "vehicle_data.db"
+CSV_FILENAME = "logs/vehicle_log_all_{month}.csv"  # EventWriter starts a new file every month
+FRAME_WAIT = 0.05  # seconds to wait for a camera with a fresh frame before batching
+STATS_INTERVAL = 30
+PUBLISH_LIVE_EVENTS = True  # push counts to the dashboard (app.py) as they happen
+MOTION_GATE = True  # leave a camera out of the batch while nothing moves near its count lines
+
+
+def load_cameras(path=CAMERAS_FILE):
+    """Read the camera list: location_id, source, count lines and zones per camera."""
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+def make_tracker(tracker_config=TRACKER_CONFIG, frame_rate=30):
+    """Create a standalone ByteTrack instance so each camera keeps its own track state."""
+    cfg = IterableSimpleNamespace(**yaml_load(check_yaml(tracker_config)))
+    try:
+        return BYTETracker(cfg, frame_rate=frame_rate)
+    except TypeError:  # newer ultralytics releases dropped the frame_rate argument
+        return BYTETracker(cfg)
+
+
+def infer_batch(model, frames, trackers, conf=CONFIDENCE_THRESHOLD, imgsz=MAX_IMGSZ):
+    """Run one batched detection pass and update each camera's tracker.
+
+    Returns one array per frame with ``[x1, y1, x2, y2, track_id, score, cls, ...]`` rows.
+    """
+    results = model.predict(frames, conf=conf, imgsz=imgsz, verbose=False)
+    tracks = []
+    for result, frame, tracker in zip(results, frames, trackers):
+        boxes = result.boxes.cpu().numpy()
+        if len(boxes) == 0:
+            tracks.append(np.empty((0, 8)))
+            continue
+        tracks.append(tracker.update(boxes, frame))
+    return tracks
+
+
+class CameraStream:
+    """Per-camera state: capture thread, ROI, tracker, counting engine and counters."""
+
+    def __init__(self, camera):
+        self.location_id = camera["location_id"]
+        self.counter = CountingEngine.from_config(camera)
+        self.motion_gate = MotionGate(self.counter) if MOTION_GATE else None
+        self.roi = RegionOfInterest.from_config(camera)
+        source = substream_url(camera["source"]) if camera.get("substream") else camera["source"]
+        self.capture = LatestFrameCapture(source, width=640, height=480)
+        self.tracker = make_tracker()
+        self.track_state = TrackStore()
+        detect_every = camera.get("detect_every", DETECT_EVERY)
+        self.propagator = TrackPropagator(detect_every) if detect_every > 1 else None
+        self.counts = {label: 0 for label in TARGET_CLASSES}
+
+
+def main():
+    cameras = load_cameras()
+    model = load_model(MODEL_PATH, INFERENCE_BACKEND, int8=INT8, data=CALIBRATION_DATA)  # loaded once and shared by every camera
+    names = model.names
+    streams = [CameraStream(camera) for camera in cameras]
+    for stream in streams:
+        stream.capture.start()
+    print(f"🎥 Batched inference for {len(streams)} cameras: {', '.join(s.location_id for s in streams)}")
+
+    os.makedirs("logs", exist_ok=True)
+    event_writer = EventWriter(DB_FILENAME, csv_path=CSV_FILENAME,
+                               csv_header=["Timestamp", "Vehicle Type", "Vehicle ID", "Location ID"],
+                               publisher=EventPublisher().start() if PUBLISH_LIVE_EVENTS else None).start()
+
+    # The handler only sets a flag; the writer is closed below, outside any submit()
+    stop_event = install_shutdown_handler()
+
+    batches = frames_processed = 0
+    start_time = last_stats_time = time.time()
+
+    while not stop_event.is_set():
+        # Collect the newest frame from every camera that has one; cameras between detections use optical flow
+        ready, frames, detected_frames, camera_tracks = [], [], [], []
+        for stream in streams:
+            frame, _ = stream.capture.read(timeout=0)
+            if frame is None:
+                continue
+            if stream.motion_gate is not None and not stream.motion_gate.check(frame):
+                if stream.propagator is not None:
+                    stream.propagator.reset()
+            elif stream.propagator is not None and not stream.propagator.due():
+                track_ids, boxes, classes = stream.propagator.propagate(frame)  # score column is not used
+                camera_tracks.append((stream, np.column_stack([boxes, track_ids, np.ones(len(track_ids)), classes])))
+            else:
+                ready.append(stream)
+                frames.append(stream.roi.crop(frame) if stream.roi else frame)
+                detected_frames.append(frame)
+        if not frames and not camera_tracks:
+            time.sleep(FRAME_WAIT)
+            continue
+
+        if frames:
+            # One letterbox size per batch: the largest any camera in it needs
+            imgsz = max(stream.roi.imgsz if stream.roi else MAX_IMGSZ for stream in ready)
+            tracks = infer_batch(model, frames, [stream.tracker for stream in ready], imgsz=imgsz)
+            batches += 1
+            frames_processed += len(frames)
+            for stream, frame, stream_tracks in zip(ready, detected_frames, tracks):
+                if stream.roi and len(stream_tracks):
+                    stream_tracks = stream.roi.to_frame(stream_tracks)
+                if stream.propagator is not None:
+                    stream_tracks[:, 4] = stream.propagator.detected(frame, stream_tracks[:, 4], stream_tracks[:, :4],
+                                                                     stream_tracks[:, 6])[0]
+                camera_tracks.append((stream, stream_tracks))
+
+        ts = now_ts()
+        for stream, stream_tracks in camera_tracks:
+            if len(stream_tracks) == 0:
+                continue
+            track_ids = stream_tracks[:, 4].astype(int)
+            classes = stream_tracks[:, 6].astype(int)
+            centers = (stream_tracks[:, :2] + stream_tracks[:, 2:4]) / 2
+            prev_centers = stream.track_state.update(track_ids, centers)
+
+            for row, line_name, direction in stream.counter.crossings(prev_centers, centers):
+                label = names[classes[row]]
+                track_id = int(track_ids[row])
+                if label not in TARGET_CLASSES or stream.track_state.is_counted(track_id):
+                    continue
+                stream.track_state.mark_counted(track_id)
+                stream.counts[label] += 1
+                event_writer.submit(ts, label, track_id, stream.location_id)
+                print(f"✔ Counted {label}-{track_id} at {ts_to_str(ts)} for location {stream.location_id} "
+                      f"({line_name} {direction})")
+
+        current_time = time.time()
+        if current_time - last_stats_time >= STATS_INTERVAL:
+            elapsed = current_time - start_time
+            print(f"📊 {frames_processed / elapsed:.1f} frames/s across {len(streams)} cameras, "
+                  f"avg batch {frames_processed / batches:.1f}")
+            if MOTION_GATE:
+                print("💤 Motion gate skipped " + ", ".join(f"{stream.location_id}: {stream.motion_gate.skip_ratio:.0%}"
+                                                          for stream in streams))
+            last_stats_time = current_time
+
+    print("\n🔻 Exiting... Saving data.")
+    for stream in streams:
+        stream.capture.stop()
+    event_writer.close()
+
+
+if __name__ == "__main__":
+    main()
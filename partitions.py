@@ -0,0 +1,459 @@
+"""Monthly partitions of the vehicles table, and archival of old months to Parquet.
+
+vehicle_data.db is the catalog: it holds the locations and vehicle_types lookup
+tables. Each calendar month of events is its own SQLite file,
+vehicle_data_partitions/vehicles_YYYY_MM.db, holding that month's raw rows and
+its hourly/daily rollups. Backups, VACUUM and scans touch one month at a time,
+and a month nobody writes to any more never changes on disk.
+
+Event ids stay unique across partitions: a month's ids start at its id_base()
+(``month_index << 32``), so ``month_of_id(id)`` tells which file a row is in.
+
+Writers ATTACH the month they are writing to. Readers ATTACH only the months
+their date range touches (attach_months) and query TEMP views with the usual
+table names, so the dashboard's rollup queries run unchanged and a query for
+this week never opens last year's files.
+
+Retention: raw rows of months older than --keep-months are written to
+zstd-compressed Parquet in vehicle_data_archive/YYYY-MM/ and deleted from the
+partition, which is VACUUMed down to its rollups (the dashboard keeps showing
+those months). With --drop-after-months, partitions older than that are
+deleted entirely; their Parquet archives are kept.
+
+Usage:
+    python partitions.py                     # list partitions
+    python partitions.py --archive [--keep-months 3] [--drop-after-months 36]
+"""
+import argparse
+import glob
+import os
+import pathlib
+import sqlite3
+import time
+
+from rollups import ensure_rollups, rebuild_rollups
+from storage import DB_FILENAME, PARTITION_SCHEMA, VIEWS, init_database, now_ts, to_ts
+
+KEEP_MONTHS = 3
+ARCHIVE_BATCH_ROWS = 100000
+EXPORT_BATCH_ROWS = 5000
+DEFAULT_ATTACH_LIMIT = 10  # SQLite's compiled-in default, for Pythons without Connection.getlimit
+
+# Tables every partition has, with the columns the TEMP views expose
+PARTITION_TABLES = {
+    "vehicles": ("id", "ts", "vehicle_type_id", "vehicle_id", "location_id"),
+    "vehicle_counts_hourly": ("location_id", "hour_ts", "vehicle_type_id", "count"),
+    "vehicle_counts_daily": ("location_id", "day_ts", "vehicle_type_id", "count"),
+}
+ROLLUP_TABLES = ("vehicle_counts_hourly", "vehicle_counts_daily")
+
+
+# === Months ===
+def month_of(ts):
+    """"YYYY-MM" of a storage ts."""
+    t = time.gmtime(ts)
+    return f"{t.tm_year:04d}-{t.tm_mon:02d}"
+
+
+def month_index(month):
+    year, mon = month.split("-")
+    return int(year) * 12 + int(mon) - 1
+
+
+def month_from_index(index):
+    return f"{index // 12:04d}-{index % 12 + 1:02d}"
+
+
+def month_bounds(month):
+    """``[start, end)`` ts range of a month."""
+    return to_ts(f"{month}-01"), to_ts(f"{month_from_index(month_index(month) + 1)}-01")
+
+
+def months_between(start_ts, end_ts):
+    """Months touched by the ts range ``[start_ts, end_ts)``, oldest first."""
+    if end_ts <= start_ts:
+        return []
+    first, last = month_index(month_of(start_ts)), month_index(month_of(end_ts - 1))
+    return [month_from_index(i) for i in range(first, last + 1)]
+
+
+def id_base(month):
+    return month_index(month) << 32
+
+
+def month_of_id(event_id):
+    return month_from_index(event_id >> 32)
+
+
+# === Layout ===
+def partition_dir(db_path):
+    return os.path.splitext(db_path)[0] + "_partitions"
+
+
+def archive_dir(db_path):
+    return os.path.splitext(db_path)[0] + "_archive"
+
+
+def partition_path(db_path, month):
+    return os.path.join(partition_dir(db_path), f"vehicles_{month.replace('-', '_')}.db")
+
+
+def schema_name(month):
+    return "p_" + month.replace("-", "_")
+
+
+def existing_months(db_path, months):
+    """The months of ``months`` that have a partition file, oldest first."""
+    return [month for month in sorted(set(months)) if os.path.exists(partition_path(db_path, month))]
+
+
+def list_partitions(db_path):
+    """Months that have a partition file, oldest first."""
+    names = glob.glob(os.path.join(partition_dir(db_path), "vehicles_[0-9][0-9][0-9][0-9]_[0-9][0-9].db"))
+    return sorted(os.path.basename(name)[len("vehicles_"):-len(".db")].replace("_", "-") for name in names)
+
+
+def read_only_uri(path):
+    """URI opening ``path`` read-only (connect with ``uri=True``)."""
+    return pathlib.Path(path).absolute().as_uri() + "?mode=ro"
+
+
+def catalog_path(conn):
+    """File name of the connection's main database."""
+    return conn.execute("PRAGMA database_list").fetchone()[2]
+
+
+def init_partition(db_path, month):
+    """Create ``month``'s partition file with its schema if it does not exist yet."""
+    path = partition_path(db_path, month)
+    os.makedirs(partition_dir(db_path), exist_ok=True)
+    conn = sqlite3.connect(path)
+    try:
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(PARTITION_SCHEMA)
+        ensure_rollups(conn)
+        # AUTOINCREMENT continues from the month's base, keeping ids unique across partitions
+        conn.execute("""
+            INSERT INTO sqlite_sequence (name, seq) SELECT 'vehicles', ?
+            WHERE NOT EXISTS (SELECT 1 FROM sqlite_sequence WHERE name = 'vehicles')
+        """, (id_base(month),))
+        conn.commit()
+    finally:
+        conn.close()
+    return path
+
+
+def attach_partition(conn, db_path, month, create=False, read_only=False):
+    """ATTACH ``month``'s partition to ``conn``; returns its schema name, or None if it doesn't exist.
+
+    ``read_only`` needs a connection opened with ``uri=True``.
+    """
+    path = partition_path(db_path, month)
+    if create:
+        init_partition(db_path, month)
+    elif not os.path.exists(path):
+        return None
+    schema = schema_name(month)
+    conn.execute(f"ATTACH DATABASE ? AS {schema}", (read_only_uri(path) if read_only else path,))
+    return schema
+
+
+def attach_limit(conn):
+    """How many more databases ``conn`` can ATTACH."""
+    limit = conn.getlimit(sqlite3.SQLITE_LIMIT_ATTACHED) if hasattr(conn, "getlimit") else DEFAULT_ATTACH_LIMIT
+    attached = [row for row in conn.execute("PRAGMA database_list") if row[1] not in ("main", "temp")]
+    return limit - len(attached)
+
+
+# === Reading ===
+def _columns(table):
+    return ", ".join(PARTITION_TABLES[table])
+
+
+def create_views(conn, schemas):
+    """(Re)create the TEMP views over the attached partitions ``schemas``."""
+    conn.execute("DROP VIEW IF EXISTS temp.vehicle_events")
+    for table, columns in PARTITION_TABLES.items():
+        selects = [f"SELECT {_columns(table)} FROM {schema}.{table}" for schema in schemas]
+        empty = "SELECT " + ", ".join(f"NULL AS {column}" for column in columns) + " WHERE 0"
+        conn.execute(f"DROP VIEW IF EXISTS temp.{table}")
+        conn.execute(f"CREATE TEMP VIEW {table} AS " + (" UNION ALL ".join(selects) or empty))
+    conn.executescript(VIEWS)
+
+
+def newest_ids(conn, months):
+    """``((month, newest event id), ...)`` for attached ``months``."""
+    return tuple((month, conn.execute(f"SELECT MAX(id) FROM {schema_name(month)}.vehicles").fetchone()[0])
+                 for month in months)
+
+
+def attach_months(conn, months, db_path=None, read_only=False):
+    """Make ``months`` queryable on a catalog connection, through TEMP views.
+
+    The views are named like the partition tables (vehicles, vehicle_counts_hourly,
+    vehicle_counts_daily) plus vehicle_events, and are the UNION ALL of the months
+    that have a partition; other months are never opened. If there are more months
+    than SQLite can attach at once, the rollup rows are copied into TEMP tables a
+    few months at a time instead and raw rows are not available (read those one
+    partition at a time). Call once per connection.
+
+    Returns ``((month, newest event id), ...)`` for the months found; it changes
+    whenever a row is written to any of them, so callers can use it to validate caches.
+    """
+    db_path = db_path or catalog_path(conn)
+    months = existing_months(db_path, months)
+    if len(months) <= attach_limit(conn):
+        create_views(conn, [attach_partition(conn, db_path, month, read_only=read_only) for month in months])
+        return newest_ids(conn, months)
+
+    version = ()
+    for table in ROLLUP_TABLES:
+        conn.execute(f"CREATE TEMP TABLE {table} ({_columns(table)})")
+    chunk_size = max(1, attach_limit(conn))
+    for i in range(0, len(months), chunk_size):
+        chunk = months[i:i + chunk_size]
+        schemas = [attach_partition(conn, db_path, month, read_only=read_only) for month in chunk]
+        with conn:
+            for schema in schemas:
+                for table in ROLLUP_TABLES:
+                    conn.execute(f"INSERT INTO temp.{table} SELECT {_columns(table)} FROM {schema}.{table}")
+            version += newest_ids(conn, chunk)
+        for schema in schemas:
+            conn.execute(f"DETACH DATABASE {schema}")
+    return version
+
+
+def event_position(db_path, event_id):
+    """Where event ``event_id`` sits in iter_events' order, as its ``after`` argument; None if it doesn't exist."""
+    month = month_of_id(event_id)
+    conn = sqlite3.connect(read_only_uri(db_path), uri=True)
+    try:
+        schema = attach_partition(conn, db_path, month, read_only=True)
+        row = schema and conn.execute(f"SELECT location_id, ts FROM {schema}.vehicles WHERE id = ?",
+                                      (event_id,)).fetchone()
+        return (month_index(month), row[0], row[1], event_id) if row else None
+    finally:
+        conn.close()
+
+
+def iter_events(db_path, start_ts, end_ts, locations=None, after=None, batch_rows=EXPORT_BATCH_ROWS):
+    """Raw events in ``[start_ts, end_ts)`` as lists of up to ``batch_rows``
+    ``(id, "YYYY-MM-DD HH:MM:SS", vehicle_type, vehicle_id, location)`` rows.
+
+    Rows come month by month, location by location, in time order: the order of
+    the (location_id, ts) index, so each location's rows in the range are read
+    straight off the index with fetchmany() and nothing is sorted or held in
+    memory. Partitions are attached one at a time on a read-only connection.
+    ``locations`` is a list of location names (None = all). ``after`` is an
+    event_position(): only rows after that event are returned and earlier months
+    are not opened, so resuming an export starts where it stopped. Raw rows of
+    archived months are in their Parquet files, not here (see archived_months).
+    """
+    conn = sqlite3.connect(read_only_uri(db_path), uri=True, check_same_thread=False)
+    try:
+        if locations is None:
+            location_ids = [row[0] for row in conn.execute("SELECT id FROM locations ORDER BY id")]
+        else:
+            location_ids = [row[0] for row in conn.execute(
+                f"SELECT id FROM locations WHERE name IN ({', '.join('?' * len(locations))}) ORDER BY id",
+                tuple(locations))]
+        for month in existing_months(db_path, months_between(start_ts, end_ts)):
+            if after and month_index(month) < after[0]:
+                continue
+            schema = attach_partition(conn, db_path, month, read_only=True)
+            for location_id in location_ids:
+                after_ts, after_id = start_ts, 0  # (ts, id) to continue after
+                if after and (month_index(month), location_id) < after[:2]:
+                    continue
+                if after and (month_index(month), location_id) == after[:2]:
+                    after_ts, after_id = max(after[2], start_ts), after[3]
+                cursor = conn.execute(f"""
+                    SELECT v.id, datetime(v.ts, 'unixepoch'), t.name, v.vehicle_id, l.name
+                    FROM {schema}.vehicles v INDEXED BY idx_vehicles_location_ts
+                    LEFT JOIN main.vehicle_types t ON t.id = v.vehicle_type_id
+                    LEFT JOIN main.locations l ON l.id = v.location_id
+                    WHERE v.location_id = ? AND v.ts >= ? AND v.ts < ? AND (v.ts > ? OR v.id > ?)
+                    ORDER BY v.ts, v.id
+                """, (location_id, after_ts, end_ts, after_ts, after_id))
+                try:
+                    while True:
+                        batch = cursor.fetchmany(batch_rows)
+                        if not batch:
+                            break
+                        yield batch
+                finally:
+                    cursor.close()
+            conn.execute(f"DETACH DATABASE {schema}")
+    finally:
+        conn.close()
+
+
+def archived_months(db_path, months):
+    """The months of ``months`` with raw rows archived to Parquet, oldest first."""
+    return [month for month in sorted(set(months)) if os.path.isdir(os.path.join(archive_dir(db_path), month))]
+
+
+# === Splitting a single-file database ===
+def split_into_partitions(conn):
+    """Move the rows of a single-file database's vehicles table into monthly partitions.
+
+    Rows keep their old id on top of the month's id_base and are copied with
+    INSERT OR IGNORE, so an interrupted split is safe to run again. The old table
+    and its rollups are dropped at the end.
+    """
+    db_path = catalog_path(conn)
+    first_ts, last_ts, rows = conn.execute("SELECT MIN(ts), MAX(ts), COUNT(*) FROM main.vehicles").fetchone()
+    if rows:
+        print(f"🔁 Splitting {rows} vehicle rows into monthly partitions in {partition_dir(db_path)}/...")
+        conn.commit()
+        for month in months_between(first_ts, last_ts + 1):
+            schema = attach_partition(conn, db_path, month, create=True)
+            with conn:
+                conn.execute(f"""
+                    INSERT OR IGNORE INTO {schema}.vehicles (id, ts, vehicle_type_id, vehicle_id, location_id)
+                    SELECT ? + id, ts, vehicle_type_id, vehicle_id, location_id FROM main.vehicles
+                    WHERE ts >= ? AND ts < ?
+                    ORDER BY id
+                """, (id_base(month), *month_bounds(month)))
+            rebuild_rollups(conn, schema)
+            conn.execute(f"DETACH DATABASE {schema}")
+    conn.executescript("""
+        DROP TABLE main.vehicles;
+        DROP TABLE IF EXISTS main.vehicle_counts_hourly;
+        DROP TABLE IF EXISTS main.vehicle_counts_daily;
+    """)
+    if rows:
+        conn.execute("VACUUM")
+        print(f"✅ Split into {len(list_partitions(db_path))} monthly partitions")
+
+
+# === Archival ===
+def archive_month(db_path, month):
+    """Write a month's raw rows to Parquet and shrink its partition to the rollups.
+
+    Returns the number of rows archived (0 if there were none left).
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    conn = sqlite3.connect(partition_path(db_path, month))
+    try:
+        first_id, last_id, rows = conn.execute("SELECT MIN(id), MAX(id), COUNT(*) FROM vehicles").fetchone()
+        if not rows:
+            return 0
+        out_dir = os.path.join(archive_dir(db_path), month)
+        os.makedirs(out_dir, exist_ok=True)
+        out_path = os.path.join(out_dir, f"part-{first_id}.parquet")
+        schema = pa.schema([
+            ("id", pa.int64()),
+            ("timestamp", pa.timestamp("s")),  # local wall-clock time, like the stored ts
+            ("vehicle_type", pa.dictionary(pa.int32(), pa.string())),
+            ("vehicle_id", pa.int64()),
+            ("location_id", pa.dictionary(pa.int32(), pa.string())),
+        ])
+
+        conn.execute("ATTACH DATABASE ? AS catalog", (db_path,))
+        cursor = conn.execute("""
+            SELECT v.id, v.ts, t.name, v.vehicle_id, l.name FROM vehicles v
+            LEFT JOIN catalog.vehicle_types t ON t.id = v.vehicle_type_id
+            LEFT JOIN catalog.locations l ON l.id = v.location_id
+            WHERE v.id <= ?
+            ORDER BY v.id
+        """, (last_id,))
+        written = 0
+        with pq.ParquetWriter(out_path + ".tmp", schema, compression="zstd") as writer:
+            while True:
+                batch = cursor.fetchmany(ARCHIVE_BATCH_ROWS)
+                if not batch:
+                    break
+                ids, ts, vehicle_types, vehicle_ids, locations = zip(*batch)
+                writer.write_table(pa.table([
+                    pa.array(ids, pa.int64()),
+                    pa.array(ts, pa.timestamp("s")),
+                    pa.array(vehicle_types, pa.string()).dictionary_encode(),
+                    pa.array(vehicle_ids, pa.int64()),
+                    pa.array(locations, pa.string()).dictionary_encode(),
+                ], schema=schema))
+                written += len(batch)
+        if written != rows or pq.read_metadata(out_path + ".tmp").num_rows != rows:
+            os.remove(out_path + ".tmp")
+            raise RuntimeError(f"{month}: wrote {written} of {rows} rows to Parquet, partition left as is")
+        os.replace(out_path + ".tmp", out_path)
+
+        with conn:
+            conn.execute("DELETE FROM vehicles WHERE id <= ?", (last_id,))
+            conn.execute("INSERT INTO archive_log (path, rows, first_id, last_id, archived_at) VALUES (?, ?, ?, ?, ?)",
+                         (os.path.relpath(out_path, os.path.dirname(os.path.abspath(db_path))), rows, first_id,
+                          last_id, now_ts()))
+        conn.execute("DETACH DATABASE catalog")
+        conn.execute("VACUUM")
+        return rows
+    finally:
+        conn.close()
+
+
+def drop_partition(db_path, month):
+    path = partition_path(db_path, month)
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+
+
+def apply_retention(db_path, keep_months=KEEP_MONTHS, drop_after_months=None):
+    """Archive raw rows older than ``keep_months`` and drop partitions older than ``drop_after_months``."""
+    current = month_index(month_of(now_ts()))
+    for month in list_partitions(db_path):
+        age = current - month_index(month)
+        if age < keep_months:
+            continue
+        size_before = os.path.getsize(partition_path(db_path, month))
+        started = time.perf_counter()
+        rows = archive_month(db_path, month)
+        if rows:
+            size_after = os.path.getsize(partition_path(db_path, month))
+            print(f"📦 {month}: {rows} rows archived in {time.perf_counter() - started:.1f}s, "
+                  f"partition {size_before / 1024:.0f} KiB -> {size_after / 1024:.0f} KiB")
+        if drop_after_months is not None and age >= drop_after_months:
+            drop_partition(db_path, month)
+            print(f"🗑️ {month}: partition dropped (Parquet archive kept)")
+
+
+def print_status(db_path):
+    months = list_partitions(db_path)
+    if not months:
+        print(f"No partitions in {partition_dir(db_path)}/")
+        return
+    print(f"{'month':>8} {'raw rows':>10} {'archived':>10} {'size KiB':>10}")
+    for month in months:
+        conn = sqlite3.connect(partition_path(db_path, month))
+        rows = conn.execute("SELECT COUNT(*) FROM vehicles").fetchone()[0]
+        archived = conn.execute("SELECT COALESCE(SUM(rows), 0) FROM archive_log").fetchone()[0]
+        conn.close()
+        size = os.path.getsize(partition_path(db_path, month)) / 1024
+        print(f"{month:>8} {rows:>10} {archived:>10} {size:>10.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", default=DB_FILENAME)
+    parser.add_argument("--archive", action="store_true", help="apply the retention policy")
+    parser.add_argument("--keep-months", type=int, default=KEEP_MONTHS,
+                        help="months of raw rows to keep in SQLite, including the current one")
+    parser.add_argument("--drop-after-months", type=int,
+                        help="delete partitions (rollups included) older than this many months")
+    args = parser.parse_args()
+    if args.keep_months < 1:
+        parser.error("--keep-months must be at least 1 (the current month is still being written)")
+    if args.drop_after_months is not None and args.drop_after_months < args.keep_months:
+        parser.error("--drop-after-months must be at least --keep-months")
+
+    conn = sqlite3.connect(args.db)
+    init_database(conn)
+    conn.close()
+    if args.archive:
+        apply_retention(args.db, args.keep_months, args.drop_after_months)
+    print_status(args.db)
+
+
+if __name__ == "__main__":
+    main()
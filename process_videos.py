@@ -0,0 +1,278 @@
+"""Count vehicles in recorded footage as fast as the machine allows.
+
+Usage:
+    python process_videos.py --location "Basni Crossing" \\
+        --video day1.mp4 "2024-05-01 06:00:00" --video day2.mp4 "2024-05-02 06:00:00"
+
+Each video is given with the wall-clock time its recording started. Events are
+stamped with that start time plus the frame's position in the video, so counts
+land in the right hour/day buckets however fast the footage is processed.
+Frames are decoded on a background thread and run through the model in
+batches; each file is processed once and the run ends with a summary.
+
+Count lines, zones and the ROI come from the location's entry in cameras.json
+(the footage is scaled to 640x480 like the live cameras); pass --line or --roi
+to override.
+"""
+import argparse
+import datetime
+import os
+import queue
+import threading
+import time
+
+from counting import CountingEngine
+from event_writer import EventWriter
+from inference import add_backend_arguments, load_model
+from motion_gate import MotionGate
+from roi import MAX_IMGSZ, RegionOfInterest
+from multi_camera import (CAMERAS_FILE, CONFIDENCE_THRESHOLD, MODEL_PATH, TARGET_CLASSES, infer_batch,
+                          load_cameras, make_tracker)
+from runtime import install_shutdown_handler
+from storage import DB_FILENAME, to_ts, ts_to_str
+from track_state import TrackStore
+from video_input import DECODE_THREADS, DECODER, add_decoder_arguments, open_video
+
+FRAME_WIDTH = 640
+FRAME_HEIGHT = 480
+BATCH_SIZE = 16
+DECODE_QUEUE_SIZE = 64  # decoded batches buffered ahead of inference
+DEFAULT_FPS = 25.0  # used when a file does not report its frame rate
+END_OF_VIDEO = object()
+
+
+class VideoDecoder:
+    """Decode videos in order on a background thread, yielding resized frame batches.
+
+    The queue carries ``(video_index, [(frame_index, frame), ...])`` batches and
+    ``(video_index, END_OF_VIDEO)`` when a file is exhausted. A batch never spans
+    two videos, so each one can go through a single tracker.
+    """
+
+    def __init__(self, paths, batch_size=BATCH_SIZE, stride=1, width=FRAME_WIDTH, height=FRAME_HEIGHT,
+                 queue_size=DECODE_QUEUE_SIZE, decoder=DECODER, threads=DECODE_THREADS):
+        self.paths = paths
+        self.batch_size = batch_size
+        self.stride = stride
+        self.size = (width, height)
+        self.decoder = decoder
+        self.threads = threads
+        self.fps = [None] * len(paths)
+        self.fps_known = [threading.Event() for _ in paths]
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="video-decoder", daemon=True)
+        self._thread.start()
+        return self
+
+    def _put(self, item):
+        while not self._stop_event.is_set():
+            try:
+                self._queue.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _run(self):
+        for video_index, path in enumerate(self.paths):
+            # Scaled by the decoder; strided-over frames are never converted (see video_input.py)
+            video = open_video(path, size=self.size, stride=self.stride, threads=self.threads,
+                               decoder=self.decoder)
+            if not video.isOpened():
+                print(f"❌ Could not open {path}")
+            self.fps[video_index] = video.fps or DEFAULT_FPS
+            self.fps_known[video_index].set()
+
+            batch = []
+            while video.isOpened() and not self._stop_event.is_set():
+                frame_index, frame = video.read()
+                if frame is None:
+                    break
+                batch.append((frame_index, frame))
+                if len(batch) == self.batch_size:
+                    if not self._put((video_index, batch)):
+                        break
+                    batch = []
+            video.release()
+            if batch:
+                self._put((video_index, batch))
+            if not self._put((video_index, END_OF_VIDEO)):
+                return
+
+    def get(self, timeout=0.5):
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def stop(self):
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+
+class VideoJob:
+    """Per-video state: timing, tracker, counting engine and counters."""
+
+    def __init__(self, path, start_ts, counter, frame_rate, motion_gate=True):
+        self.path = path
+        self.start_ts = start_ts
+        self.counter = counter
+        self.motion_gate = MotionGate(counter) if motion_gate else None
+        self.tracker = make_tracker(frame_rate=frame_rate)
+        self.track_state = TrackStore()
+        self.counts = {label: 0 for label in TARGET_CLASSES}
+        self.frames = 0
+        self.last_frame_index = 0
+        self.started = time.time()
+        self.finished = None
+
+    def media_seconds(self, fps):
+        return (self.last_frame_index + 1) / fps if self.frames else 0.0
+
+
+def camera_config_for(location_id, line, roi):
+    """Count lines/zones and ROI for a location: command line first, then cameras.json."""
+    camera = {}
+    if os.path.exists(CAMERAS_FILE):
+        camera = next((camera for camera in load_cameras() if camera["location_id"] == location_id), {})
+    if line:
+        camera = dict(camera, lines=[{"name": "main", "start": line[:2], "end": line[2:]}], zones=[])
+    if roi:
+        camera = dict(camera, roi=roi)
+    if not (camera.get("lines") or camera.get("zones")):
+        raise SystemExit(f"❌ No count line for {location_id!r}: add it to {CAMERAS_FILE} or pass --line")
+    return camera
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--video", nargs=2, action="append", required=True, metavar=("PATH", "START"),
+                        help="video file and its recording start time, e.g. clip.mp4 '2024-05-01 06:00:00'")
+    parser.add_argument("--location", required=True, help="location_id the footage belongs to")
+    parser.add_argument("--line", nargs=4, type=int, metavar=("X1", "Y1", "X2", "Y2"),
+                        help="count line in 640x480 frame coordinates")
+    parser.add_argument("--roi", nargs=4, type=int, metavar=("X1", "Y1", "X2", "Y2"),
+                        help="only run detection inside this rectangle")
+    parser.add_argument("--model", default=MODEL_PATH)
+    add_backend_arguments(parser)
+    add_decoder_arguments(parser)
+    parser.add_argument("--conf", type=float, default=CONFIDENCE_THRESHOLD)
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--stride", type=int, default=1, help="process every Nth frame")
+    parser.add_argument("--db", default=DB_FILENAME)
+    parser.add_argument("--csv", help="also append events to this CSV file ({month} in the name: one per month)")
+    parser.add_argument("--durability", default="normal", choices=["fast", "normal", "full"])
+    parser.add_argument("--no-motion-gate", action="store_true", help="run YOLO on every frame, even with no motion")
+    parser.add_argument("--dry-run", action="store_true", help="count but do not write events anywhere")
+    args = parser.parse_args()
+
+    paths = [path for path, _ in args.video]
+    try:
+        start_times = [to_ts(start) for _, start in args.video]
+    except ValueError as e:
+        parser.error(f"start times must be 'YYYY-MM-DD HH:MM:SS' ({e})")
+    camera = camera_config_for(args.location, args.line, args.roi)
+    roi = RegionOfInterest.from_config(camera)
+    imgsz = roi.imgsz if roi else MAX_IMGSZ
+
+    model = load_model(args.model, args.backend, int8=args.int8, data=args.data)
+    names = model.names
+
+    event_writer = None
+    if not args.dry_run:
+        event_writer = EventWriter(args.db, csv_path=args.csv,
+                                   csv_header=["Timestamp", "Vehicle Type", "Vehicle ID", "Location ID"],
+                                   durability=args.durability).start()
+
+    stop_event = install_shutdown_handler()
+    decoder = VideoDecoder(paths, batch_size=args.batch_size, stride=args.stride, decoder=args.decoder,
+                           threads=args.decode_threads).start()
+    jobs = {}
+    run_started = time.time()
+    print(f"🎞️ Processing {len(paths)} video(s) for {args.location}")
+
+    finished = 0
+    while finished < len(paths) and not stop_event.is_set():
+        item = decoder.get()
+        if item is None:
+            continue
+        video_index, batch = item
+        decoder.fps_known[video_index].wait()
+        fps = decoder.fps[video_index]
+        job = jobs.get(video_index)
+        if job is None:
+            counter = CountingEngine.from_config(camera)
+            job = jobs[video_index] = VideoJob(paths[video_index], start_times[video_index], counter,
+                                               frame_rate=max(1, round(fps / args.stride)),
+                                               motion_gate=not args.no_motion_gate)
+
+        if batch is END_OF_VIDEO:
+            job.finished = time.time()
+            finished += 1
+            print(f"✅ {job.path}: {job.frames} frames, {sum(job.counts.values())} vehicles")
+            continue
+
+        job.frames += len(batch)
+        job.last_frame_index = batch[-1][0]
+        if job.motion_gate is not None:
+            batch = [(frame_index, frame) for frame_index, frame in batch if job.motion_gate.check(frame)]
+            if not batch:
+                continue
+        frame_indexes = [frame_index for frame_index, _ in batch]
+        frames = [roi.crop(frame) if roi else frame for _, frame in batch]
+        # One tracker per video: infer_batch updates it frame by frame in order
+        tracks = infer_batch(model, frames, [job.tracker] * len(frames), conf=args.conf, imgsz=imgsz)
+
+        for frame_index, frame_tracks in zip(frame_indexes, tracks):
+            if len(frame_tracks) == 0:
+                continue
+            if roi:
+                frame_tracks = roi.to_frame(frame_tracks)
+            track_ids = frame_tracks[:, 4].astype(int)
+            classes = frame_tracks[:, 6].astype(int)
+            centers = (frame_tracks[:, :2] + frame_tracks[:, 2:4]) / 2
+            prev_centers = job.track_state.update(track_ids, centers, frame=frame_index // args.stride)
+
+            for row, line_name, direction in job.counter.crossings(prev_centers, centers):
+                label = names[classes[row]]
+                track_id = int(track_ids[row])
+                if label not in TARGET_CLASSES or job.track_state.is_counted(track_id):
+                    continue
+                job.track_state.mark_counted(track_id)
+                job.counts[label] += 1
+                if event_writer is not None:
+                    event_writer.submit(job.start_ts + int(frame_index / fps), label, track_id, args.location)
+
+    decoder.stop()
+    if event_writer is not None:
+        event_writer.close()
+
+    # === Summary ===
+    wall = time.time() - run_started
+    total_frames = sum(job.frames for job in jobs.values())
+    total_media = 0.0
+    print("\n📋 Summary")
+    for video_index, job in sorted(jobs.items()):
+        media = job.media_seconds(decoder.fps[video_index])
+        total_media += media
+        elapsed = (job.finished or time.time()) - job.started
+        end_ts = job.start_ts + int(media)
+        counts = ", ".join(f"{label}: {count}" for label, count in job.counts.items())
+        if job.motion_gate is not None:
+            counts += f" | motion gate skipped {job.motion_gate.skip_ratio:.0%}"
+        print(f"  {job.path}: {ts_to_str(job.start_ts)} -> {ts_to_str(end_ts)}, {job.frames} frames "
+              f"in {elapsed:.1f}s ({media / elapsed if elapsed else 0:.1f}x real time) | {counts}")
+    if stop_event.is_set():
+        print("  ⚠️ Stopped early; the last video was only partly processed.")
+    print(f"  Total: {total_frames} frames, {datetime.timedelta(seconds=int(total_media))} of footage "
+          f"in {wall:.1f}s ({total_frames / wall if wall else 0:.1f} frames/s, "
+          f"{total_media / wall if wall else 0:.1f}x real time)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+"""Carry tracks forward between detection frames, so crossings are tested on every frame.
+
+With ``--detect-every N`` YOLO and ByteTrack only run on the frames where
+TrackPropagator.due() says so, every Nth one. On the frames in between, it
+moves every track's box by the median optical flow of a few corner points from
+the middle of the box (pyramidal Lucas-Kanade on a half-size grey frame, about
+a millisecond per frame), starting the search from where the track's velocity
+puts them. Points that do not track back to where they started are dropped; a
+track left without points keeps moving at the velocity measured between its
+last two detections. The counting loops test crossings on every frame,
+detected or propagated, so a fast motorcycle that jumps over the line between
+two detections still leaves a path that crosses it.
+
+ByteTrack matches boxes by overlap, so a small vehicle that moved further than
+its own length between detections comes back with a new id. On detection
+frames, a new id whose box overlaps the propagated box of a track the tracker
+did not report this time (or, failing that, lies within HANDOFF_DISTANCE box
+diagonals of it) takes over that track's id. detected() returns the ids mapped
+this way, so the vehicle keeps its counted flag and its path continues from
+where the propagation left it.
+"""
+import cv2
+import numpy as np
+
+DETECT_EVERY = 1  # 1 = YOLO on every frame, no propagation
+POINTS_PER_TRACK = 10
+FLOW_SCALE = 0.5  # optical flow runs on the frame shrunk by this factor
+MAX_FLOW_ERROR = 1.0  # pixels (at flow scale) a point may miss its start when tracked back
+HANDOFF_IOU = 0.3  # a new tracker id overlapping a dropped track's propagated box this much takes its id
+HANDOFF_DISTANCE = 1.5  # failing that, one whose centre is this many box diagonals from it
+INNER_MARGIN = 0.2  # corners are taken this share of the box size in from each edge, off the background
+LK_PARAMS = {"winSize": (9, 9), "maxLevel": 3,
+             "criteria": (cv2.TERM_CRITERIA_EPS | cv2.TERM_CRITERIA_COUNT, 10, 0.03)}
+
+
+def box_iou(a, b):
+    """(N, M) IoU of two sets of xyxy boxes."""
+    x1 = np.maximum(a[:, None, 0], b[None, :, 0])
+    y1 = np.maximum(a[:, None, 1], b[None, :, 1])
+    x2 = np.minimum(a[:, None, 2], b[None, :, 2])
+    y2 = np.minimum(a[:, None, 3], b[None, :, 3])
+    intersection = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.nan_to_num(intersection / (area_a[:, None] + area_b[None, :] - intersection))
+
+
+class TrackPropagator:
+    """Boxes of the last detection, moved frame by frame until the next one."""
+
+    def __init__(self, detect_every=DETECT_EVERY, points_per_track=POINTS_PER_TRACK, scale=FLOW_SCALE, max_flow_error=MAX_FLOW_ERROR,
+                 handoff_iou=HANDOFF_IOU, handoff_distance=HANDOFF_DISTANCE):
+        self.detect_every = detect_every
+        self.points_per_track = points_per_track
+        self.scale = scale
+        self.max_flow_error = max_flow_error
+        self.handoff_iou = handoff_iou
+        self.handoff_distance = handoff_distance
+        self.frame = 0
+        self.frames_propagated = 0
+        self.handoffs = 0
+        self.ids = np.empty(0, dtype=np.int64)
+        self.boxes = np.empty((0, 4))
+        self.classes = np.empty(0)
+        self._velocity = np.empty((0, 2))  # pixels per frame
+        self._detected_at = {}  # track id -> (frame, centre) of its last detection
+        self._aliases = {}  # tracker id -> id it took over
+        self._max_tracker_id = -1
+        self._gray = None  # last frame, at flow scale; None until the first detection
+        self._since_detection = 0
+        self._points = np.empty((0, 1, 2), dtype=np.float32)
+        self._owners = np.empty(0, dtype=np.intp)  # row in ids/boxes of every point
+
+    def _to_gray(self, frame):
+        small = cv2.resize(frame, None, fx=self.scale, fy=self.scale, interpolation=cv2.INTER_AREA)
+        return cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+
+    def _hand_off(self, tracker_ids, boxes):
+        """Map tracker ids to the ids they continue; new ids may take over tracks missing from this detection."""
+        ids = np.array([self._aliases.get(tracker_id, tracker_id) for tracker_id in tracker_ids.tolist()],
+                       dtype=np.int64)
+        new = np.nonzero(tracker_ids > self._max_tracker_id)[0]  # ByteTrack never reuses an id
+        missing = np.nonzero(~np.isin(self.ids, ids))[0]
+        if len(new) and len(missing):
+            iou = box_iou(boxes[new], self.boxes[missing])
+            # Overlap first; for vehicles that moved further than their length, the nearest centre
+            centers = (boxes[new, :2] + boxes[new, 2:]) / 2
+            track_centers = (self.boxes[missing, :2] + self.boxes[missing, 2:]) / 2
+            diagonals = np.hypot(*(boxes[new, 2:] - boxes[new, :2]).T)
+            distance = np.linalg.norm(centers[:, None] - track_centers[None], axis=2) / diagonals[:, None]
+            score = np.where(iou >= self.handoff_iou, 1 + iou,
+                             np.where(distance <= self.handoff_distance, 1 / (1 + distance), 0))
+            while score.size and score.max() > 0:
+                row, col = np.unravel_index(np.argmax(score), score.shape)
+                self._aliases[int(tracker_ids[new[row]])] = ids[new[row]] = self.ids[missing[col]]
+                score[row, :] = score[:, col] = 0
+                self.handoffs += 1
+        if len(tracker_ids):
+            self._max_tracker_id = max(self._max_tracker_id, int(tracker_ids.max()))
+        return ids
+
+    def due(self):
+        """Whether this frame should go to YOLO: every detect_every-th frame, and the first after a reset()."""
+        return self._gray is None or self._since_detection >= self.detect_every
+
+    def detected(self, frame, tracker_ids, boxes, classes):
+        """Start from this frame's tracker output; returns ``(ids, boxes, classes)`` with ids mapped as the
+        module docstring describes."""
+        self.frame += 1
+        self._since_detection = 1
+        tracker_ids = np.asarray(tracker_ids).astype(np.int64).reshape(-1)
+        boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+        ids = self._hand_off(tracker_ids, boxes)
+
+        centers = (boxes[:, :2] + boxes[:, 2:]) / 2
+        velocity = np.zeros((len(ids), 2))
+        detected_at = {}
+        for row, track_id in enumerate(ids.tolist()):
+            if track_id in self._detected_at:
+                frame_then, center_then = self._detected_at[track_id]
+                velocity[row] = (centers[row] - center_then) / (self.frame - frame_then)
+            detected_at[track_id] = (self.frame, centers[row])
+        self._detected_at = detected_at
+        self.ids, self.boxes, self.classes, self._velocity = ids, boxes, np.asarray(classes), velocity
+
+        # Corner points to follow inside every box
+        self._gray = gray = self._to_gray(frame)
+        points, owners = [], []
+        height, width = gray.shape
+        inner = np.hstack([boxes[:, :2] + (boxes[:, 2:] - boxes[:, :2]) * INNER_MARGIN,
+                           boxes[:, 2:] - (boxes[:, 2:] - boxes[:, :2]) * INNER_MARGIN])
+        for row, (x1, y1, x2, y2) in enumerate((inner * self.scale).astype(int).tolist()):
+            x1, y1, x2, y2 = max(x1, 0), max(y1, 0), min(x2, width), min(y2, height)
+            if x2 - x1 < 4 or y2 - y1 < 4:
+                continue
+            corners = cv2.goodFeaturesToTrack(gray[y1:y2, x1:x2], self.points_per_track, 0.01, 3)
+            if corners is not None:
+                points.append(corners + np.float32([x1, y1]))
+                owners.extend([row] * len(corners))
+        self._points = np.concatenate(points) if points else np.empty((0, 1, 2), dtype=np.float32)
+        self._owners = np.array(owners, dtype=np.intp)
+        return self.ids, self.boxes, self.classes
+
+    def propagate(self, frame):
+        """Move every box to this frame; returns ``(ids, boxes, classes)`` like a detection would."""
+        self.frame += 1
+        self._since_detection += 1
+        self.frames_propagated += 1
+        gray = self._to_gray(frame)
+        shift = self._velocity.copy()
+        if len(self._points):
+            # Start the search where the track's velocity says the point went
+            guess = self._points + (self._velocity[self._owners] * self.scale).astype(np.float32)[:, None, :]
+            moved, status, _ = cv2.calcOpticalFlowPyrLK(self._gray, gray, self._points, guess,
+                                                        flags=cv2.OPTFLOW_USE_INITIAL_FLOW, **LK_PARAMS)
+            back, back_status, _ = cv2.calcOpticalFlowPyrLK(gray, self._gray, moved, None, **LK_PARAMS)
+            error = np.linalg.norm((back - self._points).reshape(-1, 2), axis=1)
+            ok = (status.reshape(-1) == 1) & (back_status.reshape(-1) == 1) & (error < self.max_flow_error)
+            flow = (moved - self._points).reshape(-1, 2)[ok] / self.scale
+            owners = self._owners[ok]
+            for row in np.unique(owners):
+                shift[row] = np.median(flow[owners == row], axis=0)
+            self._points, self._owners = moved[ok], owners
+        self._gray = gray
+        self.boxes = self.boxes + np.hstack([shift, shift])
+        return self.ids, self.boxes, self.classes
+
+    def reset(self):
+        """Forget all tracks (the frames stopped being consecutive, e.g. a video restarted); due() until the
+        next detection."""
+        self.ids, self.boxes, self.classes = np.empty(0, dtype=np.int64), np.empty((0, 4)), np.empty(0)
+        self._velocity = np.empty((0, 2))
+        self._detected_at = {}
+        self._gray = None
+        self._points, self._owners = np.empty((0, 1, 2), dtype=np.float32), np.empty(0, dtype=np.intp)
+
+
+def add_detect_every_argument(parser, default=DETECT_EVERY):
+    parser.add_argument("--detect-every", type=int, default=default, metavar="N",
+                        help="run YOLO on every Nth frame and carry tracks forward with optical flow "
+                             "in between; crossings are still checked on every frame")
@@ -0,0 +1,64 @@
+"""Region of interest: run detection on the counting area only.
+
+An ROI is either a rectangle ``[x1, y1, x2, y2]`` or a polygon
+``[[x, y], [x, y], ...]`` in the same frame coordinates as the count lines.
+``crop()`` cuts out its bounding rectangle (blanking pixels outside a polygon),
+the crop is passed to YOLO with a matching smaller ``imgsz``, and ``to_frame()``
+moves the resulting boxes back to full-frame coordinates for counting and drawing.
+"""
+import math
+
+import cv2
+import numpy as np
+
+MAX_IMGSZ = 640
+
+
+class RegionOfInterest:
+    """Crop frames to an ROI and map detections back."""
+
+    def __init__(self, roi):
+        points = np.asarray(roi, dtype=np.int32)
+        if points.ndim == 1:  # rectangle
+            x1, y1, x2, y2 = points
+            self.polygon = None
+        else:
+            x1, y1 = points.min(axis=0)
+            x2, y2 = points.max(axis=0)
+            self.polygon = points - (x1, y1)
+        self.x1, self.y1, self.x2, self.y2 = int(x1), int(y1), int(x2), int(y2)
+        self.offset = np.array([self.x1, self.y1, self.x1, self.y1], dtype=np.float32)
+        self._mask = None
+
+    @classmethod
+    def from_config(cls, config):
+        """ROI from a camera config's ``roi`` entry, or None for the whole frame."""
+        roi = config.get("roi")
+        return cls(roi) if roi else None
+
+    @property
+    def imgsz(self):
+        """Inference size for the crop: its longer side rounded up to the model stride, capped at 640."""
+        return min(MAX_IMGSZ, math.ceil(max(self.x2 - self.x1, self.y2 - self.y1) / 32) * 32)
+
+    def crop(self, frame):
+        crop = frame[self.y1:self.y2, self.x1:self.x2]
+        if self.polygon is None:
+            return crop
+        if self._mask is None or self._mask.shape != crop.shape[:2]:
+            self._mask = np.zeros(crop.shape[:2], dtype=np.uint8)
+            cv2.fillPoly(self._mask, [self.polygon.reshape(-1, 1, 2)], 255)
+        return cv2.bitwise_and(crop, crop, mask=self._mask)
+
+    def to_frame(self, boxes):
+        """Shift (N, 4+) boxes whose first four columns are crop-space xyxy back to the full frame."""
+        boxes = np.array(boxes, dtype=np.float32, copy=True)
+        if len(boxes):
+            boxes[:, :4] += self.offset
+        return boxes
+
+    def draw(self, frame, color=(255, 0, 0)):
+        if self.polygon is None:
+            cv2.rectangle(frame, (self.x1, self.y1), (self.x2, self.y2), color, 1)
+        else:
+            cv2.polylines(frame, [(self.polygon + (self.x1, self.y1)).reshape(-1, 1, 2)], True, color, 1)
@@ -0,0 +1,121 @@
+"""Pre-aggregated hourly and daily vehicle counts for the dashboard API.
+
+Buckets are stored as the ts of the start of the hour / day (see storage.py for
+the ts convention), keyed by the integer location and vehicle-type ids. Every
+monthly partition (see partitions.py) has its own rollup tables, and the event
+writer keeps them current as it inserts rows. To build them from rows already
+in the partitions (or to repair them), run:
+
+    python rollups.py --rebuild
+"""
+import argparse
+import sqlite3
+from collections import Counter
+
+DB_FILENAME = "vehicle_data.db"
+
+ROLLUP_SCHEMA = """
+CREATE TABLE IF NOT EXISTS {schema}.vehicle_counts_hourly (
+    location_id INTEGER NOT NULL,
+    hour_ts INTEGER NOT NULL,
+    vehicle_type_id INTEGER NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (location_id, hour_ts, vehicle_type_id)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS {schema}.vehicle_counts_daily (
+    location_id INTEGER NOT NULL,
+    day_ts INTEGER NOT NULL,
+    vehicle_type_id INTEGER NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (location_id, day_ts, vehicle_type_id)
+) WITHOUT ROWID;
+"""
+
+
+def init_rollups(conn, schema="main"):
+    conn.executescript(ROLLUP_SCHEMA.format(schema=schema))
+
+
+def apply_rollups(conn, rows, schema="main"):
+    """Add a batch of ``(ts, vehicle_type_id, vehicle_id, location_id)`` rows to the rollups.
+
+    Call inside the same transaction as the raw insert so both stay in step;
+    ``schema`` is the attached partition the rows went into.
+    """
+    hourly = Counter()
+    daily = Counter()
+    for ts, vehicle_type_id, _, location_id in rows:
+        hourly[(location_id, ts - ts % 3600, vehicle_type_id)] += 1
+        daily[(location_id, ts - ts % 86400, vehicle_type_id)] += 1
+
+    conn.executemany(f"""
+        INSERT INTO {schema}.vehicle_counts_hourly (location_id, hour_ts, vehicle_type_id, count)
+        VALUES (?, ?, ?, ?)
+        ON CONFLICT (location_id, hour_ts, vehicle_type_id) DO UPDATE SET count = count + excluded.count
+    """, [(*key, count) for key, count in hourly.items()])
+    conn.executemany(f"""
+        INSERT INTO {schema}.vehicle_counts_daily (location_id, day_ts, vehicle_type_id, count)
+        VALUES (?, ?, ?, ?)
+        ON CONFLICT (location_id, day_ts, vehicle_type_id) DO UPDATE SET count = count + excluded.count
+    """, [(*key, count) for key, count in daily.items()])
+
+
+def rebuild_rollups(conn, schema="main"):
+    """Recompute both rollup tables of one partition from its raw vehicles table."""
+    init_rollups(conn, schema)
+    with conn:
+        conn.execute(f"DELETE FROM {schema}.vehicle_counts_hourly")
+        conn.execute(f"DELETE FROM {schema}.vehicle_counts_daily")
+        conn.execute(f"""
+            INSERT INTO {schema}.vehicle_counts_hourly (location_id, hour_ts, vehicle_type_id, count)
+            SELECT location_id, ts - ts % 3600, vehicle_type_id, COUNT(*)
+            FROM {schema}.vehicles
+            GROUP BY 1, 2, 3
+        """)
+        conn.execute(f"""
+            INSERT INTO {schema}.vehicle_counts_daily (location_id, day_ts, vehicle_type_id, count)
+            SELECT location_id, hour_ts - hour_ts % 86400, vehicle_type_id, SUM(count)
+            FROM {schema}.vehicle_counts_hourly
+            GROUP BY 1, 2, 3
+        """)
+
+
+def ensure_rollups(conn):
+    """Create a partition's rollup tables, backfilling them if they are empty but events exist."""
+    init_rollups(conn)
+    has_rollups = conn.execute("SELECT 1 FROM vehicle_counts_daily LIMIT 1").fetchone()
+    has_events = conn.execute("SELECT 1 FROM vehicles LIMIT 1").fetchone()
+    if has_events and not has_rollups:
+        print("🔁 Building hourly/daily rollups from existing vehicle rows...")
+        rebuild_rollups(conn)
+
+
+def main():
+    from partitions import list_partitions, partition_path
+    from storage import init_database
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", default=DB_FILENAME)
+    parser.add_argument("--rebuild", action="store_true", help="recompute rollups from the vehicles table")
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(args.db)
+    init_database(conn)
+    conn.close()
+    for month in list_partitions(args.db):
+        conn = sqlite3.connect(partition_path(args.db, month))
+        if not args.rebuild:
+            ensure_rollups(conn)
+        elif conn.execute("SELECT 1 FROM archive_log LIMIT 1").fetchone():
+            # Raw rows are in Parquet now; the rollups are all that is left of them
+            print(f"⏭️ {month}: archived, keeping its rollups")
+        else:
+            rebuild_rollups(conn)
+            rows = conn.execute("SELECT COUNT(*), COALESCE(SUM(count), 0) FROM vehicle_counts_daily").fetchone()
+            print(f"✅ {month}: rollups rebuilt, {rows[0]} daily rows covering {rows[1]} vehicles")
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
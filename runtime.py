@@ -0,0 +1,37 @@
+"""Small helpers shared by the detector scripts for headless (server) runs."""
+import signal
+import threading
+import time
+
+
+def install_shutdown_handler(*signals):
+    """Return an Event that is set on SIGINT/SIGTERM instead of raising KeyboardInterrupt."""
+    stop_event = threading.Event()
+
+    def handle(signum, frame):
+        print(f"\n🔻 Received signal {signum}, shutting down...")
+        stop_event.set()
+
+    for signum in signals or (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signum, handle)
+    return stop_event
+
+
+class ThroughputLogger:
+    """Count processed frames and print throughput every ``interval`` seconds."""
+
+    def __init__(self, name, interval=30):
+        self.name = name
+        self.interval = interval
+        self.started = self.last_log = time.time()
+        self.frames = self.frames_at_last_log = 0
+
+    def tick(self):
+        self.frames += 1
+        now = time.time()
+        if now - self.last_log >= self.interval:
+            recent_fps = (self.frames - self.frames_at_last_log) / (now - self.last_log)
+            overall_fps = self.frames / (now - self.started)
+            print(f"📊 {self.name}: {recent_fps:.1f} frames/s (avg {overall_fps:.1f}, {self.frames} frames)")
+            self.last_log = now
+            self.frames_at_last_log = self.frames
@@ -0,0 +1,162 @@
+"""SQLite schema shared by the dashboard and every detector.
+
+Timestamps are stored as integer seconds of *local wall-clock time* counted
+from 1970-01-01 (i.e. the naive local time encoded as if it were UTC). This keeps
+the meaning of the old TEXT timestamps exactly: ``datetime(ts, 'unixepoch')``
+gives back the same string, and hour/day buckets are simple integer maths.
+
+Location and vehicle-type names are dictionary-encoded in small lookup tables
+in vehicle_data.db (the catalog). The events themselves are stored one SQLite
+file per month (see partitions.py), each with a composite (location_id, ts)
+index, so per-location time-range queries are index range scans.
+"""
+import calendar
+import datetime
+import sqlite3
+
+DB_FILENAME = "vehicle_data.db"
+
+CATALOG_SCHEMA = """
+CREATE TABLE IF NOT EXISTS locations (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE
+);
+
+CREATE TABLE IF NOT EXISTS vehicle_types (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE
+);
+"""
+
+# vehicle_type_id and location_id refer to the catalog's lookup tables
+VEHICLES_TABLE = """
+CREATE TABLE IF NOT EXISTS vehicles (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    ts INTEGER NOT NULL,
+    vehicle_type_id INTEGER NOT NULL,
+    vehicle_id INTEGER,
+    location_id INTEGER NOT NULL
+);
+"""
+
+INDEXES = """
+CREATE INDEX IF NOT EXISTS idx_vehicles_location_ts ON vehicles (location_id, ts);
+"""
+
+# One month of events: raw rows, their rollups (rollups.py) and a record of archived rows
+PARTITION_SCHEMA = VEHICLES_TABLE + INDEXES + """
+CREATE TABLE IF NOT EXISTS archive_log (
+    path TEXT PRIMARY KEY,
+    rows INTEGER NOT NULL,
+    first_id INTEGER NOT NULL,
+    last_id INTEGER NOT NULL,
+    archived_at INTEGER NOT NULL
+);
+"""
+
+# Human-readable view with the old column names, for ad-hoc queries and exports.
+# TEMP because it reads the attached partitions (see partitions.attach_months).
+VIEWS = """
+CREATE TEMP VIEW IF NOT EXISTS vehicle_events AS
+SELECT v.id, datetime(v.ts, 'unixepoch') AS timestamp, t.name AS vehicle_type,
+       v.vehicle_id, l.name AS location_id
+FROM vehicles v
+JOIN main.vehicle_types t ON t.id = v.vehicle_type_id
+JOIN main.locations l ON l.id = v.location_id;
+"""
+
+
+# === Timestamp helpers ===
+def to_ts(value):
+    """Convert a naive local ``datetime`` or a "YYYY-MM-DD[ HH:MM:SS]" string to a stored ts."""
+    if isinstance(value, str):
+        fmt = "%Y-%m-%d %H:%M:%S" if len(value) > 10 else "%Y-%m-%d"
+        value = datetime.datetime.strptime(value, fmt)
+    return calendar.timegm(value.timetuple())
+
+
+def now_ts():
+    return to_ts(datetime.datetime.now())
+
+
+def ts_to_str(ts):
+    return datetime.datetime.fromtimestamp(ts, datetime.timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+
+
+# === Lookup tables ===
+class LookupCache:
+    """Name -> id cache for the locations and vehicle_types tables."""
+
+    def __init__(self, conn):
+        self.conn = conn
+        self._ids = {"locations": {}, "vehicle_types": {}}
+
+    def get_id(self, table, name):
+        ids = self._ids[table]
+        if name not in ids:
+            self.conn.execute(f"INSERT OR IGNORE INTO {table} (name) VALUES (?)", (name,))
+            ids[name] = self.conn.execute(f"SELECT id FROM {table} WHERE name = ?", (name,)).fetchone()[0]
+        return ids[name]
+
+    def location_id(self, name):
+        return self.get_id("locations", name)
+
+    def vehicle_type_id(self, name):
+        return self.get_id("vehicle_types", name)
+
+
+# === Schema setup and migration ===
+def _columns(conn, table):
+    return [row[1] for row in conn.execute(f"PRAGMA table_info({table})")]
+
+
+def needs_migration(conn):
+    """True if the database still has the old TEXT-column vehicles table."""
+    return "timestamp" in _columns(conn, "vehicles")
+
+
+def migrate_legacy_schema(conn):
+    """Convert an old TEXT-column database to the single-file integer schema in place.
+
+    The rollup tables are dropped too; init_database() then splits the rows into
+    monthly partitions and builds their rollups.
+    """
+    conn.executescript(f"""
+        BEGIN;
+        ALTER TABLE vehicles RENAME TO vehicles_legacy;
+        DROP TABLE IF EXISTS vehicle_counts_hourly;
+        DROP TABLE IF EXISTS vehicle_counts_daily;
+        {CATALOG_SCHEMA}
+        {VEHICLES_TABLE}
+        INSERT OR IGNORE INTO locations (name) SELECT DISTINCT location_id FROM vehicles_legacy;
+        INSERT OR IGNORE INTO vehicle_types (name) SELECT DISTINCT vehicle_type FROM vehicles_legacy;
+        INSERT INTO vehicles (id, ts, vehicle_type_id, vehicle_id, location_id)
+            SELECT o.id, CAST(strftime('%s', o.timestamp) AS INTEGER), t.id, o.vehicle_id, l.id
+            FROM vehicles_legacy o
+            JOIN vehicle_types t ON t.name = o.vehicle_type
+            JOIN locations l ON l.name = o.location_id
+            ORDER BY o.id;
+        DROP TABLE vehicles_legacy;
+        {INDEXES}
+        COMMIT;
+    """)
+
+
+def init_database(conn):
+    """Create (or upgrade to) the current schema on an open catalog connection."""
+    from partitions import split_into_partitions
+
+    if needs_migration(conn):
+        print("🔁 Migrating vehicles table to the indexed integer schema...")
+        migrate_legacy_schema(conn)
+    conn.executescript(CATALOG_SCHEMA + "DROP VIEW IF EXISTS main.vehicle_events;")
+    if _columns(conn, "vehicles"):
+        split_into_partitions(conn)
+    conn.commit()
+
+
+def connect(db_path=DB_FILENAME):
+    """Open a connection with the schema in place."""
+    conn = sqlite3.connect(db_path)
+    init_database(conn)
+    return conn
@@ -0,0 +1,232 @@
+"""Run every camera in the registry, one worker process each.
+
+Usage:
+    python supervisor.py [--registry cameras.json] [--threads-per-worker N]
+
+Each entry in the registry (see cameras.json) is a camera:
+
+    location_id  label stored with every event (must be unique)
+    source       RTSP URL or video file
+    lines/zones  count geometry, roi (optional)
+    model        weights (optional, default yolov8n.pt); backend / int8 / data (optional)
+    cpus         cores to pin the worker to (optional, default: the least used cores)
+    enabled      false to leave a camera out (optional)
+
+Workers are restarted with exponential backoff if they exit. The registry is
+re-read when it changes (or on SIGHUP): new cameras are started, removed ones
+stopped, a changed source/model/cpus restarts that worker, and changed count
+geometry is sent to the running worker over its pipe without a restart.
+Running workers keep their CPU set and thread count when other cameras are
+added or removed.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import signal
+import threading
+import time
+
+from camera_worker import run_worker
+
+REGISTRY_FILE = "cameras.json"
+POLL_INTERVAL = 1.0
+MIN_BACKOFF = 1.0
+MAX_BACKOFF = 60.0
+STABLE_AFTER = 60.0  # a worker that ran this long gets its backoff reset
+STOP_TIMEOUT = 10.0
+
+# Keys a running worker can pick up without restarting
+LIVE_KEYS = {"lines", "zones", "roi", "motion_gate"}
+
+
+def load_registry(path):
+    with open(path, 'r') as f:
+        cameras = [camera for camera in json.load(f) if camera.get("enabled", True)]
+    ids = [camera["location_id"] for camera in cameras]
+    duplicates = {location_id for location_id in ids if ids.count(location_id) > 1}
+    if duplicates:
+        raise ValueError(f"duplicate location_id in {path}: {', '.join(sorted(duplicates))}")
+    return {camera["location_id"]: camera for camera in cameras}
+
+
+def available_cpus():
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+class Worker:
+    """Supervisor-side handle for one camera's process."""
+
+    def __init__(self, context, camera, threads, cpus):
+        self.context = context
+        self.camera = camera
+        self.threads = threads
+        self.cpus = cpus
+        self.process = None
+        self.conn = None
+        self.started_at = 0.0
+        self.backoff = MIN_BACKOFF
+        self.restart_at = None
+        self.restarts = 0
+
+    @property
+    def location_id(self):
+        return self.camera["location_id"]
+
+    def start(self):
+        parent_conn, child_conn = self.context.Pipe()
+        self.process = self.context.Process(target=run_worker, name=f"camera-{self.location_id}",
+                                            args=(self.camera, child_conn, self.threads, self.cpus))
+        self.process.start()
+        child_conn.close()
+        self.conn = parent_conn
+        self.started_at = time.monotonic()
+        self.restart_at = None
+
+    def send(self, message):
+        try:
+            self.conn.send(message)
+        except (BrokenPipeError, OSError):
+            pass  # worker already gone; the health check restarts it
+
+    def stop(self, timeout=STOP_TIMEOUT):
+        if self.process is None:
+            return
+        if self.process.is_alive():
+            self.send({"type": "stop"})
+            self.process.join(timeout)
+        if self.process.is_alive():
+            print(f"⚠️ [{self.location_id}] did not stop in {timeout:.0f}s, terminating")
+            self.process.terminate()
+            self.process.join(5)
+        self.conn.close()
+        self.process = None
+
+    def check(self):
+        """Restart the worker with backoff if it died; call regularly."""
+        now = time.monotonic()
+        if self.process is not None and self.process.is_alive():
+            if now - self.started_at >= STABLE_AFTER:
+                self.backoff = MIN_BACKOFF
+            return
+        if self.restart_at is None:
+            exitcode = self.process.exitcode if self.process is not None else None
+            self.conn.close()
+            self.process = None
+            self.restart_at = now + self.backoff
+            print(f"💥 [{self.location_id}] worker exited ({exitcode}), restarting in {self.backoff:.0f}s")
+            self.backoff = min(self.backoff * 2, MAX_BACKOFF)
+        elif now >= self.restart_at:
+            self.restarts += 1
+            self.start()
+
+
+class Supervisor:
+    def __init__(self, registry_path, threads_per_worker=None):
+        self.registry_path = registry_path
+        self.threads_per_worker = threads_per_worker
+        # spawn: workers import ultralytics/torch fresh, after their thread limits are set
+        self.context = multiprocessing.get_context("spawn")
+        self.workers = {}
+        self.registry_mtime = None
+        self.reload_requested = threading.Event()
+        self.stop_requested = threading.Event()
+
+    def _threads(self, cameras):
+        """Math-library threads for a new worker: the available cores shared among ``cameras``."""
+        return self.threads_per_worker or max(1, len(available_cpus()) // max(1, len(cameras)))
+
+    def _cpus(self, camera, threads, exclude=None):
+        """The camera's ``cpus``, or by default the ``threads`` cores least used by the other workers."""
+        if camera.get("cpus"):
+            return set(camera["cpus"])
+        cpus = available_cpus()
+        load = dict.fromkeys(cpus, 0)
+        for worker in self.workers.values():
+            if worker is not exclude:
+                for cpu in worker.cpus & load.keys():
+                    load[cpu] += 1
+        return set(sorted(cpus, key=load.get)[:threads])  # stable sort: ties go to the lowest core
+
+    def reload(self):
+        try:
+            cameras = load_registry(self.registry_path)
+        except (OSError, ValueError, KeyError) as e:
+            print(f"⚠️ Could not load {self.registry_path}: {e}; keeping the current workers")
+            return
+
+        for location_id in list(self.workers):
+            if location_id not in cameras:
+                print(f"➖ [{location_id}] removed from registry, stopping")
+                self.workers.pop(location_id).stop()
+
+        # Running workers keep their CPU set and thread count when cameras come
+        # and go; only new workers are placed, on the least used cores.
+        for location_id, camera in cameras.items():
+            worker = self.workers.get(location_id)
+            if worker is None:
+                print(f"➕ [{location_id}] starting")
+                threads = self._threads(cameras)
+                worker = self.workers[location_id] = Worker(self.context, camera, threads,
+                                                            self._cpus(camera, threads))
+                worker.start()
+                continue
+            old, new = worker.camera, camera
+            changed = sorted(key for key in (set(old) | set(new)) - LIVE_KEYS if old.get(key) != new.get(key))
+            if changed:
+                print(f"🔁 [{location_id}] {', '.join(changed)} changed, restarting")
+                worker.stop()
+                worker.camera = camera
+                if "cpus" in changed:
+                    worker.cpus = self._cpus(camera, worker.threads, exclude=worker)
+                worker.start()
+            elif old != new:
+                worker.camera = camera
+                worker.send({"type": "config", "camera": camera})
+
+    def _registry_changed(self):
+        try:
+            mtime = os.path.getmtime(self.registry_path)
+        except OSError:
+            return False
+        changed = mtime != self.registry_mtime
+        self.registry_mtime = mtime
+        return changed
+
+    def run(self):
+        signal.signal(signal.SIGINT, lambda *_: self.stop_requested.set())
+        signal.signal(signal.SIGTERM, lambda *_: self.stop_requested.set())
+        if hasattr(signal, "SIGHUP"):
+            signal.signal(signal.SIGHUP, lambda *_: self.reload_requested.set())
+
+        print(f"🚦 Supervisor {os.getpid()} reading {self.registry_path}")
+        while not self.stop_requested.is_set():
+            if self._registry_changed() or self.reload_requested.is_set():
+                self.reload_requested.clear()
+                self.reload()
+            for worker in self.workers.values():
+                worker.check()
+            self.stop_requested.wait(POLL_INTERVAL)
+
+        print("\n🔻 Stopping workers...")
+        for worker in self.workers.values():
+            if worker.process is not None and worker.process.is_alive():
+                worker.send({"type": "stop"})
+        for worker in self.workers.values():
+            worker.stop()
+        print("✅ All workers stopped")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--registry", default=REGISTRY_FILE)
+    parser.add_argument("--threads-per-worker", type=int,
+                        help="math-library threads per worker (default: available cores / cameras)")
+    args = parser.parse_args()
+    Supervisor(args.registry, args.threads_per_worker).run()
+
+
+if __name__ == "__main__":
+    main()
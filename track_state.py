@@ -0,0 +1,91 @@
+"""Bounded per-track state for the counting loops.
+
+Replaces the ``counted_ids`` set and ``object_memory`` dict that only ever grew:
+every track keeps its last centre, when it was last seen and whether it has
+been counted, and tracks not seen for ``max_age_frames`` frames (or
+``max_age_seconds`` seconds, if set) are dropped. ByteTrack never reuses an id
+once a track has been lost for its track_buffer (30 frames by default), so a
+TTL well above that cannot make a vehicle count twice.
+"""
+import time
+
+import numpy as np
+
+TRACK_TTL_FRAMES = 300
+SWEEP_INTERVAL = 50  # frames between eviction sweeps
+
+
+class _Track:
+    __slots__ = ("x", "y", "last_frame", "last_seen", "counted")
+
+    def __init__(self, x, y, frame, now):
+        self.x = x
+        self.y = y
+        self.last_frame = frame
+        self.last_seen = now
+        self.counted = False
+
+
+class TrackStore:
+    """Last centre and counted flag per track id, with TTL eviction."""
+
+    def __init__(self, max_age_frames=TRACK_TTL_FRAMES, max_age_seconds=None, sweep_interval=SWEEP_INTERVAL):
+        self.max_age_frames = max_age_frames
+        self.max_age_seconds = max_age_seconds
+        self.sweep_interval = sweep_interval
+        self.frame = 0
+        self.evicted = 0
+        self._tracks = {}
+        self._last_sweep = 0
+
+    def __len__(self):
+        return len(self._tracks)
+
+    def update(self, track_ids, centers, frame=None):
+        """Record this frame's centres and return each track's previous centre.
+
+        New tracks get their current centre back, as ``object_memory.get(id, center)``
+        did. ``frame`` defaults to one more than the previous call.
+        """
+        self.frame = self.frame + 1 if frame is None else frame
+        now = time.monotonic()
+        tracks = self._tracks
+        prev_centers = []
+        track_ids = np.asarray(track_ids).astype(np.int64).tolist()
+        for track_id, (x, y) in zip(track_ids, np.asarray(centers, dtype=np.float64).reshape(-1, 2).tolist()):
+            track = tracks.get(track_id)
+            if track is None:
+                tracks[track_id] = _Track(x, y, self.frame, now)
+                prev_centers.append((x, y))
+            else:
+                prev_centers.append((track.x, track.y))
+                track.x, track.y = x, y
+                track.last_frame = self.frame
+                track.last_seen = now
+
+        if self.frame - self._last_sweep >= self.sweep_interval:
+            self.evict(now)
+        return prev_centers
+
+    def is_counted(self, track_id):
+        track = self._tracks.get(int(track_id))
+        return track is not None and track.counted
+
+    def mark_counted(self, track_id):
+        track = self._tracks.get(int(track_id))
+        if track is None:
+            track = self._tracks[int(track_id)] = _Track(0.0, 0.0, self.frame, time.monotonic())
+        track.counted = True
+
+    def evict(self, now=None):
+        """Drop tracks older than the TTL; returns how many were removed."""
+        now = time.monotonic() if now is None else now
+        oldest_frame = self.frame - self.max_age_frames
+        oldest_seen = now - self.max_age_seconds if self.max_age_seconds is not None else None
+        stale = [track_id for track_id, track in self._tracks.items()
+                 if track.last_frame < oldest_frame or (oldest_seen is not None and track.last_seen < oldest_seen)]
+        for track_id in stale:
+            del self._tracks[track_id]
+        self.evicted += len(stale)
+        self._last_sweep = self.frame
+        return len(stale)
@@ -1,11 +1,20 @@
+import argparse
 import cv2
-from ultralytics import YOLO
 import numpy as np
 import datetime
 import csv
 import os
 import time
 
+from counting import CountingEngine
+from inference import add_backend_arguments, load_model
+from runtime import ThroughputLogger, install_shutdown_handler
+from motion_gate import MotionGate
+from propagation import TrackPropagator, add_detect_every_argument
+from roi import RegionOfInterest
+from track_state import TrackStore
+from video_input import add_decoder_arguments, open_video
+
 # === CONFIG ===
 VIDEO_PATH = r"D:\clips\testclip3.mp4"
 MODEL_PATH = r"D:\project_folder\best.pt"  # Your trained model
@@ -15,19 +24,40 @@ CSV_FILENAME = "vehicle_log_from_video.csv"
 LINE_START = (100, 180)
 LINE_END = (700, 50)
 
+# Count lines and zones; add one entry per lane as needed
+COUNT_LINES = [{"name": "main", "start": LINE_START, "end": LINE_END}]
+COUNT_ZONES = []
+
 # Class Names as per your model
 TARGET_CLASSES = ["car", "motorcycle", "truck", "Auto-Rickshaw", "Bus", "HCV", "LCV", "Toto"]
 
 CONFIDENCE_THRESHOLD = 0.3
-FRAME_SKIP = 1
-RESIZE_WIDTH = 960
+FRAME_SKIP = 1  # skipped frames are never converted or scaled (see video_input.py)
+RESIZE_WIDTH = 960  # the decoder scales to this size
 RESIZE_HEIGHT = 540
+HEADLESS = False  # or pass --headless
+STATS_INTERVAL = 30
+TRACK_TTL_FRAMES = 300  # forget tracks not seen for this many frames
+MOTION_GATE = True  # skip YOLO on frames with no motion near the count lines
+MOTION_MARGIN = 40  # pixels either side of a count line watched for motion
+DETECT_EVERY = 1  # YOLO on every Nth kept frame, optical flow in between (see propagation.py); or pass --detect-every
+ROI = None  # [x1, y1, x2, y2] or [[x, y], ...] around the count lines; None = whole frame
+INFERENCE_BACKEND = "pytorch"  # "pytorch", "onnx" or "openvino", see inference.py
+INT8 = False  # use the INT8-quantized export
+
+parser = argparse.ArgumentParser(description="Count vehicles in a recorded video.")
+parser.add_argument("--headless", action="store_true", default=HEADLESS,
+                    help="skip all drawing and display (for servers)")
+add_backend_arguments(parser, INFERENCE_BACKEND, INT8)
+add_decoder_arguments(parser)
+add_detect_every_argument(parser, DETECT_EVERY)
+args = parser.parse_args()
 
 # === INIT ===
-model = YOLO(MODEL_PATH)
-cap = cv2.VideoCapture(VIDEO_PATH)
-counted_ids = set()
-object_memory = {}
+model = load_model(MODEL_PATH, args.backend, int8=args.int8, data=args.data)
+video = open_video(VIDEO_PATH, size=(RESIZE_WIDTH, RESIZE_HEIGHT), stride=FRAME_SKIP,
+                   threads=args.decode_threads, decoder=args.decoder)
+track_state = TrackStore(max_age_frames=TRACK_TTL_FRAMES)
 
 # Vehicle counters
 vehicle_counts = {cls: 0 for cls in TARGET_CLASSES}
@@ -37,61 +67,81 @@ csv_file = open(CSV_FILENAME, mode='w', newline='')
 csv_writer = csv.writer(csv_file)
 csv_writer.writerow(["Timestamp", "Vehicle Type", "Vehicle ID"])
 
-# Line crossing detection
-def crossed_line(prev, curr, line_start, line_end):
-    def ccw(A, B, C):
-        return (C[1]-A[1]) * (B[0]-A[0]) > (B[1]-A[1]) * (C[0]-A[0])
-    return ccw(line_start, prev, curr) != ccw(line_end, prev, curr) and \
-           ccw(line_start, line_end, prev) != ccw(line_start, line_end, curr)
+# Line / zone crossing detection
+counter = CountingEngine(COUNT_LINES, COUNT_ZONES)
+target_class_ids = [cls_id for cls_id, name in model.names.items() if name in TARGET_CLASSES]
+motion_gate = MotionGate(counter, margin=MOTION_MARGIN) if MOTION_GATE else None
+roi = RegionOfInterest(ROI) if ROI else None
+roi_imgsz = {"imgsz": roi.imgsz} if roi else {}  # smaller letterbox for the crop
+propagator = TrackPropagator(args.detect_every) if args.detect_every > 1 else None
 
 frame_count = 0
 start_time = time.time()
+stop_event = install_shutdown_handler()
+throughput = ThroughputLogger("Video", interval=STATS_INTERVAL)
 
-while True:
-    ret, frame = cap.read()
-    if not ret:
+while not stop_event.is_set():
+    frame_index, frame = video.read()  # every FRAME_SKIP-th frame, already RESIZE_WIDTH x RESIZE_HEIGHT
+    if frame is None:
         break
 
-    frame_count += 1
-    if frame_count % FRAME_SKIP != 0:
-        continue
-
-    frame = cv2.resize(frame, (RESIZE_WIDTH, RESIZE_HEIGHT))
-    results = model.track(frame, persist=True, conf=CONFIDENCE_THRESHOLD, tracker="bytetrack.yaml")
-
-    if results and results[0].boxes.id is not None:
-        boxes = results[0].boxes
-        ids = boxes.id.cpu().numpy()
-        classes = boxes.cls.cpu().numpy()
-        coords = boxes.xyxy.cpu().numpy()
-        confs = boxes.conf.cpu().numpy()
-
-        for box_id, cls, coord, conf in zip(ids, classes, coords, confs):
-            label = model.names[int(cls)]
-            if label not in TARGET_CLASSES or conf < CONFIDENCE_THRESHOLD:
+    frame_count = frame_index + 1
+    tracks = None  # (ids, coords, classes) of this frame's vehicles
+    if motion_gate is not None and not motion_gate.check(frame):
+        if propagator is not None:  # nothing moving near the count line
+            propagator.reset()
+    elif propagator is not None and not propagator.due():
+        tracks = propagator.propagate(frame)  # optical flow between --detect-every frames
+    else:
+        results = model.track(roi.crop(frame) if roi else frame, persist=True, conf=CONFIDENCE_THRESHOLD,
+                              tracker="bytetrack.yaml", verbose=not args.headless, **roi_imgsz)
+        if results and results[0].boxes.id is not None:
+            boxes = results[0].boxes
+            ids = boxes.id.cpu().numpy()
+            classes = boxes.cls.cpu().numpy()
+            coords = boxes.xyxy.cpu().numpy()
+            if roi:
+                coords = roi.to_frame(coords)  # back to full-frame coordinates
+            confs = boxes.conf.cpu().numpy()
+
+            keep = np.isin(classes, target_class_ids) & (confs >= CONFIDENCE_THRESHOLD)
+            tracks = ids[keep], coords[keep], classes[keep]
+        if propagator is not None:
+            tracks = propagator.detected(frame, *(tracks or (np.empty(0), np.empty((0, 4)), np.empty(0))))
+
+    if tracks is not None:
+        ids, coords, classes = tracks
+        coords = coords.astype(int)
+        centers = (coords[:, :2] + coords[:, 2:]) // 2
+        prev_centers = track_state.update(ids, centers, frame=frame_count)
+
+        if not args.headless:
+            for box_id, cls, (x1, y1, x2, y2) in zip(ids, classes, coords):
+                # Draw box
+                cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 255, 0), 2)
+                cv2.putText(frame, f"{model.names[int(cls)]}-{int(box_id)}", (x1, y1 - 10),
+                            cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 255), 2)
+
+        # Count if cross line
+        for row, line_name, direction in counter.crossings(prev_centers, centers):
+            box_id = ids[row]
+            if track_state.is_counted(box_id):
                 continue
-
-            x1, y1, x2, y2 = coord.astype(int)
-            center_x, center_y = (x1 + x2) // 2, (y1 + y2) // 2
-
-            # Draw box
-            cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 255, 0), 2)
-            cv2.putText(frame, f"{label}-{int(box_id)}", (x1, y1 - 10),
-                        cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 255), 2)
-
-            # Count if cross line
-            prev_center = object_memory.get(box_id, (center_x, center_y))
-            object_memory[box_id] = (center_x, center_y)
-
-            if crossed_line(prev_center, (center_x, center_y), LINE_START, LINE_END) and box_id not in counted_ids:
-                counted_ids.add(box_id)
-                vehicle_counts[label] += 1
-                timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                csv_writer.writerow([timestamp, label, int(box_id)])
-                csv_file.flush()
+            track_state.mark_counted(box_id)
+            label = model.names[int(classes[row])]
+            vehicle_counts[label] += 1
+            timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            csv_writer.writerow([timestamp, label, int(box_id)])
+            csv_file.flush()
+
+    throughput.tick()
+    if args.headless:
+        continue
 
     # Draw line
-    cv2.line(frame, LINE_START, LINE_END, (0, 0, 255), 2)
+    counter.draw(frame)
+    if roi:
+        roi.draw(frame)
 
     # Show counts
     count_text = " | ".join([f"{cls}: {vehicle_counts[cls]}" for cls in TARGET_CLASSES if vehicle_counts[cls] > 0])
@@ -107,6 +157,13 @@ while True:
         break
 
 # === CLEANUP ===
-cap.release()
+video.release()
 csv_file.close()
-cv2.destroyAllWindows()
+if motion_gate is not None:
+    print(f"💤 Motion gate skipped {motion_gate.frames_skipped}/{motion_gate.frames_checked} frames "
+          f"({motion_gate.skip_ratio:.0%})")
+if propagator is not None:
+    print(f"🔁 Optical flow carried tracks through {propagator.frames_propagated} frames, "
+          f"{propagator.handoffs} ids handed off")
+if not args.headless:
+    cv2.destroyAllWindows()
@@ -0,0 +1,183 @@
+"""Decode video files and camera streams straight to the size the detector uses.
+
+open_video() returns a reader whose ``read()`` gives ``(frame_index, frame)``
+for every ``stride``-th frame, already scaled to ``size``, and ``(None, None)``
+at the end of the input or on a stream error. ``frame_index`` is the frame's
+position in the source, so timestamps derived from it stay right whatever is
+skipped.
+
+With PyAV installed (``pip install av``), decoding goes through libavcodec
+directly:
+
+* frame and slice threads (``threads``, 0 = one per core);
+* swscale converts to BGR and scales in one pass, so the full-resolution BGR
+  image the OpenCV path builds, and the cv2.resize after it, never happen;
+* with ``stride`` > 1, frames no other frame references (B-frames) are not
+  decoded at all, and strided-over reference frames are decoded (the following
+  frames need them) but never converted.
+
+Without PyAV, OpenCV's FFmpeg backend is used: strided-over frames are only
+grab()bed (decoded, not converted) and kept frames are resized with cv2.resize.
+
+For RTSP cameras the cheapest frame is the one never sent at full resolution:
+substream_url() switches a Dahua or Hikvision URL to the camera's low-resolution
+substream.
+"""
+import re
+
+import cv2
+
+DECODER = "auto"  # "auto" (PyAV if installed), "pyav" or "opencv"
+DECODERS = ("auto", "pyav", "opencv")
+DECODE_THREADS = 0  # 0 = one per core; live streams should use 1-2, frame threads add a frame of delay each
+OPEN_TIMEOUT = 10.0  # seconds to connect to a stream
+READ_TIMEOUT = 5.0  # seconds without data before a stream counts as lost
+INTERPOLATION = "BILINEAR"  # swscale filter, like cv2.resize's default INTER_LINEAR
+
+
+def substream_url(url):
+    """The camera's low-resolution substream, for Dahua (subtype=1) and Hikvision (Channels/x02) URLs."""
+    if re.search(r"subtype=\d", url):
+        return re.sub(r"subtype=\d", "subtype=1", url)
+    if re.search(r"/Streaming/Channels/\d+01\b", url, flags=re.IGNORECASE):
+        return re.sub(r"(/Streaming/Channels/\d+)01\b", r"\g<1>02", url, flags=re.IGNORECASE)
+    print(f"⚠️ Don't know the substream of {url}; using it as is")
+    return url
+
+
+class OpenCVReader:
+    """cv2.VideoCapture with grab()-only skipping and cv2.resize."""
+
+    decoder = "opencv"
+
+    def __init__(self, source, size=None, stride=1, threads=DECODE_THREADS, api_preference=cv2.CAP_FFMPEG):
+        params = [cv2.CAP_PROP_N_THREADS, threads] if threads else []
+        self._cap = cv2.VideoCapture(source, api_preference, params)
+        self._cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+        self.size = tuple(size) if size else None
+        self.stride = stride
+        fps = self._cap.get(cv2.CAP_PROP_FPS)
+        self.fps = fps if fps > 0 else None
+        self._index = 0  # index of the next frame grab() returns
+
+    def isOpened(self):
+        return self._cap.isOpened()
+
+    def read(self):
+        while True:
+            if not self._cap.grab():
+                return None, None
+            index = self._index
+            self._index += 1
+            if index % self.stride:
+                continue
+            ret, frame = self._cap.retrieve()
+            if not ret or frame is None or frame.size == 0:
+                return None, None
+            if self.size and (frame.shape[1], frame.shape[0]) != self.size:
+                frame = cv2.resize(frame, self.size)
+            return index, frame
+
+    def rewind(self):
+        self._cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+        self._index = 0
+
+    def release(self):
+        self._cap.release()
+
+
+class PyAVReader:
+    """libavcodec through PyAV: threaded decode, scaling in swscale, B-frames skipped when striding."""
+
+    decoder = "pyav"
+
+    def __init__(self, source, size=None, stride=1, threads=DECODE_THREADS):
+        import av
+
+        self._av = av
+        self.source = source
+        self.size = tuple(size) if size else None
+        self.stride = stride
+        self.threads = threads
+        self.fps = None
+        self._container = None
+        try:
+            self._open()
+        except (av.FFmpegError, OSError) as e:
+            print(f"⚠️ Could not open {source}: {e}")
+            self.release()
+
+    def _open(self):
+        options = {"rtsp_transport": "tcp"} if str(self.source).startswith("rtsp") else {}
+        self._container = self._av.open(self.source, options=options, timeout=(OPEN_TIMEOUT, READ_TIMEOUT))
+        stream = self._container.streams.video[0]
+        stream.thread_type = "AUTO"  # frame and slice threads
+        stream.codec_context.thread_count = self.threads
+        if self.stride > 1:
+            stream.codec_context.skip_frame = "NONREF"
+        rate = stream.average_rate or stream.guessed_rate
+        self.fps = float(rate) if rate else None
+        self._time_base = stream.time_base
+        self._start_pts = stream.start_time or 0
+        self._frames = self._container.decode(stream)
+        self._decoded = 0  # frames decoded, for streams without timestamps
+        self._next_index = 0
+
+    def isOpened(self):
+        return self._container is not None
+
+    def _frame_index(self, frame):
+        self._decoded += 1
+        if frame.pts is None or not self.fps:
+            return self._decoded - 1
+        return round(float((frame.pts - self._start_pts) * self._time_base) * self.fps)
+
+    def read(self):
+        if self._container is None:
+            return None, None
+        try:
+            for frame in self._frames:
+                index = self._frame_index(frame)
+                if index < self._next_index:
+                    continue  # strided over: decoded, never converted
+                self._next_index = index + self.stride
+                width, height = self.size or (frame.width, frame.height)
+                return index, frame.to_ndarray(format="bgr24", width=width, height=height,
+                                               interpolation=INTERPOLATION)
+        except (self._av.FFmpegError, OSError) as e:
+            print(f"⚠️ Decode error on {self.source}: {e}")
+        return None, None
+
+    def rewind(self):
+        self.release()
+        self._open()
+
+    def release(self):
+        if self._container is not None:
+            self._container.close()
+            self._container = None
+
+
+def open_video(source, size=None, stride=1, threads=DECODE_THREADS, decoder=DECODER,
+               api_preference=cv2.CAP_FFMPEG):
+    """Open a file or stream URL; ``size`` is ``(width, height)``. Check ``isOpened()`` before reading.
+
+    Device indexes (webcams) always go through OpenCV; ``api_preference`` only applies there.
+    """
+    if decoder not in DECODERS:
+        raise ValueError(f"decoder must be one of {DECODERS}, not {decoder!r}")
+    if decoder != "opencv" and isinstance(source, str):
+        try:
+            return PyAVReader(source, size, stride, threads)
+        except ImportError:
+            if decoder == "pyav":
+                raise
+    return OpenCVReader(source, size, stride, threads, api_preference)
+
+
+def add_decoder_arguments(parser, decoder=DECODER, threads=DECODE_THREADS):
+    """Add --decoder and --decode-threads to a detector's argument parser."""
+    parser.add_argument("--decoder", choices=DECODERS, default=decoder,
+                        help="video decoder: PyAV (scales while converting, skips B-frames) or OpenCV")
+    parser.add_argument("--decode-threads", type=int, default=threads,
+                        help="decoder threads; 0 = one per core")